@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class EventManager:
+    """
+    Turns per-frame detections into sighting events, one per (camera, track).
+    An event opens on the first detection of a track, keeps the highest
+    confidence frame seen, and closes after `timeout` seconds without a
+    detection (or after `max_duration`). Start notifications are limited to
+    one per camera per `cooldown` seconds.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.cooldown = config.get('cooldown', 60)
+        self.timeout = config.get('timeout', 5)
+        self.max_duration = config.get('max_duration', 300)
+        self.events = {}          # (camera, track_id) -> event
+        self.last_notified = {}   # camera -> time of the last start notification
+        self.split_events = []    # closed by max_duration, returned by the next expire()
+        self.lock = threading.Lock()
+
+    def observe(self, detection_data, frame, now=None):
+        """
+        Record one detection. Returns the event if it was just opened, else None.
+        The frame is only copied when it becomes the event's best frame.
+        """
+        now = now or time.time()
+        camera = detection_data.get('camera')
+        key = (camera, detection_data.get('track_id'))
+        conf = detection_data['conf']
+
+        with self.lock:
+            event = self.events.get(key)
+            if event is not None and now - event['start'] > self.max_duration:
+                # Split very long sightings so they still get recorded
+                self.split_events.append(self._close(key))
+                event = None
+
+            if event is None:
+                event = {
+                    'id': uuid.uuid4().hex[:12],
+                    'camera': camera,
+                    'track_id': key[1],
+                    'start': now,
+                    'last_seen': now,
+                    'detections': 0,
+                    'best_conf': -1.0,
+                    'best_bbox': None,
+                    'best_frame': None,
+                    'notify': now - self.last_notified.get(camera, 0) >= self.cooldown,
+                    'closed': False
+                }
+                self.events[key] = event
+                if event['notify']:
+                    self.last_notified[camera] = now
+                opened = event
+            else:
+                opened = None
+
+            event['last_seen'] = now
+            event['detections'] += 1
+            if conf > event['best_conf']:
+                event['best_conf'] = conf
+                event['best_bbox'] = detection_data.get('bbox')
+                event['best_frame'] = frame.copy()
+
+        return opened
+
+    def expire(self, now=None, force=False):
+        """Close and return the events not seen for `timeout` seconds (all of them if force)."""
+        now = now or time.time()
+        with self.lock:
+            closed, self.split_events = self.split_events, []
+            for key, event in list(self.events.items()):
+                if force or now - event['last_seen'] > self.timeout:
+                    closed.append(self._close(key))
+        return closed
+
+    def _close(self, key):
+        event = self.events.pop(key)
+        event['closed'] = True
+        return event
+
+    def open_count(self):
+        with self.lock:
+            return len(self.events)
+
+def event_summary(event):
+    """JSON-serialisable metadata of an event."""
+    return {
+        'event_id': event['id'],
+        'camera': event['camera'],
+        'track_id': event['track_id'],
+        'start': event['start'],
+        'end': event['last_seen'],
+        'duration': event['last_seen'] - event['start'],
+        'detections': event['detections'],
+        'conf': event['best_conf'],
+        'bbox': event['best_bbox']
+    }
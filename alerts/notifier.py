@@ -2,53 +2,123 @@ import logging
 import threading
 import queue
 import time
+from collections import deque
 import cv2
-import sqlite3
 from pathlib import Path
 from datetime import datetime
-import json
 import requests
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
+from alerts.events import EventManager, event_summary
+from alerts.storage import DetectionStore
+from app.metrics import REGISTRY
 
 logger = logging.getLogger(__name__)
 
 class AlertSystem:
+    """
+    Groups detections into sighting events (see EventManager) and does the I/O
+    on a background thread: one notification when an event starts and one
+    image + DB row (best frame) when it ends.
+    Start notifications go through a bounded queue and may be dropped when it
+    is full; end jobs carry the finished sighting and are never dropped.
+    """
     def __init__(self, config):
         self.config = config
-        self.alert_queue = queue.Queue()
+        alerts_config = self.config.get('alerts', {})
+        self.events = EventManager(alerts_config.get('events', {}))
+        self.alert_queue = queue.Queue(maxsize=alerts_config.get('queue_size', 64))
+        self.drop_policy = alerts_config.get('drop_policy', 'drop_oldest')
+        self.dropped_alerts = 0
+        # Produced by the alert thread itself (expire), so unbounded costs nothing upstream
+        self.end_jobs = deque()
+        self.recorders = {}  # camera -> VideoRecorder producing the event clips
         self.setup_db()
+        self._register_metrics()
         self.running = True
         self.thread = threading.Thread(target=self._process_alerts, daemon=True)
         self.thread.start()
 
     def setup_db(self):
-        db_path = self.config.get('database', {}).get('path', 'data.db')
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS detections (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME,
-                confidence REAL,
-                image_path TEXT,
-                video_path TEXT,
-                metadata TEXT
-            )
-        ''')
-        self.conn.commit()
+        db_config = self.config.get('alerts', {}).get('database', {})
+        self.store = None
+        if not db_config.get('enabled', True):
+            return
+        self.store = DetectionStore(
+            db_config.get('path', 'data/data.db'),
+            batch_size=db_config.get('batch_size', 50),
+            flush_interval=db_config.get('flush_interval', 2.0),
+            retention_days=db_config.get('retention_days')
+        )
+
+    def _register_metrics(self):
+        self.timers = {
+            kind: REGISTRY.histogram('pantheravision_alert_seconds', 'Time to handle an alert job', type=kind)
+            for kind in ('start', 'end')
+        }
+        REGISTRY.callback('pantheravision_alert_queue_depth', 'Alert jobs waiting to be handled',
+                          lambda: self.alert_queue.qsize() + len(self.end_jobs))
+        REGISTRY.callback('pantheravision_alerts_dropped_total', 'Start notifications dropped because the queue was full',
+                          lambda: self.dropped_alerts, kind='counter')
+        REGISTRY.callback('pantheravision_open_events', 'Sighting events currently open', self.events.open_count)
+
+    def register_recorder(self, camera, recorder):
+        self.recorders[camera] = recorder
 
     def trigger_alert(self, detection_data, frame):
         """
-        Queue an alert.
-        detection_data: dict containing confidence, bbox, etc.
+        Report a detection.
+        detection_data: dict containing conf, bbox, track_id, camera, etc.
+        Only the first detection of a sighting queues a notification.
         """
-        self.alert_queue.put({'data': detection_data, 'frame': frame})
+        event = self.events.observe(detection_data, frame)
+        if event is None:
+            return
+        recorder = self.recorders.get(event['camera'])
+        clip = recorder.start_clip(event['id']) if recorder is not None else None
+        if clip is not None:
+            event['video_path'] = str(clip)
+        if event['notify']:
+            self._enqueue({'type': 'start', 'event': event})
+
+    def _enqueue(self, alert):
+        """Bounded queue of start notifications: when full, drop the oldest (or the new) one and count it."""
+        while True:
+            try:
+                self.alert_queue.put_nowait(alert)
+                return True
+            except queue.Full:
+                if self.drop_policy != 'drop_oldest':
+                    break
+                try:
+                    self.alert_queue.get_nowait()
+                    self.alert_queue.task_done()
+                except queue.Empty:
+                    continue
+                self.dropped_alerts += 1
+                logger.warning(f"Alert queue full, dropped oldest notification ({self.dropped_alerts} total)")
+        self.dropped_alerts += 1
+        logger.warning(f"Alert queue full, dropped new notification ({self.dropped_alerts} total)")
+        return False
+
+    def _expire_events(self, force=False):
+        for event in self.events.expire(force=force):
+            self.end_jobs.append({'type': 'end', 'event': event})
+
+    def _handle_end_jobs(self):
+        while self.end_jobs:
+            alert = self.end_jobs.popleft()
+            try:
+                self._handle_alert(alert)
+            except Exception as e:
+                logger.error(f"Error recording sighting {alert['event']['id']}: {e}")
 
     def _process_alerts(self):
         while self.running:
+            self._expire_events()
+            self._handle_end_jobs()
             try:
                 alert = self.alert_queue.get(timeout=1)
                 self._handle_alert(alert)
@@ -58,45 +128,78 @@ class AlertSystem:
             except Exception as e:
                 logger.error(f"Error processing alert: {e}")
 
+        # Notify what is still queued, then record the sightings still open at shutdown
+        while True:
+            try:
+                self._handle_alert(self.alert_queue.get_nowait())
+            except queue.Empty:
+                break
+            except Exception as e:
+                logger.error(f"Error processing alert: {e}")
+        self._expire_events(force=True)
+        self._handle_end_jobs()
+
     def _handle_alert(self, alert):
-        data = alert['data']
-        frame = alert['frame']
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        event = alert['event']
+        start = time.perf_counter()
+        if alert['type'] == 'start':
+            self._notify_start(event)
+        else:
+            self._record_event(event)
+        self.timers[alert['type']].time(start)
+
+    def _notify_start(self, event):
+        camera = f" on {event['camera']}" if event['camera'] else ""
+        logger.info(f"Leopard Detected{camera}! Conf: {event['best_conf']:.2f} (event {event['id']})")
+
+        # Send Telegram
+        if self.config.get('alerts', {}).get('telegram', {}).get('enabled'):
+            ok, encoded = cv2.imencode(".jpg", event['best_frame'])
+            if ok:
+                self._send_telegram(encoded.tobytes(), f"🐆 Leopard Detected{camera}! Conf: {event['best_conf']:.2f}")
+
+    def _record_event(self, event):
+        data = event_summary(event)
+        timestamp = datetime.fromtimestamp(event['start']).strftime("%Y-%m-%d_%H-%M-%S")
         
-        # Save Image
+        # Save the best frame of the sighting
         img_dir = Path(self.config.get('system', {}).get('output_dir', 'output')) / "images"
         img_dir.mkdir(parents=True, exist_ok=True)
-        img_path = img_dir / f"leopard_{timestamp}.jpg"
-        cv2.imwrite(str(img_path), frame)
-        
-        # Log to DB
-        self.cursor.execute('''
-            INSERT INTO detections (timestamp, confidence, image_path, video_path, metadata)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (datetime.now(), data['conf'], str(img_path), "", json.dumps(data)))
-        self.conn.commit()
+        img_path = img_dir / f"leopard_{timestamp}_{event['id']}.jpg"
+        cv2.imwrite(str(img_path), event['best_frame'])
+
+        # The clip keeps recording for a few seconds after the sighting
+        video_path = event.get('video_path', "")
+        recorder = self.recorders.get(event['camera'])
+        if recorder is not None and video_path:
+            recorder.end_clip(event['id'])
         
-        logger.info(f"Leopard Detected! Conf: {data['conf']:.2f}. Saved to {img_path}")
+        # Log to DB (batched by the store's writer thread)
+        if self.store is not None:
+            self.store.add(event['start'], data['conf'], str(img_path), video_path, data, camera=event['camera'])
         
-        # Send Telegram
-        if self.config.get('alerts', {}).get('telegram', {}).get('enabled'):
-            self._send_telegram(str(img_path), f"🐆 Leopard Detected! Conf: {data['conf']:.2f}")
+        logger.info(
+            f"Sighting {event['id']} ended: {data['detections']} detections over "
+            f"{data['duration']:.1f}s, best conf {data['conf']:.2f}. Saved to {img_path}"
+        )
 
-    def _send_telegram(self, image_path, caption):
+    def _send_telegram(self, image, caption):
+        """image: JPEG bytes"""
         try:
             tg_conf = self.config['alerts']['telegram']
             token = tg_conf['token']
             chat_id = tg_conf['chat_id']
             url = f"https://api.telegram.org/bot{token}/sendPhoto"
             
-            with open(image_path, 'rb') as f:
-                payload = {'chat_id': chat_id, 'caption': caption}
-                files = {'photo': f}
-                requests.post(url, data=payload, files=files, timeout=10)
+            payload = {'chat_id': chat_id, 'caption': caption}
+            files = {'photo': ('leopard.jpg', image, 'image/jpeg')}
+            requests.post(url, data=payload, files=files, timeout=10)
         except Exception as e:
             logger.error(f"Failed to send Telegram alert: {e}")
 
     def stop(self):
         self.running = False
         self.thread.join()
-        self.conn.close()
+        if self.store is not None:
+            self.store.close()
+            self.store = None
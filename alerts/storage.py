@@ -0,0 +1,288 @@
+import argparse
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS detections (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME,
+        confidence REAL,
+        image_path TEXT,
+        video_path TEXT,
+        metadata TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS detection_rollups (
+        period TEXT,
+        camera TEXT,
+        detections INTEGER,
+        max_confidence REAL,
+        avg_confidence REAL,
+        PRIMARY KEY (period, camera)
+    )
+    ''',
+]
+
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_detections_timestamp ON detections (timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_detections_confidence ON detections (confidence)',
+    'CREATE INDEX IF NOT EXISTS idx_detections_camera ON detections (camera, timestamp)',
+]
+
+COLUMNS = ('timestamp', 'confidence', 'image_path', 'video_path', 'metadata', 'camera')
+
+# Marker items for the writer queue
+_FLUSH = object()
+_ROLLUP = object()
+_STOP = object()
+
+def _to_db_time(value):
+    """Epoch seconds, datetime or ISO string (T or space separated) -> the stored 'YYYY-MM-DD HH:MM:SS' form."""
+    if isinstance(value, (int, float)):
+        value = datetime.fromtimestamp(value)
+    elif isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            # Rows are stored in naive local time
+            value = value.astimezone().replace(tzinfo=None)
+        return value.isoformat(sep=' ')
+    return value
+
+def _connect(path, readonly=False):
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=10)
+    else:
+        conn = sqlite3.connect(str(path), timeout=10)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def query_detections(path, start=None, end=None, min_conf=None, camera=None, limit=None):
+    """
+    Detections between `start` and `end` (datetime, epoch seconds or ISO
+    string) with confidence >= min_conf, newest first.
+    Opens only a read-only connection, so it never creates or migrates the database.
+    """
+    clauses, params = [], []
+    if start is not None:
+        clauses.append('timestamp >= ?')
+        params.append(_to_db_time(start))
+    if end is not None:
+        clauses.append('timestamp <= ?')
+        params.append(_to_db_time(end))
+    if min_conf is not None:
+        clauses.append('confidence >= ?')
+        params.append(min_conf)
+    if camera is not None:
+        clauses.append('camera = ?')
+        params.append(camera)
+
+    sql = 'SELECT * FROM detections'
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY timestamp DESC'
+    if limit:
+        sql += ' LIMIT ?'
+        params.append(int(limit))
+
+    conn = _connect(path, readonly=True)
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+class DetectionStore:
+    """
+    SQLite persistence for detections.
+    A single writer thread owns the write connection, batches inserts and
+    commits when `batch_size` rows are pending or `flush_interval` seconds have
+    passed. The database runs in WAL mode so readers (dashboard, reports,
+    query()) never block the writer.
+    """
+    def __init__(self, path, batch_size=50, flush_interval=2.0, retention_days=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.queue = queue.Queue()
+        self.rows_written = 0
+
+        # Create the schema before returning so readers can query immediately
+        conn = self._connect()
+        self._setup(conn)
+        conn.close()
+
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    def _connect(self, readonly=False):
+        return _connect(self.path, readonly)
+
+    def _setup(self, conn):
+        conn.execute('PRAGMA journal_mode=WAL')
+        for statement in SCHEMA:
+            conn.execute(statement)
+
+        # Databases created before the camera column existed
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(detections)')}
+        if 'camera' not in columns:
+            conn.execute('ALTER TABLE detections ADD COLUMN camera TEXT')
+
+        for statement in INDEXES:
+            conn.execute(statement)
+        conn.commit()
+
+    def add(self, timestamp, confidence, image_path="", video_path="", metadata=None, camera=None):
+        """Queue a detection row. It is committed with the next batch."""
+        if isinstance(metadata, dict):
+            metadata = json.dumps(metadata)
+        self.queue.put((_to_db_time(timestamp), confidence, image_path, video_path, metadata, camera))
+
+    def flush(self, timeout=10):
+        """Block until every row queued so far is committed."""
+        done = threading.Event()
+        self.queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def _writer(self):
+        conn = self._connect()
+        conn.execute('PRAGMA synchronous=NORMAL')  # safe with WAL, one fsync per checkpoint
+        pending = []
+        waiters = []
+        last_commit = time.time()
+        last_rollup = 0.0
+
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.time() - last_commit))
+            try:
+                item = self.queue.get(timeout=timeout if pending else 1.0)
+            except queue.Empty:
+                item = None
+
+            stop = False
+            if item is not None and item[0] in (_FLUSH, _ROLLUP, _STOP):
+                if item[0] is _FLUSH:
+                    waiters.append(item[1])
+                elif item[0] is _ROLLUP:
+                    # Rows queued before the request are part of the rollup
+                    self._commit(conn, pending)
+                    pending = []
+                    last_commit = time.time()
+                    self._rollup(conn, item[1])
+                else:
+                    stop = True
+            elif item is not None:
+                pending.append(item)
+
+            due = time.time() - last_commit >= self.flush_interval
+            if pending and (len(pending) >= self.batch_size or due or waiters or stop):
+                self._commit(conn, pending)
+                pending = []
+                last_commit = time.time()
+            elif not pending:
+                last_commit = time.time()
+
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+
+            # Retention runs about once an hour
+            if self.retention_days and time.time() - last_rollup > 3600:
+                self._rollup(conn, self.retention_days)
+                last_rollup = time.time()
+
+            if stop:
+                break
+
+        conn.close()
+
+    def _commit(self, conn, rows):
+        if not rows:
+            return
+        try:
+            conn.executemany(
+                f"INSERT INTO detections ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            conn.commit()
+            self.rows_written += len(rows)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to write {len(rows)} detections: {e}")
+            conn.rollback()
+
+    def _rollup(self, conn, older_than_days):
+        """Aggregate rows older than the cutoff into hourly rollups and delete them."""
+        cutoff = _to_db_time(datetime.now() - timedelta(days=older_than_days))
+        try:
+            conn.execute('''
+                INSERT INTO detection_rollups (period, camera, detections, max_confidence, avg_confidence)
+                SELECT strftime('%Y-%m-%d %H:00', timestamp), COALESCE(camera, ''),
+                       COUNT(*), MAX(confidence), AVG(confidence)
+                FROM detections WHERE timestamp < ?
+                GROUP BY 1, 2
+                ON CONFLICT (period, camera) DO UPDATE SET
+                    avg_confidence = (avg_confidence * detections + excluded.avg_confidence * excluded.detections)
+                                     / (detections + excluded.detections),
+                    detections = detections + excluded.detections,
+                    max_confidence = MAX(max_confidence, excluded.max_confidence)
+            ''', (cutoff,))
+            deleted = conn.execute('DELETE FROM detections WHERE timestamp < ?', (cutoff,)).rowcount
+            conn.commit()
+            if deleted:
+                logger.info(f"Rolled up {deleted} detections older than {older_than_days} days")
+        except sqlite3.Error as e:
+            logger.error(f"Detection rollup failed: {e}")
+            conn.rollback()
+
+    def rollup(self, older_than_days):
+        """Request a rollup on the writer thread (the only connection that writes)."""
+        self.queue.put((_ROLLUP, older_than_days))
+
+    def query(self, start=None, end=None, min_conf=None, camera=None, limit=None):
+        """
+        Detections between `start` and `end` (datetime, epoch seconds or ISO
+        string) with confidence >= min_conf, newest first.
+        Uses its own read-only connection; safe to call from any thread.
+        """
+        return query_detections(self.path, start, end, min_conf, camera, limit)
+
+    def rollups(self, start=None, end=None):
+        conn = self._connect(readonly=True)
+        try:
+            sql = 'SELECT * FROM detection_rollups WHERE period >= ? AND period <= ? ORDER BY period'
+            return [dict(row) for row in conn.execute(sql, (start or '', end or '9999'))]
+        finally:
+            conn.close()
+
+    def close(self):
+        self.queue.put((_STOP, None))
+        self.thread.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the detections database")
+    parser.add_argument("--db", type=str, default="data/data.db")
+    parser.add_argument("--since", type=str, default=None, help="ISO timestamp")
+    parser.add_argument("--until", type=str, default=None, help="ISO timestamp")
+    parser.add_argument("--min-conf", type=float, default=None)
+    parser.add_argument("--camera", type=str, default=None)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        parser.error(f"No database at {args.db}")
+    # Read-only: no writer thread, WAL switch or migration just to look at rows
+    for row in query_detections(args.db, args.since, args.until, args.min_conf, args.camera, args.limit):
+        print(f"{row['timestamp']}  {row['confidence']:.2f}  {row['camera'] or '-'}  {row['image_path']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from app import streaming
+from app.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+BOUNDARY = b'frame'
+
+class AsyncStreamServer:
+    """
+    MJPEG streaming service on a single asyncio event loop.
+    Viewers are coroutines rather than threads, so hundreds of them cost little.
+    Frames come from the same FrameBroadcasters as the Flask server: each frame
+    is encoded once per (quality, variant) on a small worker pool, and the
+    pipeline thread only pays a call_soon_threadsafe when someone is watching.
+
+    Routes:
+      /video, /video/<camera>          MJPEG (?size=full|preview|thumb&fps=&quality=)
+      /snapshot.jpg, /snapshot/<camera>.jpg
+      /cameras, /health, /metrics, /
+    Named cameras only exist once their pipeline published a frame; other
+    names get a 404.
+    """
+    def __init__(self, host='0.0.0.0', port=5000, config=None):
+        self.host = host
+        self.port = port
+        self.config = config or {}
+        streaming.stream_config.update(self.config)
+        self.loop = None
+        self.server = None
+        self.encoder = ThreadPoolExecutor(
+            max_workers=self.config.get('encode_workers', 2), thread_name_prefix='jpeg'
+        )
+        self.events = {}     # broadcaster -> asyncio.Event set on the next publish
+        self.hooked = set()  # broadcasters we listen to
+        self.encoding = {}   # (broadcaster, quality, width, seq) -> pending encode
+        self.clients = 0
+        REGISTRY.callback('pantheravision_stream_clients', 'Connected MJPEG viewers', lambda: self.clients)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, backlog=512)
+        )
+        logger.info(f"Streaming server listening on {self.host}:{self.port}")
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=5)
+        self.encoder.shutdown(wait=False)
+
+    def update_frame(self, frame, camera=None):
+        streaming.set_output_frame(frame, camera)
+
+    # Frame notifications (called on the pipeline thread)
+
+    def _on_publish(self, broadcaster):
+        if broadcaster in self.events:
+            self.loop.call_soon_threadsafe(self._wake, broadcaster)
+
+    def _wake(self, broadcaster):
+        event = self.events.pop(broadcaster, None)
+        if event is not None:
+            event.set()
+
+    def _broadcaster(self, camera):
+        """Broadcaster with the wake-up listener attached, None for an unknown camera."""
+        broadcaster = streaming.get_broadcaster(camera)
+        if broadcaster is not None and broadcaster not in self.hooked:
+            self.hooked.add(broadcaster)
+            broadcaster.listeners.append(self._on_publish)
+        return broadcaster
+
+    async def _wait(self, broadcaster, last_seq, timeout=1.0):
+        """Wait until the broadcaster has a frame newer than last_seq. Returns its seq."""
+        if broadcaster.seq != last_seq:
+            return broadcaster.seq
+        event = self.events.get(broadcaster)
+        if event is None:
+            event = self.events[broadcaster] = asyncio.Event()
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return broadcaster.seq
+
+    async def _jpeg(self, broadcaster, quality, width):
+        """Cached JPEG of the current frame; concurrent misses share one encode."""
+        cached = broadcaster.cached(quality, width)
+        if cached is not None:
+            return cached
+        key = (broadcaster, quality, width, broadcaster.seq)
+        future = self.encoding.get(key)
+        if future is None:
+            future = self.loop.run_in_executor(self.encoder, broadcaster.jpeg, quality, width)
+            self.encoding[key] = future
+            future.add_done_callback(lambda _: self.encoding.pop(key, None))
+        return await future
+
+    # HTTP
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 10)
+            # Skip the headers, none of the routes need them
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 10)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+            method, target = request_line.decode('latin-1').split()[:2]
+            await self._route(method, target, writer)
+        except (asyncio.TimeoutError, ValueError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Streaming request failed: {e}")
+        finally:
+            writer.close()
+
+    async def _route(self, method, target, writer):
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip('/') or '/'
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if method not in ('GET', 'HEAD'):
+            return await self._respond(writer, 405, b'Method Not Allowed', 'text/plain')
+
+        fps, quality = streaming.client_limits(_number(params.get('fps'), float), _number(params.get('quality'), int))
+        width = streaming.variant_width(params.get('size'))
+
+        if path == '/':
+            await self._respond(writer, 200, streaming.INDEX_HTML.encode(), 'text/html; charset=utf-8')
+        elif path == '/video' or path.startswith('/video/'):
+            broadcaster = self._broadcaster(path[len('/video/'):] or None)
+            if broadcaster is None:
+                return await self._respond(writer, 404, b'Unknown camera', 'text/plain')
+            await self._stream(writer, broadcaster, fps, quality, width)
+        elif path == '/snapshot.jpg' or (path.startswith('/snapshot/') and path.endswith('.jpg')):
+            camera = path[len('/snapshot/'):-len('.jpg')] if path.startswith('/snapshot/') else None
+            broadcaster = self._broadcaster(camera)
+            if broadcaster is None:
+                return await self._respond(writer, 404, b'Unknown camera', 'text/plain')
+            _, data = await self._jpeg(broadcaster, quality, width)
+            await self._respond(writer, 200, data or streaming.BLANK_JPEG, 'image/jpeg')
+        elif path == '/cameras':
+            await self._respond_json(writer, {"cameras": streaming.camera_names()})
+        elif path == '/health':
+            report = await self.loop.run_in_executor(None, streaming.health_report)
+            report['clients'] = self.clients
+            await self._respond_json(writer, report)
+        elif path == '/metrics':
+            body = await self.loop.run_in_executor(None, REGISTRY.render)
+            await self._respond(writer, 200, body.encode(), 'text/plain; version=0.0.4')
+        else:
+            await self._respond(writer, 404, b'Not Found', 'text/plain')
+
+    async def _respond(self, writer, status, body, content_type):
+        reason = {200: 'OK', 404: 'Not Found', 405: 'Method Not Allowed'}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+
+    async def _respond_json(self, writer, data):
+        await self._respond(writer, 200, json.dumps(data, default=str).encode(), 'application/json')
+
+    async def _stream(self, writer, broadcaster, fps, quality, width):
+        writer.transport.set_write_buffer_limits(high=256 * 1024)
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary=" + BOUNDARY +
+            b"\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n"
+        )
+        min_interval = 1.0 / fps
+        last_seq = -1
+        last_sent = 0.0
+        self.clients += 1
+        try:
+            while True:
+                # Frame rate cap, then wait for a frame this client hasn't seen
+                delay = min_interval - (time.time() - last_sent)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                seq = await self._wait(broadcaster, last_seq)
+                if seq == last_seq and seq > 0:
+                    continue
+
+                seq, data = await self._jpeg(broadcaster, quality, width)
+                last_seq = seq
+                last_sent = time.time()
+                writer.write(
+                    b'--' + BOUNDARY + b'\r\nContent-Type: image/jpeg\r\n\r\n' +
+                    (data or streaming.BLANK_JPEG) + b'\r\n'
+                )
+                # A slow client only holds up itself; it gets the newest frame once it drains
+                await writer.drain()
+        finally:
+            self.clients -= 1
+
+def _number(value, cast):
+    try:
+        return cast(value) if value is not None else None
+    except ValueError:
+        return None
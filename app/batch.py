@@ -0,0 +1,313 @@
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+from pathlib import Path
+
+import cv2
+import yaml
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.m4v', '.mts', '.ts', '.wmv'}
+COLUMNS = ('frame', 'time', 'x1', 'y1', 'x2', 'y2', 'conf', 'cls')
+
+class FrameReader:
+    """
+    Decodes a video file on a background thread into a bounded queue.
+    Frames skipped by `stride` are only grabbed, never decoded. stop() ends
+    the thread even when nobody consumes the queue any more.
+    """
+    def __init__(self, path, stride=1, queue_size=64):
+        self.path = str(path)
+        self.stride = max(1, stride)
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            raise IOError(f"Cannot open video {self.path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.frames_read = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _put(self, item):
+        """Blocking put that gives up once stop() is called. Returns False then."""
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        index = 0
+        try:
+            while True:
+                if index % self.stride:
+                    if not self.cap.grab():
+                        break
+                else:
+                    ret, frame = self.cap.read()
+                    if not ret or not self._put((index, frame)):
+                        break
+                index += 1
+        finally:
+            self.frames_read = index
+            self.cap.release()
+            self._put(None)
+
+    def __iter__(self):
+        self.thread.start()
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            yield item
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+def batches(reader, batch_size):
+    batch = []
+    for item in reader:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def output_path(source, output_dir, fmt):
+    """Stable result name per input: stem plus a hash of the absolute path (same stems in different dirs)."""
+    source = Path(source).resolve()
+    digest = hashlib.sha1(str(source).encode()).hexdigest()[:8]
+    suffix = '.parquet' if fmt == 'parquet' else '.json.gz'
+    return Path(output_dir) / f"{source.stem}_{digest}{suffix}"
+
+def _fingerprint(source, stride=1):
+    stat = Path(source).stat()
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'stride': max(1, stride)}
+
+def is_done(source, output_dir, fmt, stride=1):
+    """True when a result exists for this exact file (same size and mtime) at this stride."""
+    path = output_path(source, output_dir, fmt)
+    if not path.exists():
+        return False
+    try:
+        meta = read_result(path)['meta']
+    except Exception:
+        return False  # partial or corrupt result, redo it
+    return meta.get('fingerprint') == _fingerprint(source, stride)
+
+def write_result(path, meta, columns):
+    """Atomic write (temp file + rename) so an interrupted run never leaves a half result."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    if path.suffix == '.parquet':
+        table = pyarrow.table(columns)
+        table = table.replace_schema_metadata({'meta': json.dumps(meta)})
+        pq.write_table(table, tmp, compression='zstd')
+    else:
+        with gzip.open(tmp, 'wt') as f:
+            json.dump({'meta': meta, 'detections': columns}, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+def read_result(path):
+    path = Path(path)
+    if path.suffix == '.parquet':
+        table = pq.read_table(path)
+        meta = json.loads(table.schema.metadata[b'meta'])
+        return {'meta': meta, 'detections': table.to_pydict()}
+    with gzip.open(path, 'rt') as f:
+        return json.load(f)
+
+def process_file(source, detector, options):
+    """Detect on one video and write its columnar result. Returns the result meta."""
+    start = time.time()
+    reader = FrameReader(source, options['stride'], options['queue_size'])
+    columns = {name: [] for name in COLUMNS}
+    processed = 0
+
+    try:
+        for batch in batches(reader, options['batch_size']):
+            results = detector.predict_batch([frame for _, frame in batch])
+            for (index, _), result in zip(batch, results):
+                processed += 1
+                if result.boxes is None or len(result.boxes) == 0:
+                    continue
+                for x1, y1, x2, y2, conf, cls in result.boxes.cpu().numpy().data:
+                    columns['frame'].append(index)
+                    columns['time'].append(round(index / reader.fps, 3))
+                    columns['x1'].append(round(float(x1), 1))
+                    columns['y1'].append(round(float(y1), 1))
+                    columns['x2'].append(round(float(x2), 1))
+                    columns['y2'].append(round(float(y2), 1))
+                    columns['conf'].append(round(float(conf), 3))
+                    columns['cls'].append(int(cls))
+    finally:
+        # The decoder thread would block forever on a full queue after a detector error
+        reader.stop()
+
+    elapsed = time.time() - start
+    meta = {
+        'source': str(Path(source).resolve()),
+        'fingerprint': _fingerprint(source, reader.stride),
+        'fps': reader.fps,
+        'frames': reader.frames_read,
+        'frames_processed': processed,
+        'stride': reader.stride,
+        'detections': len(columns['frame']),
+        'frames_with_detections': len(set(columns['frame'])),
+        'max_conf': max(columns['conf'], default=0.0),
+        'names': {int(k): v for k, v in detector.names.items()},
+        'elapsed': round(elapsed, 2),
+        'processed_at': time.time()
+    }
+    write_result(output_path(source, options['output_dir'], options['format']), meta, columns)
+    return meta
+
+# Worker process state
+_detector = None
+
+def load_detector(config, options):
+    if options.get('stub'):
+        from benchmarks.stub_detector import StubDetector
+        return StubDetector(config['detection'])
+    from detection.model import LeopardDetector
+    return LeopardDetector(config['detection']['model_path'], config['detection'])
+
+def _init_worker(config, options):
+    global _detector
+    # Split the cores between workers instead of every worker using all of them
+    threads = max(1, (os.cpu_count() or 1) // options['workers'])
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _detector = load_detector(config, options)
+
+def _process_in_worker(source, options):
+    return process_file(source, _detector, options)
+
+def find_videos(inputs):
+    videos = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            videos.extend(sorted(p for p in path.rglob('*') if p.suffix.lower() in VIDEO_EXTENSIONS))
+        elif path.exists():
+            videos.append(path)
+        else:
+            logger.warning(f"Skipping {item}: not found")
+    return videos
+
+def run(videos, config, options):
+    """Process every video not already done; returns (processed metas, failures)."""
+    pending = [v for v in videos if not is_done(v, options['output_dir'], options['format'], options['stride'])]
+    skipped = len(videos) - len(pending)
+    if skipped:
+        logger.info(f"Resuming: {skipped} of {len(videos)} files already processed")
+
+    done, failed = [], []
+    if not pending:
+        return done, failed
+
+    if options['workers'] <= 1:
+        detector = load_detector(config, options)
+        for video in pending:
+            try:
+                meta = process_file(video, detector, options)
+                done.append(meta)
+                logger.info(f"[{len(done)}/{len(pending)}] {video}: {meta['detections']} detections in {meta['elapsed']}s")
+            except Exception as e:
+                failed.append((str(video), str(e)))
+                logger.error(f"Failed to process {video}: {e}")
+        return done, failed
+
+    # Spawned workers load their own detector once and then take files from the pool
+    with ProcessPoolExecutor(
+        max_workers=options['workers'],
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(config, options)
+    ) as pool:
+        futures = {pool.submit(_process_in_worker, str(video), options): video for video in pending}
+        for future in as_completed(futures):
+            video = futures[future]
+            try:
+                meta = future.result()
+                done.append(meta)
+                logger.info(f"[{len(done)}/{len(pending)}] {video}: {meta['detections']} detections in {meta['elapsed']}s")
+            except Exception as e:
+                failed.append((str(video), str(e)))
+                logger.error(f"Failed to process {video}: {e}")
+    return done, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch detection over archived video files")
+    parser.add_argument("inputs", nargs="+", help="Video files or directories (searched recursively)")
+    parser.add_argument("--config", type=str, default="configs/config.yaml")
+    parser.add_argument("--output-dir", type=str, default=None)
+    parser.add_argument("--batch-size", type=int, default=None, help="Frames per detector call")
+    parser.add_argument("--stride", type=int, default=None, help="Run detection on every Nth frame")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (files in parallel)")
+    parser.add_argument("--format", choices=["json", "parquet"], default=None)
+    parser.add_argument("--stub", action="store_true", help="Stub detector, for dry runs without weights")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    batch_config = config.get('batch', {})
+
+    options = {
+        'output_dir': args.output_dir or batch_config.get('output_dir', 'output/batch'),
+        'batch_size': args.batch_size or batch_config.get('batch_size', 16),
+        'stride': args.stride or batch_config.get('stride', 1),
+        'workers': args.workers or batch_config.get('workers', 1),
+        'format': args.format or batch_config.get('format', 'json'),
+        'queue_size': batch_config.get('queue_size', 64),
+        'stub': args.stub
+    }
+    if options['format'] == 'parquet' and pq is None:
+        parser.error("--format parquet needs pyarrow (pip install pyarrow)")
+
+    videos = find_videos(args.inputs)
+    logger.info(f"Found {len(videos)} videos, writing results to {options['output_dir']}")
+    start = time.time()
+    done, failed = run(videos, config, options)
+
+    frames = sum(meta['frames'] for meta in done)
+    elapsed = time.time() - start
+    logger.info(
+        f"Processed {len(done)} files ({frames} frames) in {elapsed:.1f}s"
+        f" ({frames / max(elapsed, 1e-6):.0f} frames/s), {len(failed)} failed"
+    )
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
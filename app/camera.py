@@ -2,12 +2,21 @@ import cv2
 import time
 import logging
 import threading
-from queue import Queue
+from queue import Queue, Full, Empty
 
 logger = logging.getLogger(__name__)
 
 class CameraStream:
-    def __init__(self, source, reconnect_interval=5, buffer_size=128, file_mode=False):
+    """
+    Background capture for live sources.
+    capture_mode='queue' buffers up to buffer_size frames (oldest dropped when full).
+    capture_mode='latest' keeps only the newest decoded frame in a single slot so
+    read() never returns old frames; with grab_when_behind, frames arriving while
+    the consumer still has an unread frame are grabbed without being decoded.
+    With a FramePool, frames are decoded into recycled buffers.
+    """
+    def __init__(self, source, reconnect_interval=5, buffer_size=128, file_mode=False,
+                 capture_mode='queue', grab_when_behind=False, read_timeout=0.1, pool=None):
         self.source = source
         self.reconnect_interval = reconnect_interval
         self.frame_queue = Queue(maxsize=buffer_size)
@@ -16,6 +25,21 @@ class CameraStream:
         self.lock = threading.Lock()
         self.file_mode = file_mode
         self.file_cap = None
+        self.pool = pool
+        self.frame_shape = None
+
+        # Latest-frame slot
+        self.capture_mode = capture_mode
+        self.grab_when_behind = grab_when_behind
+        self.read_timeout = read_timeout
+        self.frame_ready = threading.Condition(self.lock)
+        self.latest_frame = None
+        self.latest_time = None
+
+        # Stats
+        self.frames_captured = 0
+        self.dropped_frames = 0  # never decoded (grabbed only) or evicted from the queue
+        self.stale_frames = 0    # decoded but replaced by a newer frame before being read
         
         # Determine if source is int (webcam) or str (file/rtsp)
         try:
@@ -46,7 +70,20 @@ class CameraStream:
                 cap = cv2.VideoCapture(self.source)
                 continue
 
-            ret, frame = cap.read()
+            if self.capture_mode == 'latest' and self.grab_when_behind and self._consumer_behind():
+                # Consumer hasn't taken the last frame: advance the stream without
+                # decoding and discard the now outdated slot frame.
+                ret = cap.grab()
+                frame = None
+                if ret:
+                    with self.lock:
+                        if self.latest_frame is not None:
+                            self.latest_frame = None
+                            self.stale_frames += 1
+                        self.dropped_frames += 1
+            else:
+                ret, frame = self._read_into(cap)
+
             if not ret:
                 logger.warning(f"Failed to read frame from {self.source}. Reconnecting...")
                 cap.release()
@@ -54,26 +91,83 @@ class CameraStream:
                 cap = cv2.VideoCapture(self.source)
                 continue
 
+            self.frames_captured += 1
+            if frame is None:
+                continue
+
+            if self.capture_mode == 'latest':
+                self._publish_latest(frame)
+                continue
+
             # Keep queue full (drop oldest if full)
-            if self.frame_queue.full():
+            try:
+                self.frame_queue.put_nowait(frame)
+            except Full:
                 try:
                     self.frame_queue.get_nowait()
-                except:
+                    self.dropped_frames += 1
+                except Empty:
                     pass
-            
-            self.frame_queue.put(frame)
+                self.frame_queue.put_nowait(frame)
 
         cap.release()
 
+    def _read_into(self, cap):
+        """cap.read() into a pooled buffer once the frame size is known."""
+        if self.pool is None or self.frame_shape is None:
+            ret, frame = cap.read()
+        else:
+            ret, frame = cap.read(self.pool.acquire(self.frame_shape))
+        if ret:
+            self.frame_shape = frame.shape
+        return ret, frame
+
+    def _consumer_behind(self):
+        with self.lock:
+            return self.latest_frame is not None
+
+    def _publish_latest(self, frame):
+        with self.frame_ready:
+            if self.latest_frame is not None:
+                self.stale_frames += 1
+            self.latest_frame = frame
+            self.latest_time = time.time()
+            self.frame_ready.notify()
+
+    def _read_latest(self):
+        with self.frame_ready:
+            if self.latest_frame is None:
+                self.frame_ready.wait(self.read_timeout)
+            frame = self.latest_frame
+            self.latest_frame = None
+            return frame
+
+    def source_fps(self):
+        """Frame rate reported by a video file, None for live sources."""
+        if self.file_cap is not None and self.file_cap.isOpened():
+            return self.file_cap.get(cv2.CAP_PROP_FPS) or None
+        return None
+
+    def stats(self):
+        return {
+            'captured': self.frames_captured,
+            'dropped': self.dropped_frames,
+            'stale': self.stale_frames,
+            'queue_depth': self.frame_queue.qsize()
+        }
+
     def read(self):
         if self.file_mode:
             if self.file_cap and self.file_cap.isOpened():
-                ret, frame = self.file_cap.read()
+                ret, frame = self._read_into(self.file_cap)
                 if ret:
                     return frame
                 else:
                     return None
             return None
+
+        if self.capture_mode == 'latest':
+            return self._read_latest()
             
         if self.frame_queue.empty():
             return None
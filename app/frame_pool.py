@@ -0,0 +1,56 @@
+import sys
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class FramePool:
+    """
+    Reusable frame-sized buffers, kept per (shape, dtype).
+    A buffer is handed out again once nothing but the pool references it
+    (checked with the reference count), so consumers (queues, the stream, the
+    recorder) can hold on to frames as long as they like without copying.
+    When every buffer of a shape is in use a fresh array is allocated and
+    counted as a miss.
+    """
+    def __init__(self, max_buffers=16):
+        self.max_buffers = max_buffers
+        self.buffers = {}  # (shape, dtype) -> [arrays]
+        self.lock = threading.Lock()
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        """A writeable array of the given shape; its contents are undefined."""
+        key = (tuple(shape), np.dtype(dtype))
+        with self.lock:
+            buffers = self.buffers.setdefault(key, [])
+            for buf in buffers:
+                # References: the pool list, the loop variable and getrefcount's argument
+                if sys.getrefcount(buf) <= 3:
+                    buf.flags.writeable = True
+                    self.hits += 1
+                    return buf
+            buf = np.empty(key[0], key[1])
+            if len(buffers) < self.max_buffers:
+                buffers.append(buf)
+            else:
+                self.misses += 1
+            return buf
+
+    def stats(self):
+        with self.lock:
+            return {
+                'buffers': sum(len(b) for b in self.buffers.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+def freeze(frame):
+    """Read-only handoff: consumers may keep the array but not modify it."""
+    if frame is not None:
+        frame.flags.writeable = False
+    return frame
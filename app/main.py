@@ -1,15 +1,25 @@
 from app.pipeline import Pipeline
+from app.multi_camera import MultiCameraPipeline
 import logging
 import signal
 import sys
+import yaml
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def build_pipeline(config_path='configs/config.yaml'):
+    """Multi-camera mode is enabled by listing sources under `cameras` in config."""
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    if config.get('cameras'):
+        return MultiCameraPipeline(config_path)
+    return Pipeline(config_path)
+
 def main():
     logger.info("Initializing Leopard Detection System...")
-    pipeline = Pipeline()
+    pipeline = build_pipeline()
     
     def signal_handler(sig, frame):
         logger.info("Shutting down...")
@@ -20,6 +30,7 @@ def main():
     signal.signal(signal.SIGTERM, signal_handler)
 
     pipeline.run()
+    pipeline.stop()
 
 if __name__ == "__main__":
     main()
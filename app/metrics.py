@@ -0,0 +1,138 @@
+import bisect
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds (0.5 ms .. 2.5 s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class Histogram:
+    """Fixed-bucket histogram. observe() is a bisect and three increments."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self, start):
+        """Observe the time elapsed since `start` (a time.perf_counter() value)."""
+        self.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None when empty)."""
+        counts, _, count = self.snapshot()
+        if count == 0:
+            return None
+        target = q * count
+        seen = 0
+        for bound, n in zip(self.buckets + (float('inf'),), counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float('inf')
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + (extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+class MetricsRegistry:
+    """
+    Process-wide metrics in the Prometheus text format.
+    Histograms and counters are updated on the hot path; gauges (queue
+    depths, fps, skip rate) are callbacks evaluated only when /metrics is
+    scraped, so they cost nothing per frame.
+    """
+    def __init__(self):
+        self.metrics = {}  # name -> {'type', 'help', 'series': {label key: Histogram | Counter | callable}}
+        self.lock = threading.Lock()
+
+    def _series(self, name, kind, help_text, labels, factory):
+        key = _label_key(labels)
+        with self.lock:
+            metric = self.metrics.setdefault(name, {'type': kind, 'help': help_text, 'series': {}})
+            series = metric['series'].get(key)
+            if series is None:
+                series = metric['series'][key] = factory()
+            return series
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS, **labels):
+        return self._series(name, 'histogram', help_text, labels, lambda: Histogram(buckets))
+
+    def counter(self, name, help_text, **labels):
+        return self._series(name, 'counter', help_text, labels, Counter)
+
+    def callback(self, name, help_text, fn, kind='gauge', **labels):
+        """Register fn() as the value of a gauge (or counter) series; replaces an earlier one."""
+        key = _label_key(labels)
+        with self.lock:
+            metric = self.metrics.setdefault(name, {'type': kind, 'help': help_text, 'series': {}})
+            metric['series'][key] = fn
+
+    def render(self):
+        with self.lock:
+            metrics = [(name, dict(m, series=dict(m['series']))) for name, m in sorted(self.metrics.items())]
+
+        lines = []
+        for name, metric in metrics:
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for key, series in metric['series'].items():
+                if isinstance(series, Histogram):
+                    counts, total, count = series.snapshot()
+                    cumulative = 0
+                    for bound, n in zip(series.buckets + (float('inf'),), counts):
+                        cumulative += n
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {total}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+                    continue
+
+                if isinstance(series, Counter):
+                    value = series.value
+                else:
+                    try:
+                        value = series()
+                    except Exception as e:
+                        logger.debug(f"Metric {name} unavailable: {e}")
+                        continue
+                if value is not None:
+                    lines.append(f"{name}{_format_labels(key)} {float(value)}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+def stage_timer(stage, camera=None):
+    """Histogram of one pipeline stage's latency."""
+    return REGISTRY.histogram(
+        'pantheravision_stage_seconds', 'Time spent per frame in each pipeline stage',
+        stage=stage, camera=camera
+    )
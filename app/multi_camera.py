@@ -0,0 +1,89 @@
+import copy
+import logging
+import threading
+import yaml
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.pipeline import Pipeline
+from app.streaming import create_stream_server
+from detection.model import LeopardDetector
+from detection.batching import BatchInferenceWorker
+from alerts.notifier import AlertSystem
+
+logger = logging.getLogger(__name__)
+
+class MultiCameraPipeline:
+    """
+    Runs one Pipeline per entry of the `cameras` config list.
+    All cameras share a single detector (batched through BatchInferenceWorker),
+    alert system and stream server.
+    """
+    def __init__(self, config_path='configs/config.yaml'):
+        with open(config_path, 'r') as f:
+            self.config = yaml.safe_load(f)
+
+        camera_configs = self.config.get('cameras') or []
+        if not camera_configs:
+            raise ValueError("Multi-camera mode requires a non-empty 'cameras' list in config")
+
+        det_config = self.config['detection']
+        self.detector = LeopardDetector(det_config['model_path'], det_config)
+        self.inference_worker = BatchInferenceWorker(
+            self.detector,
+            batch_size=det_config.get('batch_size', len(camera_configs)),
+            max_wait=det_config.get('batch_timeout_ms', 20) / 1000.0
+        )
+        self.alert_system = AlertSystem(self.config)
+        self.stream_server = create_stream_server(self.config.get('server', {}))
+
+        self.pipelines = []
+        for i, camera_config in enumerate(camera_configs):
+            self.pipelines.append(Pipeline(
+                config=self._camera_config(i, camera_config),
+                detector=self.inference_worker,
+                alert_system=self.alert_system,
+                stream_server=self.stream_server
+            ))
+        self.threads = []
+
+    def _camera_config(self, index, camera_config):
+        """Per-camera config: entries in `cameras` override the base `camera` (and `motion`) section."""
+        config = copy.deepcopy(self.config)
+        camera_config = dict(camera_config)
+        # A camera may also override the motion settings (e.g. a cheaper backend)
+        motion_overrides = camera_config.pop('motion', None) or {}
+        config['motion'] = {**self.config.get('motion', {}), **motion_overrides}
+        config['camera'] = {**self.config.get('camera', {}), **camera_config}
+        config['camera'].setdefault('name', f"camera_{index}")
+        return config
+
+    def run(self):
+        logger.info(f"Starting PantheraVision with {len(self.pipelines)} cameras...")
+        self.inference_worker.start()
+        self.stream_server.start()
+
+        for pipeline in self.pipelines:
+            thread = threading.Thread(target=self._run_pipeline, args=(pipeline,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+        for thread in self.threads:
+            thread.join()
+
+    def _run_pipeline(self, pipeline):
+        try:
+            pipeline.run()
+        except Exception as e:
+            logger.error(f"Camera '{pipeline.name}' pipeline failed: {e}")
+
+    def stop(self):
+        for pipeline in self.pipelines:
+            pipeline.stop()
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self.inference_worker.stop()
+        self.alert_system.stop()
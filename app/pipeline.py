@@ -1,5 +1,6 @@
 import time
 import cv2
+import numpy as np
 import logging
 import threading
 import yaml
@@ -10,11 +11,20 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from app.camera import CameraStream
-from app.streaming import StreamServer
+from app.streaming import create_stream_server, register_stats
+from app.stages import StagedExecutor
+from app.recorder import VideoRecorder
+from app.frame_pool import FramePool, freeze
+from app.metrics import REGISTRY, stage_timer
 from motion.optical_flow import MotionDetector
-from detection.model import LeopardDetector
-from detection.filters import DetectionFilter
+from detection.model import LeopardDetector, make_results
+from detection import roi
+from detection.filters import DetectionFilter, REASON_KEYS, VALID
 from tracking.tracker import ObjectTracker
+from tracking.propagation import FlowPropagator
+from app.scheduler import DetectionScheduler
+from app.profiles import SceneProfiler
+from app.zones import Zones, inference_size
 from alerts.notifier import AlertSystem
 
 # Configure logging
@@ -22,132 +32,438 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 class Pipeline:
-    def __init__(self, config_path='configs/config.yaml'):
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+    def __init__(self, config_path='configs/config.yaml', config=None, detector=None,
+                 alert_system=None, stream_server=None):
+        """
+        Single camera pipeline.
+        `config` and the shared components can be injected by MultiCameraPipeline,
+        in which case this pipeline does not own (start/stop) them.
+        """
+        if config is None:
+            with open(config_path, 'r') as f:
+                config = yaml.safe_load(f)
+        self.config = config
 
         # Check if source is a file
         source = self.config['camera']['source']
         self.is_file = isinstance(source, str) and Path(source).exists()
+        self.name = self.config['camera'].get('name')
         
-        self.camera = CameraStream(source, file_mode=self.is_file)
-        self.stream_server = StreamServer()
-        self.motion_detector = MotionDetector(self.config['motion'])
-        self.detector = LeopardDetector(self.config['detection']['model_path'], self.config['detection'])
+        # Recycled frame buffers (camera frames, motion masks, annotated frames)
+        self.pipeline_config = self.config.get('pipeline', {})
+        self.frame_pool = FramePool(self.pipeline_config.get('frame_pool_size', 32))
+
+        camera_config = self.config['camera']
+        self.camera = CameraStream(
+            source,
+            reconnect_interval=camera_config.get('reconnect_interval', 5),
+            buffer_size=camera_config.get('buffer_size', 128),
+            file_mode=self.is_file,
+            capture_mode=camera_config.get('capture_mode', 'queue'),
+            grab_when_behind=camera_config.get('grab_when_behind', False),
+            pool=self.frame_pool
+        )
+        self.motion_detector = MotionDetector(self.config['motion'], pool=self.frame_pool)
         self.filter = DetectionFilter(self.config)
         self.tracker = ObjectTracker(self.config['tracking'])
-        self.alert_system = AlertSystem(self.config)
+
+        # Shared components (detector weights, alert DB, web server) are only
+        # created here when running standalone
+        self.owns_stream_server = stream_server is None
+        self.owns_alert_system = alert_system is None
+        self.stream_server = stream_server or create_stream_server(self.config.get('server', {}))
+        self.detector = detector or LeopardDetector(self.config['detection']['model_path'], self.config['detection'])
+        self.alert_system = alert_system or AlertSystem(self.config)
         
+        self.roi_inference = self.config['detection'].get('roi_inference', False)
+        self.executor = None
+
+        # Static include/exclude zones, rasterized once per resolution: the
+        # motion one and, for the configured frame size, the inference one are
+        # built here so the first detection does not pay for them
+        self.zones = Zones(camera_config.get('zones'))
+        self.inference_size = inference_size(self.config)
+        if self.zones.enabled:
+            self.motion_detector.set_zone_mask(self.zones.mask(self.motion_detector.size))
+            frame_shape = (camera_config.get('height', 1080), camera_config.get('width', 1920))
+            self.zones.coverage(frame_shape, self.inference_size)
+            logger.info(f"Detection zones: {self.zones.region.area:.0%} of the frame is active")
+
+        # Detection cadence; tracks are propagated on the frames in between
+        scheduler_config = self.config.get('scheduler', {})
+        self.scheduler = DetectionScheduler(scheduler_config)
+        self.schedule_files = scheduler_config.get('apply_to_files', False)
+        self.propagator = None
+        if scheduler_config.get('propagation', 'kalman') == 'lk':
+            self.propagator = FlowPropagator(scheduler_config)
+        self.reported_tracks = set()  # confirmed track ids from the last detection
+
+        # Day/dusk/night/idle operating profiles chosen from scene statistics
+        self.profiler = SceneProfiler(self.config.get('profiles', {}))
+        self.stream_interval = 0.0  # minimum seconds between published stream frames
+        self.last_published = 0.0
+
         self.running = True
         self.frame_count = 0
         self.start_time = time.time()
         
-        # specific to output video
-        output_dir = Path("output")
-        output_dir.mkdir(parents=True, exist_ok=True)
-        self.output_path = output_dir / "leopard_detection_output.mp4"
-        self.video_writer = None
+        # Recording (started in run(), once the source frame rate is known)
+        self.recording_config = self.config.get('recording', {})
+        self.recorder = None
+        self.source_fps = None
+
+        # Reported by the stream server's /health endpoint
+        register_stats(self.name or 'pipeline', self.stats)
+        self._register_metrics()
 
     def run(self):
-        logger.info("Starting PantheraVision Pipeline...")
+        if self.name:
+            logger.info(f"Starting PantheraVision Pipeline for camera '{self.name}'...")
+        else:
+            logger.info("Starting PantheraVision Pipeline...")
         self.camera.start()
-        self.stream_server.start()
+        self._start_recorder()
+        if self.owns_stream_server:
+            self.stream_server.start()
+
+        if self.pipeline_config.get('execution', 'sequential') == 'staged':
+            self._run_staged()
+        else:
+            self._run_sequential()
+
+    def _register_metrics(self):
+        """Per-stage latency histograms plus gauges read when /metrics is scraped."""
+        self.timers = {
+            stage: stage_timer(stage, self.name)
+            for stage in ('capture_wait', 'motion', 'inference', 'filter', 'track', 'draw', 'alert', 'publish')
+        }
+        camera = self.name
+        elapsed = lambda: max(time.time() - self.start_time, 1e-6)
+        REGISTRY.callback('pantheravision_frames_total', 'Frames processed', lambda: self.frame_count,
+                          kind='counter', camera=camera)
+        REGISTRY.callback('pantheravision_fps', 'Effective processing frame rate',
+                          lambda: self.frame_count / elapsed(), camera=camera)
+        REGISTRY.callback('pantheravision_inference_skip_rate', 'Fraction of frames without a detector run',
+                          self.scheduler.skip_rate, camera=camera)
+        REGISTRY.callback('pantheravision_camera_queue_depth', 'Frames waiting in the capture queue',
+                          self.camera.frame_queue.qsize, camera=camera)
+        REGISTRY.callback('pantheravision_camera_dropped_frames_total', 'Captured frames never processed',
+                          lambda: self.camera.dropped_frames + self.camera.stale_frames, kind='counter', camera=camera)
+        REGISTRY.callback('pantheravision_frame_pool_misses_total', 'Frame buffers allocated because the pool was exhausted',
+                          lambda: self.frame_pool.misses, kind='counter', camera=camera)
+        REGISTRY.callback('pantheravision_recorder_queue_depth', 'Frames waiting for the recorder thread',
+                          lambda: self.recorder.queue.qsize() if self.recorder else None, camera=camera)
+        REGISTRY.callback('pantheravision_recorder_dropped_frames_total', 'Frames the recorder could not keep up with',
+                          lambda: self.recorder.dropped_frames if self.recorder else None, kind='counter', camera=camera)
+        REGISTRY.callback('pantheravision_profile_switches_total', 'Scene profile changes',
+                          lambda: self.profiler.switches, kind='counter', camera=camera)
+        REGISTRY.callback('pantheravision_inference_size', 'Current detector input size (long side)',
+                          lambda: getattr(getattr(self.detector, 'resolution', None), 'size', None), camera=camera)
+        self.rejected = {
+            code: REGISTRY.counter('pantheravision_detections_rejected_total', 'Detector boxes dropped by the filter',
+                                   camera=camera, reason=key)
+            for code, key in enumerate(REASON_KEYS) if code != VALID
+        }
+
+    def _start_recorder(self):
+        if not self.recording_config.get('enabled', True):
+            return
+        if self.is_file:
+            # Files are recorded on their own timeline so the output plays at the source rate
+            self.source_fps = self.camera.source_fps() or self.config['camera'].get('fps', 30)
+        continuous = self.recording_config.get('continuous', 'files')
+        self.recorder = VideoRecorder(
+            self.recording_config,
+            name=self.name,
+            output_dir=self.config.get('system', {}).get('output_dir', 'output'),
+            fps=self.source_fps,
+            continuous=continuous == 'always' or (continuous == 'files' and self.is_file)
+        )
+        self.alert_system.register_recorder(self.name, self.recorder)
+
+    def _next_frame(self):
+        """
+        Returns the next frame context, None to retry, or False at end of stream.
+        """
+        start = time.perf_counter()
+        frame = self.camera.read()
+        if frame is None:
+            if self.is_file:
+                logger.info("End of video file reached.")
+                return False
+            time.sleep(0.01)
+            return None
+
+        self.timers['capture_wait'].time(start)
+        self.frame_count += 1
+        # Stages share the frame by reference and must not modify it
+        return {'frame': freeze(frame), 'time': time.time(), 'index': self.frame_count}
 
+    def _run_sequential(self):
         while self.running:
-            frame = self.camera.read()
-            if frame is None:
-                if self.is_file:
-                    logger.info("End of video file reached.")
-                    break
-                time.sleep(0.01)
+            ctx = self._next_frame()
+            if ctx is False:
+                break
+            if ctx is None:
                 continue
 
-            current_time = time.time()
-            self.frame_count += 1
-            
-            # 1. Motion Detection
-            has_motion, motion_mask, motion_rects = self.motion_detector.detect(frame)
-            
-            detections = []
-            
-            # 2. Inference (run every frame if file mode to assure accuracy, or skip if needed)
-            # For video file output, we generally want every frame processed for smoothness
-            if self.is_file or has_motion or (self.frame_count % 30 == 0):
-                # YOLO Prediction
-                results = self.detector.predict(frame)
-                
-                # Check boxes (x1, y1, x2, y2, conf, cls) in results.boxes
-                if results.boxes is not None:
-                     for box in results.boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].tolist()
-                        conf = float(box.conf[0])
-                        cls = int(box.cls[0])
-                        class_name = results.names[cls]
-                        
-                        # UX Improvement: Map 'cat' to 'Leopard'
-                        if class_name.lower() == 'cat':
-                            class_name = 'Leopard'
-                        
-                        # 3. Filtering
-                        valid, reason = self.filter.validate_detection(
-                            (x1, y1, x2, y2), conf, motion_rects=motion_rects if has_motion else None
-                        )
-                        
-                        if valid:
-                            detections.append((x1, y1, x2, y2, -1, conf, cls)) # -1 ID initially
-
-            # 4. Tracking
-            tracks = self.tracker.update(detections)
-            
-            annotated_frame = frame.copy()
-            
-            # Draw motion rects
-            if motion_rects:
-                for x, y, w, h in motion_rects:
-                    cv2.rectangle(annotated_frame, (x, y), (x+w, y+h), (255, 0, 0), 1)
-
-            # Draw Detections & Trigger Alerts
-            if detections:
-                # Flashing Alert
-                if int(time.time() * 5) % 2 == 0: # Flash every 0.2s
-                    cv2.putText(annotated_frame, "WARNING: LEOPARD DETECTED!", (50, 100), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 255), 4)
-                
-            for det in detections:
-                x1, y1, x2, y2, _, conf, _ = det
-                
-                # Alert Logic
-                self.alert_system.trigger_alert({'conf': conf, 'bbox': [x1, y1, x2, y2]}, annotated_frame)
-                
-                # Draw Box ONLY (No Text)
-                cv2.rectangle(annotated_frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 255), 2)
-
-            # Update Stream
-            self.stream_server.update_frame(annotated_frame)
-            
-            # Write to video file
-            if self.video_writer is None:
-                height, width = annotated_frame.shape[:2]
-                logger.info(f"Initializing VideoWriter with {width}x{height} @ 30.0 fps")
-                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                self.output_path = self.output_path.with_suffix('.mp4') # Ensure mp4 extension
-                self.video_writer = cv2.VideoWriter(str(self.output_path), fourcc, 30.0, (width, height))
-                
-                if not self.video_writer.isOpened():
-                    logger.error("Failed to open VideoWriter!")
-                else:
-                    logger.info(f"VideoWriter initialized successfully at {self.output_path}")
-            
-            if self.video_writer and self.video_writer.isOpened():
-                self.video_writer.write(annotated_frame)
+            self._stage_motion(ctx)
+            self._stage_inference(ctx)
+            self._stage_postprocess(ctx)
+            self._stage_output(ctx)
+
+    def _run_staged(self):
+        """
+        Runs motion, inference, post-processing and output on their own threads
+        connected by bounded queues. Files keep every frame in order; live
+        sources drop the oldest queued frames when a stage falls behind.
+        """
+        drop_stale = self.pipeline_config.get('drop_stale')
+        if drop_stale is None:
+            drop_stale = not self.is_file
+
+        executor = StagedExecutor([
+            ('motion', self._stage_motion),
+            ('inference', self._stage_inference),
+            ('postprocess', self._stage_postprocess),
+            ('output', self._stage_output),
+        ], queue_size=self.pipeline_config.get('queue_size', 4), drop_stale=drop_stale).start()
+        self.executor = executor
+        for stage, in_queue in zip(executor.stages, executor.queues):
+            REGISTRY.callback('pantheravision_stage_queue_depth', 'Frames waiting for each pipeline stage',
+                              in_queue.qsize, camera=self.name, stage=stage.name)
+            REGISTRY.callback('pantheravision_stage_dropped_frames_total', 'Frames dropped in front of each stage',
+                              lambda q=in_queue: q.dropped, kind='counter', camera=self.name, stage=stage.name)
+
+        stats_interval = self.pipeline_config.get('stats_interval', 30)
+        last_stats = time.time()
+
+        while self.running:
+            ctx = self._next_frame()
+            if ctx is False:
+                break
+            if ctx is None:
+                continue
+
+            executor.feed(ctx)
+
+            if stats_interval and time.time() - last_stats > stats_interval:
+                executor.log_stats()
+                last_stats = time.time()
+
+        executor.close()
+        executor.log_stats()
+
+    def _stage_motion(self, ctx):
+        # 1. Motion Detection
+        start = time.perf_counter()
+        has_motion, motion_mask, motion_rects = self.motion_detector.detect(ctx['frame'])
+        ctx['has_motion'] = has_motion
+        ctx['motion_mask'] = motion_mask
+        ctx['motion_rects'] = motion_rects
+        # Summed-area table: whole-frame and per-box motion fractions become lookups
+        coverage = self.motion_detector.coverage(motion_mask, ctx['frame'].shape)
+        ctx['motion_coverage'] = coverage
+        ctx['motion_fraction'] = coverage.total_fraction() if coverage is not None else 0.0
+        profile = self.profiler.observe_frame(ctx['frame'], ctx['motion_fraction'])
+        if profile is not None:
+            self._apply_profile(profile)
+        self.timers['motion'].time(start)
+        return ctx
+
+    def _apply_profile(self, settings):
+        """
+        Switch motion thresholds, detection cadence and size, and stream rate to
+        a scene profile. Each section is the base config with the profile's
+        overrides, so settings a profile leaves out return to the base values.
+        """
+        self.scheduler.configure({**self.config.get('scheduler', {}), **(settings.get('scheduler') or {})})
+        self.motion_detector.configure({**self.config['motion'], **(settings.get('motion') or {})})
+        # Only a detector of our own; the shared multi-camera worker has no resolution
+        resolution = getattr(self.detector, 'resolution', None)
+        if resolution is not None:
+            resolution.limit(settings.get('img_size'))
+        fps = settings.get('stream_fps')
+        self.stream_interval = 1.0 / fps if fps else 0.0
+
+    def _stage_inference(self, ctx):
+        # 2. Inference (run every frame if file mode to assure accuracy, or as scheduled)
+        # For video file output, we generally want every frame processed for smoothness
+        ctx['results'] = None
+        if self.is_file and not self.schedule_files:
+            run_detection = True
+        else:
+            run_detection = self.scheduler.should_detect(ctx['index'], ctx['has_motion'], ctx['motion_fraction'])
+
+        if run_detection:
+            # YOLO Prediction (only on the moving regions in ROI mode, and never
+            # outside the bounding box of the include zones)
+            start = time.perf_counter()
+            frame = ctx['frame']
+            regions = None
+            if self.roi_inference and ctx['has_motion']:
+                regions = roi.plan_crops(frame.shape, ctx['motion_rects'], self.config['detection'])
+            if regions is None and self.zones.enabled:
+                region = self.zones.crop_region(frame.shape)
+                regions = [region] if region is not None else None
+            if regions is None:
+                ctx['results'] = self.detector.predict(frame)
+            else:
+                dets = roi.predict_regions(self.detector, frame, regions, self.config['detection'].get('iou_threshold', 0.45))
+                ctx['results'] = make_results(frame, dets, self.detector.names)
+            self.timers['inference'].time(start)
+        return ctx
+
+    def _stage_postprocess(self, ctx):
+        frame = ctx['frame']
+        has_motion = ctx['has_motion']
+        motion_rects = ctx['motion_rects']
+        results = ctx['results']
+        candidates = []
+        detections = []
+        start = time.perf_counter()
+
+        # 3. Filtering: all boxes (x1, y1, x2, y2, conf, cls) in one vectorized pass
+        if results is not None and results.boxes is not None and len(results.boxes):
+            boxes = results.boxes.cpu().numpy().data
+            valid, reasons = self.filter.validate_batch(
+                boxes,
+                motion_rects if has_motion else None,
+                coverage=ctx['motion_coverage'] if has_motion else None,
+                zones=self.zones.coverage(frame.shape, self.inference_size) if self.zones.enabled else None
+            )
+            for code, count in enumerate(np.bincount(reasons, minlength=len(REASON_KEYS))):
+                if code != VALID and count:
+                    self.rejected[code].inc(int(count))
+            # ID assigned by the tracker
+            candidates = [(x1, y1, x2, y2, -1, conf, int(cls)) for x1, y1, x2, y2, conf, cls in boxes[valid].tolist()]
+
+        # 4. Tracking
+        start = self._lap('filter', start)
+        if results is None:
+            # Detector skipped: follow the confirmed tracks with optical flow or
+            # their Kalman prediction
+            measurements = None
+            if self.propagator is not None:
+                boxes = {tid: t['bbox'] for tid, t in self.tracker.tracks.items() if tid in self.reported_tracks}
+                if boxes:
+                    measurements = self.propagator.propagate(frame, boxes)
+            tracks = self.tracker.predict(measurements)
+            for track_id in self.reported_tracks:
+                if track_id in tracks:
+                    track = tracks[track_id]
+                    x1, y1, x2, y2 = track['bbox']
+                    detections.append((x1, y1, x2, y2, track_id, track['last_conf'], track['cls']))
+        else:
+            tracks = self.tracker.update(candidates)
+
+            # 5. Temporal confirmation of the tracks seen this frame
+            for track_id, track in self.tracker.active_tracks().items():
+                confirmed, reason = self.filter.confirm_track(track_id)
+                if confirmed:
+                    x1, y1, x2, y2 = track['bbox']
+                    detections.append((x1, y1, x2, y2, track_id, track['last_conf'], track['cls']))
+            self.reported_tracks = {det[4] for det in detections}
+            self.profiler.observe_detections(len(detections))
+            if self.propagator is not None and self.reported_tracks:
+                self.propagator.reset(frame)
+        self.filter.clean_history(tracks.keys())
+        self.scheduler.observe_tracks(tracks)
+        start = self._lap('track', start)
+        
+        # Draw on a recycled buffer instead of a fresh copy of the frame
+        annotated_frame = self.frame_pool.acquire(frame.shape)
+        np.copyto(annotated_frame, frame)
+        
+        # Draw motion rects
+        if motion_rects:
+            for x, y, w, h in motion_rects:
+                cv2.rectangle(annotated_frame, (x, y), (x+w, y+h), (255, 0, 0), 1)
+
+        # Draw Detections
+        if detections:
+            # Flashing Alert
+            if int(time.time() * 5) % 2 == 0: # Flash every 0.2s
+                cv2.putText(annotated_frame, "WARNING: LEOPARD DETECTED!", (50, 100), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 255), 4)
             
+        for det in detections:
+            x1, y1, x2, y2, track_id, conf, _ = det
+            # Draw Box ONLY (No Text)
+            cv2.rectangle(annotated_frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 255), 2)
+
+        # From here on the annotated frame is shared (stream, recorder) and read-only;
+        # the alert system copies it only when it becomes a sighting's best frame
+        freeze(annotated_frame)
+        start = self._lap('draw', start)
+
+        # Trigger Alerts (only on frames the detector actually confirmed)
+        if results is not None and detections:
+            for x1, y1, x2, y2, track_id, conf, _ in detections:
+                self.alert_system.trigger_alert({'conf': conf, 'bbox': [x1, y1, x2, y2], 'track_id': track_id, 'camera': self.name}, annotated_frame)
+            self._lap('alert', start)
+
+        ctx['detections'] = detections
+        ctx['tracks'] = tracks
+        ctx['annotated'] = annotated_frame
+        return ctx
+
+    def _stage_output(self, ctx):
+        annotated_frame = ctx['annotated']
+
+        # Update Stream and hand the frame to the recorder (encoded and written on its thread)
+        start = time.perf_counter()
+        # The scene profile may publish fewer frames than are processed (fewer JPEG encodes)
+        if ctx['time'] - self.last_published >= self.stream_interval:
+            self.stream_server.update_frame(annotated_frame, camera=self.name)
+            self.last_published = ctx['time']
+        if self.recorder is not None:
+            timestamp = ctx['index'] / self.source_fps if self.source_fps else ctx['time']
+            self.recorder.write(annotated_frame, timestamp)
+        self.timers['publish'].time(start)
+        return ctx
+
+    def _lap(self, stage, start):
+        """Record the time since `start` for a stage and return the new start."""
+        now = time.perf_counter()
+        self.timers[stage].observe(now - start)
+        return now
+
+    def stats(self):
+        elapsed = max(time.time() - self.start_time, 1e-6)
+        stats = {
+            'frames': self.frame_count,
+            'fps': self.frame_count / elapsed,
+            'scheduler_mode': self.scheduler.mode,
+            'detector_skip_rate': self.scheduler.skip_rate(),
+            'reported_tracks': len(self.reported_tracks)
+        }
+        if not self.is_file:
+            stats['camera'] = self.camera.stats()
+        if self.executor is not None:
+            stats['stages'] = self.executor.stats()
+        stats['frame_pool'] = self.frame_pool.stats()
+        if self.profiler.enabled:
+            stats['scene'] = self.profiler.stats()
+        return stats
+
     def stop(self):
         self.running = False
         self.camera.stop()
-        self.alert_system.stop()
-        if self.video_writer:
-            self.video_writer.release()
-            logger.info(f"Output video saved to {self.output_path}")
+        if not self.is_file:
+            logger.info(f"Camera stats: {self.camera.stats()}")
+        if self.scheduler.frames:
+            logger.info(f"Detector skipped on {self.scheduler.skip_rate() * 100:.0f}% of frames")
+        latencies = [
+            f"{stage} {timer.quantile(0.5) * 1000:g}/{timer.quantile(0.95) * 1000:g}"
+            for stage, timer in self.timers.items() if timer.count
+        ]
+        if latencies:
+            logger.info(f"Stage latency p50/p95 (ms, bucket bounds): {', '.join(latencies)}")
+        if self.recorder is not None:
+            self.recorder.stop()
+        if self.owns_alert_system:
+            self.alert_system.stop()
 
 if __name__ == "__main__":
     pipeline = Pipeline()
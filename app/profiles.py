@@ -0,0 +1,149 @@
+import logging
+import time
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Used when the config enables profiles without defining them
+DEFAULT_PROFILES = {
+    'idle':  {'scheduler': {'detect_interval': 5, 'idle_interval': 90}, 'img_size': 416, 'stream_fps': 5},
+    'day':   {'scheduler': {'detect_interval': 3, 'idle_interval': 30}, 'img_size': 640, 'stream_fps': 15},
+    'dusk':  {'scheduler': {'detect_interval': 2, 'idle_interval': 15}, 'img_size': 640, 'stream_fps': 15,
+              'motion': {'min_area': 350}},
+    'night': {'scheduler': {'detect_interval': 1, 'idle_interval': 10}, 'img_size': 640, 'stream_fps': 10,
+              'motion': {'min_area': 250, 'var_threshold': 12, 'diff_threshold': 15}},
+}
+
+class SceneProfiler:
+    """
+    Picks an operating profile from scene statistics the pipeline already has:
+      night - dark frames, or the monochrome picture of a camera in IR mode
+      dusk  - low light, the busiest time for leopards
+      day   - daylight with motion or a recent detection
+      idle  - daylight and nothing happening; cheapest settings
+    Each profile (the `profiles` config section) may set `scheduler` intervals,
+    `motion` backend thresholds, the detector `img_size` cap and `stream_fps`.
+    Lighting is re-measured every `interval` frames on a strided sample of the
+    frame. Switches need `confirm` agreeing evaluations and at least
+    `min_dwell` seconds in the current profile, except leaving idle, which
+    happens at once so the first frames of an animal are not missed.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.enabled = config.get('enabled', False)
+        self.profiles = config.get('profiles') or DEFAULT_PROFILES
+        self.interval = max(1, config.get('interval', 30))
+        self.night_luminance = config.get('night_luminance', 40)
+        self.dusk_luminance = config.get('dusk_luminance', 90)
+        self.luminance_margin = config.get('luminance_margin', 8)
+        self.ir_saturation = config.get('ir_saturation', 4)  # 0 for monochrome cameras
+        self.active_motion = config.get('active_motion', 0.005)
+        self.active_hold = config.get('active_hold', 300)
+        self.confirm = max(1, config.get('confirm', 3))
+        self.min_dwell = config.get('min_dwell', 120)
+        self.ema_alpha = config.get('ema_alpha', 0.05)
+        self.sample_step = config.get('sample_step', 16)
+
+        self.profile = None
+        self.lighting = 'day'
+        self.luminance = None
+        self.saturation = None
+        self.motion_ema = 0.0
+        self.detection_rate = 0.0   # EMA of detector runs with a confirmed detection
+        self.last_detection = None
+        self.candidate = None
+        self.votes = 0
+        self.switched_at = 0.0
+        self.frames = 0
+
+        # Stats
+        self.switches = 0
+
+    def observe_frame(self, frame, motion_fraction):
+        """
+        Per-frame update from the motion stage. Returns the settings of a new
+        profile when it should be applied, otherwise None.
+        """
+        if not self.enabled:
+            return None
+        self.motion_ema += self.ema_alpha * (motion_fraction - self.motion_ema)
+        self.frames += 1
+        if self.profile is not None and self.frames % self.interval:
+            return None
+
+        self.measure(frame)
+        return self._evaluate(time.time())
+
+    def observe_detections(self, count):
+        """Called after each detector run with the number of confirmed detections."""
+        self.detection_rate += self.ema_alpha * ((count > 0) - self.detection_rate)
+        if count:
+            self.last_detection = time.time()
+
+    def measure(self, frame):
+        """Mean luminance and colourfulness of every sample_step-th pixel."""
+        sample = frame[::self.sample_step, ::self.sample_step]
+        b, g, r, _ = cv2.mean(sample)
+        self.luminance = 0.114 * b + 0.587 * g + 0.299 * r
+        # IR night images are near-grey: the channels barely differ anywhere
+        self.saturation = float(np.abs(np.diff(sample.astype(np.int16), axis=2)).mean()) if sample.ndim == 3 else 0.0
+
+    def _classify_lighting(self):
+        # Thresholds move by the margin in the direction of the current state (hysteresis)
+        margin = self.luminance_margin
+        night = self.night_luminance + (margin if self.lighting == 'night' else -margin)
+        dusk = self.dusk_luminance + (margin if self.lighting in ('dusk', 'night') else -margin)
+        if self.luminance < night or self.saturation < self.ir_saturation:
+            return 'night'
+        if self.luminance < dusk:
+            return 'dusk'
+        return 'day'
+
+    def _evaluate(self, now):
+        lighting = self._classify_lighting()
+        candidate = lighting
+        if lighting == 'day':
+            active = (
+                self.motion_ema > self.active_motion or
+                (self.last_detection is not None and now - self.last_detection < self.active_hold)
+            )
+            if not active:
+                candidate = 'idle'
+        if candidate not in self.profiles:
+            candidate = 'day' if 'day' in self.profiles else next(iter(self.profiles))
+
+        if self.profile is None or (self.profile == 'idle' and candidate != 'idle'):
+            return self._switch(candidate, lighting, now)
+        if candidate == self.profile:
+            self.candidate, self.votes = None, 0
+            return None
+
+        self.votes = self.votes + 1 if candidate == self.candidate else 1
+        self.candidate = candidate
+        if self.votes >= self.confirm and now - self.switched_at >= self.min_dwell:
+            return self._switch(candidate, lighting, now)
+        return None
+
+    def _switch(self, name, lighting, now):
+        old = self.profile
+        self.profile = name
+        self.lighting = lighting
+        self.candidate, self.votes = None, 0
+        self.switched_at = now
+        if old is not None:
+            self.switches += 1
+        logger.info(
+            f"Scene profile {old or '-'} -> {name} (luminance {self.luminance:.0f}, "
+            f"motion {self.motion_ema:.3f}, detection rate {self.detection_rate:.2f})"
+        )
+        return self.profiles[name]
+
+    def stats(self):
+        return {
+            'profile': self.profile,
+            'luminance': self.luminance,
+            'motion': self.motion_ema,
+            'detection_rate': self.detection_rate,
+            'switches': self.switches,
+        }
@@ -0,0 +1,230 @@
+import cv2
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+from app.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Commands for the writer thread
+_START_CLIP = object()
+_END_CLIP = object()
+_STOP = object()
+
+def open_writer(path, fps, size, codec='mp4v', hw_acceleration=False):
+    """cv2.VideoWriter, using a hardware encoder when requested and available."""
+    fourcc = cv2.VideoWriter_fourcc(*codec)
+    if hw_acceleration:
+        params = [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        writer = cv2.VideoWriter(str(path), cv2.CAP_ANY, fourcc, fps, size, params)
+        if writer.isOpened():
+            return writer
+        logger.warning(f"No hardware encoder for {codec}, falling back to software encoding")
+    writer = cv2.VideoWriter(str(path), fourcc, fps, size)
+    if not writer.isOpened():
+        logger.error(f"Failed to open VideoWriter at {path}")
+        return None
+    return writer
+
+class VideoRecorder:
+    """
+    Writes annotated frames to disk on a background thread.
+    Frames are sampled at `fps`, kept JPEG-encoded in a pre-event ring buffer
+    and, when continuous recording is on, written to time-bounded segments.
+    start_clip() opens an event clip that begins `pre_event_seconds` before
+    the call (from the ring buffer) and runs until `post_event_seconds` after
+    end_clip(). Clip commands travel on their own unbounded queue, so they
+    are never dropped and never wait behind a full frame queue.
+    """
+    def __init__(self, config, name=None, output_dir='output', fps=None, continuous=False):
+        self.config = config
+        self.name = name
+        self.fps = fps or config.get('fps', 10)
+        self.continuous = continuous
+        self.segment_seconds = config.get('segment_seconds', 600)
+        self.pre_seconds = config.get('pre_event_seconds', 5)
+        self.post_seconds = config.get('post_event_seconds', 5)
+        self.codec = config.get('codec', 'mp4v')
+        self.hw_acceleration = config.get('hw_acceleration', False)
+        self.jpeg_quality = config.get('jpeg_quality', 80)
+
+        self.output_dir = Path(output_dir)
+        self.segment_dir = self.output_dir / "recordings"
+        self.clip_dir = self.output_dir / "clips"
+        self.segment_dir.mkdir(parents=True, exist_ok=True)
+        self.clip_dir.mkdir(parents=True, exist_ok=True)
+
+        self.queue = queue.Queue(maxsize=config.get('queue_size', 64))  # (frame, timestamp)
+        self.commands = queue.Queue()  # (command, arg), handled before the next frame
+        self.ring = deque(maxlen=max(1, int(self.pre_seconds * self.fps) + 1))  # (ts, JPEG bytes)
+        self.last_sample = None
+        self.segment = None  # {'writer', 'path', 'start'}
+        self.clips = {}      # event id -> {'writer', 'path', 'end'}
+        self.frame_size = None
+
+        # Stats
+        self.frames_written = 0
+        self.dropped_frames = 0
+        self.segments = []
+        self.encode_timer = stage_timer('record_encode', name)
+        self.write_timer = stage_timer('write', name)
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _prefix(self):
+        return f"leopard_{self.name}" if self.name else "leopard"
+
+    def write(self, frame, timestamp):
+        """
+        Offer a frame (must not be modified afterwards). Called for every
+        pipeline frame; only one every 1/fps seconds of `timestamp` is kept and
+        the call never blocks on disk I/O.
+        """
+        if self.last_sample is not None and timestamp - self.last_sample < 1.0 / self.fps - 1e-6:
+            return
+        self.last_sample = timestamp
+        try:
+            self.queue.put_nowait((frame, timestamp))
+        except queue.Full:
+            self.dropped_frames += 1
+
+    def start_clip(self, event_id):
+        """
+        Start an event clip. Returns the clip path (written in the background),
+        or None when there is nothing to record yet.
+        """
+        if self.frame_size is None or not self.thread.is_alive():
+            logger.warning(f"No frames recorded yet for clip {event_id}")
+            return None
+        path = self.clip_dir / f"{self._prefix()}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{event_id}.mp4"
+        self.commands.put((_START_CLIP, (event_id, path)))
+        return path
+
+    def end_clip(self, event_id):
+        """The clip keeps recording for post_event_seconds, then closes."""
+        if self.thread.is_alive():
+            self.commands.put((_END_CLIP, event_id))
+
+    def _run(self):
+        stopping = False
+        while True:
+            stopping = self._handle_commands() or stopping
+            try:
+                frame, timestamp = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                if stopping:
+                    break
+                continue
+            try:
+                self._handle_frame(frame, timestamp)
+            except Exception as e:
+                logger.error(f"Recorder error: {e}")
+
+        self._close_segment()
+        for event_id in list(self.clips):
+            self._close_clip(event_id)
+
+    def _handle_commands(self):
+        """Runs the pending clip commands. True once stop() was called."""
+        stop = False
+        while True:
+            try:
+                item, arg = self.commands.get_nowait()
+            except queue.Empty:
+                return stop
+            try:
+                if item is _STOP:
+                    stop = True  # the frames already queued are still written
+                elif item is _START_CLIP:
+                    self._open_clip(*arg)
+                elif item is _END_CLIP:
+                    if arg in self.clips and self.clips[arg]['end'] is None:
+                        self.clips[arg]['end'] = (self.ring[-1][0] if self.ring else 0.0) + self.post_seconds
+            except Exception as e:
+                logger.error(f"Recorder error: {e}")
+
+    def _handle_frame(self, frame, timestamp):
+        self.frame_size = (frame.shape[1], frame.shape[0])
+
+        # 1. Pre-event buffer (encoded, so a few seconds cost little memory)
+        start = time.perf_counter()
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if ok:
+            self.ring.append((timestamp, encoded))
+        start = self._lap(self.encode_timer, start)
+
+        # 2. Continuous segments
+        if self.continuous:
+            if self.segment is not None and timestamp - self.segment['start'] >= self.segment_seconds:
+                self._close_segment()
+            if self.segment is None:
+                self._open_segment(timestamp)
+            if self.segment['writer'] is not None:
+                self.segment['writer'].write(frame)
+                self.frames_written += 1
+                start = self._lap(self.write_timer, start)
+
+        # 3. Event clips
+        for event_id, clip in list(self.clips.items()):
+            if clip['end'] is not None and timestamp > clip['end']:
+                self._close_clip(event_id)
+            elif clip['writer'] is not None:
+                clip['writer'].write(frame)
+                start = self._lap(self.write_timer, start)
+
+    def _lap(self, timer, start):
+        now = time.perf_counter()
+        timer.observe(now - start)
+        return now
+
+    def _open_segment(self, timestamp):
+        stamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        path = self.segment_dir / f"{self._prefix()}_{stamp}_{len(self.segments):04d}.mp4"
+        writer = open_writer(path, self.fps, self.frame_size, self.codec, self.hw_acceleration)
+        self.segment = {'writer': writer, 'path': path, 'start': timestamp}
+        if writer is not None:
+            logger.info(f"Recording segment {path}")
+
+    def _close_segment(self):
+        if self.segment is None:
+            return
+        if self.segment['writer'] is not None:
+            self.segment['writer'].release()
+            self.segments.append(self.segment['path'])
+        self.segment = None
+
+    def _open_clip(self, event_id, path):
+        if self.frame_size is None:
+            logger.warning(f"No frames recorded yet for clip {event_id}")
+            return
+        writer = open_writer(path, self.fps, self.frame_size, self.codec, self.hw_acceleration)
+        self.clips[event_id] = {'writer': writer, 'path': path, 'end': None}
+        if writer is None:
+            return
+
+        # Start with the buffered seconds before the event
+        cutoff = self.ring[-1][0] - self.pre_seconds if self.ring else 0.0
+        for timestamp, encoded in self.ring:
+            if timestamp >= cutoff:
+                writer.write(cv2.imdecode(np.asarray(encoded), cv2.IMREAD_COLOR))
+
+    def _close_clip(self, event_id):
+        clip = self.clips.pop(event_id)
+        if clip['writer'] is not None:
+            clip['writer'].release()
+            logger.info(f"Saved event clip {clip['path']}")
+
+    def stop(self):
+        """Finish the open segment and clips."""
+        if not self.thread.is_alive():
+            return
+        self.commands.put((_STOP, None))
+        self.thread.join()
+        if self.dropped_frames:
+            logger.warning(f"Recorder dropped {self.dropped_frames} frames (disk too slow)")
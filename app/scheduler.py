@@ -0,0 +1,80 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+class DetectionScheduler:
+    """
+    Decides on which frames the detector runs.
+      burst    - every frame while motion is rising or tracks are uncertain
+      tracking - every `detect_interval` frames while there is motion or a track
+      idle     - every `idle_interval` frames when the scene is quiet
+    Between detections the pipeline propagates the existing tracks instead.
+    """
+    MODES = ('burst', 'tracking', 'idle')
+
+    def __init__(self, config):
+        self.config = config
+        self.configure(config)
+        self.motion_rise = config.get('motion_rise', 2.0)
+        self.min_motion_fraction = config.get('min_motion_fraction', 0.002)
+        self.min_track_conf = config.get('min_track_conf', 0.4)
+        self.ema_alpha = config.get('motion_ema_alpha', 0.1)
+
+        self.motion_ema = 0.0
+        self.last_detection = None
+        self.mode = 'idle'
+        # (has_tracks, uncertain) summary published by the post-processing stage
+        self.track_state = (False, False)
+
+        # Stats
+        self.frames = 0
+        self.detections = 0
+
+    def configure(self, config):
+        """Set the detection cadence (also used live by scene profiles)."""
+        self.detect_interval = max(1, int(config.get('detect_interval', 1)))
+        self.idle_interval = max(1, int(config.get('idle_interval', 30)))
+
+    def observe_tracks(self, tracks):
+        """Summarise tracker state after each frame (safe to read from another stage)."""
+        has_tracks = False
+        uncertain = False
+        for track in tracks.values():
+            has_tracks = True
+            if track['time_since_update'] == 0 and track['status'] != 'confirmed':
+                uncertain = True  # needs consecutive detections to get confirmed
+            elif track['status'] == 'confirmed' and track['time_since_update'] > 0:
+                uncertain = True  # lost by the last detection, re-acquire quickly
+            elif track['last_conf'] < self.min_track_conf:
+                uncertain = True
+        self.track_state = (has_tracks, uncertain)
+
+    def _select_mode(self, has_motion, motion_fraction):
+        has_tracks, uncertain = self.track_state
+        rising = (
+            motion_fraction > self.min_motion_fraction and
+            motion_fraction > self.motion_rise * self.motion_ema
+        )
+        if uncertain or rising:
+            return 'burst'
+        if has_motion or has_tracks:
+            return 'tracking'
+        return 'idle'
+
+    def should_detect(self, index, has_motion, motion_fraction=0.0):
+        self.mode = self._select_mode(has_motion, motion_fraction)
+        self.motion_ema += self.ema_alpha * (motion_fraction - self.motion_ema)
+        self.frames += 1
+
+        interval = {'burst': 1, 'tracking': self.detect_interval, 'idle': self.idle_interval}[self.mode]
+        if self.last_detection is not None and index - self.last_detection < interval:
+            return False
+
+        self.last_detection = index
+        self.detections += 1
+        return True
+
+    def skip_rate(self):
+        if self.frames == 0:
+            return 0.0
+        return 1.0 - self.detections / self.frames
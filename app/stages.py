@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream; forwarded through every stage so they drain in order
+_STOP = object()
+
+class StageQueue:
+    """
+    Bounded queue between two pipeline stages.
+    With drop_oldest=True a full queue discards its oldest item instead of
+    blocking the producer (live mode). Otherwise the producer blocks, which
+    is the backpressure signal (file mode, every frame kept in order).
+    """
+    def __init__(self, maxsize, drop_oldest=False):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self.blocked_time = 0.0
+
+    def put(self, item):
+        if item is _STOP:
+            self.queue.put(item)
+            return
+
+        if self.drop_oldest:
+            while True:
+                try:
+                    self.queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+        start = time.perf_counter()
+        self.queue.put(item)
+        self.blocked_time += time.perf_counter() - start
+
+    def get(self, timeout=None):
+        return self.queue.get(timeout=timeout)
+
+    def qsize(self):
+        return self.queue.qsize()
+
+class Stage:
+    """Runs `func` on every item of its input queue on a dedicated thread."""
+    def __init__(self, name, func, input_queue, output_queue=None):
+        self.name = name
+        self.func = func
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.thread = threading.Thread(target=self._run, name=f"stage-{name}", daemon=True)
+
+        # Stats
+        self.processed = 0
+        self.errors = 0
+        self.busy_time = 0.0
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.input_queue.get()
+            if item is _STOP:
+                if self.output_queue is not None:
+                    self.output_queue.put(_STOP)
+                break
+
+            start = time.perf_counter()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Stage '{self.name}' failed: {e}")
+                result = None
+            self.busy_time += time.perf_counter() - start
+            self.processed += 1
+
+            # A stage may return None to drop the item
+            if result is not None and self.output_queue is not None:
+                self.output_queue.put(result)
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+class StagedExecutor:
+    """
+    Chains stages with bounded queues:
+        feed() -> [q0] -> stage 0 -> [q1] -> stage 1 -> ... -> stage N
+    One thread per stage, FIFO queues, so item order is preserved.
+    """
+    def __init__(self, stages, queue_size=4, drop_stale=False):
+        self.queues = []
+        self.stages = []
+        self.start_time = None
+
+        input_queue = StageQueue(queue_size, drop_oldest=drop_stale)
+        self.queues.append(input_queue)
+        for i, (name, func) in enumerate(stages):
+            if i < len(stages) - 1:
+                output_queue = StageQueue(queue_size, drop_oldest=drop_stale)
+                self.queues.append(output_queue)
+            else:
+                output_queue = None
+            self.stages.append(Stage(name, func, input_queue, output_queue))
+            input_queue = output_queue
+
+    def start(self):
+        self.start_time = time.time()
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def feed(self, item):
+        self.queues[0].put(item)
+
+    def close(self, timeout=None):
+        """Signal end of stream and wait for all queued items to drain."""
+        self.queues[0].put(_STOP)
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def stats(self):
+        """Per-stage throughput and backpressure figures."""
+        elapsed = max(time.time() - (self.start_time or time.time()), 1e-6)
+        stats = {}
+        for stage, in_queue in zip(self.stages, self.queues):
+            stats[stage.name] = {
+                'processed': stage.processed,
+                'errors': stage.errors,
+                'fps': stage.processed / elapsed,
+                'utilization': stage.busy_time / elapsed,
+                'queue_depth': in_queue.qsize(),
+                'dropped': in_queue.dropped,
+                # Time the upstream producer spent blocked on this stage's input
+                'blocked_upstream_s': in_queue.blocked_time
+            }
+        return stats
+
+    def log_stats(self):
+        for name, s in self.stats().items():
+            logger.info(
+                f"[stage {name}] {s['fps']:.1f} fps, util {s['utilization'] * 100:.0f}%, "
+                f"queue {s['queue_depth']}, dropped {s['dropped']}, "
+                f"upstream blocked {s['blocked_upstream_s']:.1f}s"
+            )
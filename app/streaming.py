@@ -1,67 +1,216 @@
-from flask import Flask, Response, render_template_string, jsonify
+from flask import Flask, Response, render_template_string, jsonify, request
 import threading
 import cv2
 import time
 import logging
 import numpy as np
+from app.metrics import REGISTRY, stage_timer
 
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# Global frame buffer for streaming
-outputFrame = None
+class FrameBroadcaster:
+    """
+    Latest frame of one camera, shared by every client watching it.
+    The frame is JPEG-encoded at most once per (frame, quality), on the first
+    request for it; clients asking while that encode runs wait for its bytes.
+    Clients block on a condition until the sequence number
+    moves past the one they last sent. Slow clients simply get the newest
+    frame and skip the ones in between.
+    """
+    def __init__(self, quality=80, camera=None):
+        self.quality = quality
+        self.frame = None
+        self.seq = 0
+        self.encoded = {}  # (quality, width) -> JPEG bytes of the current frame
+        self.encoding = {}  # (quality, width) -> {'seq', 'done', 'data'} of the encode in progress
+        self.condition = threading.Condition()
+        self.listeners = []  # called with the broadcaster after each publish (async server)
+
+        # Stats
+        self.encodes = 0
+        self.encode_timer = stage_timer('encode', camera)
+
+    def publish(self, frame):
+        """
+        Swap in a new frame. The frame is not copied: the caller must not
+        modify it after publishing (the pipeline hands over read-only frames).
+        """
+        with self.condition:
+            self.frame = frame
+            self.seq += 1
+            self.encoded = {}
+            self.condition.notify_all()
+        for listener in list(self.listeners):
+            listener(self)
+
+    def wait(self, last_seq, timeout=1.0):
+        """Block until a frame newer than last_seq exists. Returns its seq (last_seq on timeout)."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq != last_seq, timeout)
+            return self.seq
+
+    def cached(self, quality=None, width=None):
+        """(seq, JPEG bytes) if the current frame is already encoded at this quality/width, else None."""
+        with self.condition:
+            data = self.encoded.get((quality or self.quality, width))
+            return (self.seq, data) if data is not None else None
+
+    def jpeg(self, quality=None, width=None):
+        """
+        Returns (seq, JPEG bytes) of the current frame, or (seq, None) before the
+        first frame. `width` selects a downscaled variant (preview, thumbnail).
+        """
+        key = (quality or self.quality, width)
+        with self.condition:
+            seq, frame = self.seq, self.frame
+            data = self.encoded.get(key)
+            if frame is None or data is not None:
+                return seq, data
+            job = self.encoding.get(key)
+            owner = job is None or job['seq'] != seq
+            if owner:
+                job = self.encoding[key] = {'seq': seq, 'done': threading.Event(), 'data': None}
+        if not owner:
+            # Another client is already encoding this frame
+            job['done'].wait()
+            return seq, job['data']
+
+        # Resize and encode outside the lock so publish() never waits on a client
+        try:
+            start = time.perf_counter()
+            if width and width < frame.shape[1]:
+                height = max(1, int(round(frame.shape[0] * width / frame.shape[1])))
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            flag, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(key[0])])
+            if flag:
+                job['data'] = buffer.tobytes()
+                self.encode_timer.time(start)
+        finally:
+            job['done'].set()
+            with self.condition:
+                if self.encoding.get(key) is job:
+                    del self.encoding[key]
+                if job['data'] is not None:
+                    self.encodes += 1
+                    if self.seq == seq:
+                        self.encoded[key] = job['data']
+        return seq, job['data']
+
+# Stream settings (server.stream in the config)
+stream_config = {}
+
+# camera name -> FrameBroadcaster; None is the single-camera feed
+broadcasters = {}
+default_camera = None  # the default /video feed shows the first camera that reports in
 lock = threading.Lock()
 
-def set_output_frame(frame):
-    global outputFrame
+def get_broadcaster(camera=None, create=False):
+    """
+    Broadcaster of a camera, None for a camera that never published a frame
+    (so clients cannot grow the table with made-up names). The default feed
+    (camera None) always exists; only set_output_frame creates named ones.
+    """
+    with lock:
+        if camera is None and default_camera is not None:
+            camera = default_camera
+        broadcaster = broadcasters.get(camera)
+        if broadcaster is None and (create or camera is None):
+            broadcaster = FrameBroadcaster(stream_config.get('quality', 80), camera)
+            broadcasters[camera] = broadcaster
+        return broadcaster
+
+def set_output_frame(frame, camera=None):
+    global default_camera
+    if camera is not None and default_camera is None:
+        with lock:
+            if default_camera is None:
+                default_camera = camera
+                # Clients already waiting on the default feed follow the first camera
+                if None in broadcasters:
+                    broadcasters[camera] = broadcasters.pop(None)
+                    broadcasters[camera].encode_timer = stage_timer('encode', camera)
+    get_broadcaster(camera, create=True).publish(frame)
+
+def get_output_frame(camera=None):
+    broadcaster = get_broadcaster(camera)
+    return broadcaster.frame if broadcaster is not None else None
+
+def camera_names():
     with lock:
-        outputFrame = frame.copy()
+        return [name for name, b in broadcasters.items() if name is not None and b.frame is not None]
+
+def variant_width(size):
+    """Width of a named stream variant (full, preview, thumb); None keeps the full frame."""
+    variants = {'full': None, 'preview': 640, 'thumb': 160}
+    variants.update(stream_config.get('variants', {}))
+    return variants.get(size or 'full')
+
+# name -> callable returning a JSON-serialisable dict, reported by /health
+stats_sources = {}
+
+def register_stats(name, source):
+    stats_sources[name] = source
 
-def generate():
-    global outputFrame
-    
-    # Pre-create blank frame to disable re-creation overhead
+def collect_stats():
+    stats = {}
+    for name, source in list(stats_sources.items()):
+        try:
+            stats[name] = source()
+        except Exception as e:
+            stats[name] = {'error': str(e)}
+    return stats
+
+def health_report():
+    return {"status": "healthy", "timestamp": time.time(), "pipelines": collect_stats()}
+
+def _blank_jpeg():
     blank_frame = np.zeros((480, 640, 3), dtype=np.uint8)
     cv2.putText(blank_frame, "Status: Waiting for Camera...", (50, 230), 
                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
     cv2.putText(blank_frame, "No input source detected on Server", (50, 270), 
                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 1)
+    return cv2.imencode(".jpg", blank_frame)[1].tobytes()
+
+BLANK_JPEG = _blank_jpeg()
+
+def client_limits(fps=None, quality=None):
+    """Per-client fps / quality requested by the client, capped by the server config."""
+    max_fps = stream_config.get('max_fps', 20)
+    max_quality = stream_config.get('quality', 80)
+    fps = fps or max_fps
+    quality = quality or max_quality
+    return min(max(fps, 0.1), max_fps), min(max(quality, 10), max_quality)
+
+def _request_limits():
+    return client_limits(request.args.get('fps', type=float), request.args.get('quality', type=int))
+
+def generate(broadcaster, fps=None, quality=None, width=None):
+    fps = fps or stream_config.get('max_fps', 20)
+    min_interval = 1.0 / fps
+    last_seq = -1
+    last_sent = 0.0
 
     while True:
-        frame_to_encode = None
-        
-        with lock:
-            if outputFrame is None:
-                frame_to_encode = blank_frame
-            else:
-                frame_to_encode = outputFrame
-        
-        # Encode
-        try:
-            (flag, encodedImage) = cv2.imencode(".jpg", frame_to_encode)
-            if not flag:
-                time.sleep(0.1)
-                continue
-        except Exception as e:
-            logger.error(f"Encoding error: {e}")
-            time.sleep(0.1)
-            continue
+        # Respect the client's frame rate cap, then wait for a frame it hasn't seen
+        delay = min_interval - (time.time() - last_sent)
+        if delay > 0:
+            time.sleep(delay)
+        seq = broadcaster.wait(last_seq, timeout=1.0)
+        if seq == last_seq and seq > 0:
+            continue  # no new frame yet (before the first one the placeholder is re-sent)
 
-        yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + 
-               bytearray(encodedImage) + b'\r\n')
-        
-        # Control FPS
-        time.sleep(0.05)
+        seq, data = broadcaster.jpeg(quality, width)
+        if data is None:
+            data = BLANK_JPEG
+        last_seq = seq
+        last_sent = time.time()
 
-@app.route("/video")
-def video_feed():
-    return Response(generate(),
-                    mimetype="multipart/x-mixed-replace; boundary=frame")
+        yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + 
+               data + b'\r\n')
 
-@app.route("/")
-def index():
-    return render_template_string("""
+INDEX_HTML = """
     <html>
         <head>
             <title>PantheraVision - Leopard Detection System</title>
@@ -80,16 +229,49 @@ def index():
             </div>
         </body>
     </html>
-    """)
+"""
+
+@app.route("/video")
+@app.route("/video/<camera>")
+def video_feed(camera=None):
+    broadcaster = get_broadcaster(camera)
+    if broadcaster is None:
+        return Response("Unknown camera", status=404, mimetype="text/plain")
+    fps, quality = _request_limits()
+    return Response(generate(broadcaster, fps, quality, variant_width(request.args.get('size'))),
+                    mimetype="multipart/x-mixed-replace; boundary=frame")
+
+@app.route("/snapshot.jpg")
+@app.route("/snapshot/<camera>.jpg")
+def snapshot(camera=None):
+    broadcaster = get_broadcaster(camera)
+    if broadcaster is None:
+        return Response("Unknown camera", status=404, mimetype="text/plain")
+    _, quality = _request_limits()
+    _, data = broadcaster.jpeg(quality, variant_width(request.args.get('size')))
+    return Response(data or BLANK_JPEG, mimetype="image/jpeg")
+
+@app.route("/cameras")
+def cameras():
+    return jsonify({"cameras": camera_names()})
+
+@app.route("/")
+def index():
+    return render_template_string(INDEX_HTML)
+
+@app.route("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/health")
 def health():
-    return jsonify({"status": "healthy", "timestamp": time.time()})
+    return jsonify(health_report())
 
 class StreamServer:
-    def __init__(self, host='0.0.0.0', port=5000):
+    def __init__(self, host='0.0.0.0', port=5000, config=None):
         self.host = host
         self.port = port
+        stream_config.update(config or {})
         self.thread = threading.Thread(target=self._run, daemon=True)
 
     def start(self):
@@ -101,5 +283,14 @@ class StreamServer:
         log.setLevel(logging.ERROR)
         app.run(host=self.host, port=self.port, debug=False, use_reloader=False, threaded=True)
 
-    def update_frame(self, frame):
-        set_output_frame(frame)
+    def update_frame(self, frame, camera=None):
+        set_output_frame(frame, camera)
+
+def create_stream_server(server_config):
+    """StreamServer (Flask) or AsyncStreamServer depending on server.backend."""
+    host = server_config.get('host', '0.0.0.0')
+    port = server_config.get('port', 5000)
+    if server_config.get('backend', 'asyncio') == 'asyncio':
+        from app.async_streaming import AsyncStreamServer
+        return AsyncStreamServer(host, port, server_config.get('stream'))
+    return StreamServer(host, port, server_config.get('stream'))
@@ -0,0 +1,109 @@
+import logging
+import cv2
+import numpy as np
+from motion.coverage import MotionCoverage
+
+logger = logging.getLogger(__name__)
+
+class Zones:
+    """
+    Static include/exclude polygons of one camera (`camera.zones` in the config).
+    Points are relative to the frame (0..1), so they hold at any resolution:
+
+        zones:
+          include: [[[0.0, 0.3], [1.0, 0.3], [1.0, 1.0], [0.0, 1.0]]]
+          exclude: [[[0.6, 0.5], [1.0, 0.5], [1.0, 1.0], [0.6, 1.0]]]  # road
+
+    The active region is the union of the include zones (the whole frame when
+    there are none) minus the exclude zones. It is rasterized once per
+    resolution into a 0/255 mask.
+    """
+    def __init__(self, config=None):
+        config = config or {}
+        include = config.get('include') or []
+        exclude = config.get('exclude') or []
+        self.enabled = bool(include or exclude)
+        self.has_include = bool(include)
+        self.region = None
+        if self.enabled:
+            self.region = _region(include, exclude)
+            if self.region.is_empty:
+                logger.warning("Zones exclude the whole frame, nothing will be detected")
+
+        self.masks = {}      # (w, h) -> mask
+        self.coverages = {}  # (frame shape, mask size) -> MotionCoverage
+        self.crops = {}      # frame shape -> crop region or None
+
+    def mask(self, size):
+        """(h, w) uint8 mask, 255 inside the active region. size is (w, h)."""
+        size = (int(size[0]), int(size[1]))
+        mask = self.masks.get(size)
+        if mask is None:
+            mask = self.masks[size] = rasterize(self.region, size)
+        return mask
+
+    def coverage(self, frame_shape, size):
+        """Summed-area table of the mask at `size`, for boxes in frame_shape coordinates."""
+        key = (tuple(frame_shape[:2]), tuple(size))
+        coverage = self.coverages.get(key)
+        if coverage is None:
+            coverage = self.coverages[key] = MotionCoverage(self.mask(size), frame_shape)
+        return coverage
+
+    def crop_region(self, frame_shape, max_area=0.9):
+        """
+        Pixel bounds (x1, y1, x2, y2) of the include zones, or None when there
+        are none or they cover nearly the whole frame anyway.
+        """
+        key = tuple(frame_shape[:2])
+        if key not in self.crops:
+            region = None
+            if self.has_include and not self.region.is_empty:
+                h, w = key
+                bx1, by1, bx2, by2 = self.region.bounds
+                x1, y1 = int(np.floor(bx1 * w)), int(np.floor(by1 * h))
+                x2, y2 = int(np.ceil(bx2 * w)), int(np.ceil(by2 * h))
+                if (x2 - x1) * (y2 - y1) < max_area * w * h:
+                    region = (max(0, x1), max(0, y1), min(w, x2), min(h, y2))
+            self.crops[key] = region
+        return self.crops[key]
+
+def _region(include, exclude):
+    # Only needed when a camera has zones
+    from shapely.geometry import Polygon, box
+    from shapely.ops import unary_union
+
+    def polygon(points):
+        # buffer(0) repairs self-intersecting outlines drawn by hand
+        return Polygon([(float(x), float(y)) for x, y in points]).buffer(0)
+
+    frame = box(0, 0, 1, 1)
+    region = unary_union([polygon(p) for p in include]).intersection(frame) if include else frame
+    if exclude:
+        region = region.difference(unary_union([polygon(p) for p in exclude]))
+    return region
+
+def rasterize(geometry, size, shift=4):
+    """Fills a relative-coordinate shapely geometry into a (h, w) 0/255 mask."""
+    w, h = size
+    mask = np.zeros((h, w), np.uint8)
+    scale = np.array([w, h], np.float64) * (1 << shift)
+
+    def points(ring):
+        return np.round(np.asarray(ring.coords)[:, :2] * scale).astype(np.int32)
+
+    for polygon in getattr(geometry, 'geoms', [geometry]):
+        if polygon.geom_type != 'Polygon' or polygon.is_empty:
+            continue
+        cv2.fillPoly(mask, [points(polygon.exterior)], 255, lineType=cv2.LINE_8, shift=shift)
+        holes = [points(ring) for ring in polygon.interiors]
+        if holes:
+            cv2.fillPoly(mask, holes, 0, lineType=cv2.LINE_8, shift=shift)
+    return mask
+
+def inference_size(config):
+    """(w, h) the detector sees a frame at: img_size on the long side of the configured camera frame."""
+    img_size = config.get('detection', {}).get('img_size', 640)
+    w, h = config['camera'].get('width', 1920), config['camera'].get('height', 1080)
+    scale = img_size / max(w, h)
+    return max(1, round(w * scale)), max(1, round(h * scale))
@@ -0,0 +1,309 @@
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from motion.benchmark import synthetic_frames, video_frames
+from motion.optical_flow import MotionDetector
+from detection.filters import DetectionFilter
+from tracking.tracker import ObjectTracker
+from app.streaming import FrameBroadcaster, set_output_frame
+from app.pipeline import Pipeline
+from benchmarks.stub_detector import StubDetector
+
+logger = logging.getLogger(__name__)
+
+# Lower is better for latencies, higher is better for throughput
+LOWER_IS_BETTER = ('p50_ms', 'p95_ms')
+HIGHER_IS_BETTER = ('throughput_per_s',)
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far (None where unsupported).
+    A high-water mark over the whole run, so it is reported once, not per benchmark.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def summarize(timings, items=None):
+    """timings: seconds per call. items: units processed (defaults to one per call)."""
+    timings = np.asarray(timings, dtype=np.float64)
+    total = float(timings.sum())
+    items = len(timings) if items is None else items
+    return {
+        'count': int(len(timings)),
+        'mean_ms': float(timings.mean() * 1000) if len(timings) else 0.0,
+        'p50_ms': float(np.percentile(timings, 50) * 1000) if len(timings) else 0.0,
+        'p95_ms': float(np.percentile(timings, 95) * 1000) if len(timings) else 0.0,
+        'p99_ms': float(np.percentile(timings, 99) * 1000) if len(timings) else 0.0,
+        'throughput_per_s': items / total if total > 0 else 0.0
+    }
+
+def timed(fn, args_list, warmup=3):
+    for args in args_list[:warmup]:
+        fn(*args)
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def make_detector(config, stub=False, stub_latency_ms=0.0):
+    """LeopardDetector when the weights exist, StubDetector otherwise (or when asked)."""
+    model_path = config['detection'].get('model_path')
+    if not stub and model_path and Path(model_path).exists():
+        from detection.model import LeopardDetector
+        return LeopardDetector(model_path, config['detection']), 'model'
+    if not stub:
+        logger.warning(f"No weights at {model_path}, using the stub detector")
+    return StubDetector(config['detection'], latency_ms=stub_latency_ms), 'stub'
+
+# 1. Component benchmarks
+
+def bench_motion(config, frames):
+    detector = MotionDetector(config['motion'])
+    return summarize(timed(detector.detect, [(f,) for f in frames]))
+
+def bench_detector(detector, frames):
+    return summarize(timed(detector.predict, [(f,) for f in frames]))
+
+def bench_filter(config, frames, boxes_per_frame=20, rng=None):
+    """One validate_batch call per frame, as the pipeline does."""
+    rng = rng or np.random.default_rng(0)
+    h, w = frames[0].shape[:2]
+    detection_filter = DetectionFilter(config)
+    calls = []
+    for _ in range(len(frames)):
+        x1, y1 = rng.uniform(0, w - 300, boxes_per_frame), rng.uniform(0, h - 200, boxes_per_frame)
+        boxes = np.stack([
+            x1, y1, x1 + rng.uniform(60, 300, boxes_per_frame), y1 + rng.uniform(60, 200, boxes_per_frame),
+            rng.uniform(0.3, 1.0, boxes_per_frame), np.zeros(boxes_per_frame)
+        ], axis=1).astype(np.float32)
+        rects = np.column_stack([rng.uniform(0, w - 200, 10), rng.uniform(0, h - 200, 10), np.full((10, 2), 200)]).astype(np.int32)
+        calls.append((boxes, rects))
+    return summarize(timed(detection_filter.validate_batch, calls), items=len(frames) * boxes_per_frame)
+
+def bench_tracker(config, frames, objects=10, rng=None):
+    rng = rng or np.random.default_rng(0)
+    h, w = frames[0].shape[:2]
+    tracker = ObjectTracker(config['tracking'])
+    starts = rng.uniform([0, 0], [w - 400, h - 300], size=(objects, 2))
+    velocity = rng.uniform(-8, 8, size=(objects, 2))
+    calls = []
+    for i in range(len(frames)):
+        dets = []
+        for (x, y), (vx, vy) in zip(starts, velocity):
+            x, y = x + vx * i + rng.normal(0, 2), y + vy * i + rng.normal(0, 2)
+            dets.append((x, y, x + 150, y + 100, -1, 0.8, 0))
+        calls.append((dets,))
+    return summarize(timed(tracker.update, calls, warmup=0))
+
+def bench_mjpeg(frames, quality=80, preview_width=640):
+    """One publish plus the encodes every viewer shares (full and preview)."""
+    broadcaster = FrameBroadcaster(quality)
+
+    def publish_and_encode(frame):
+        broadcaster.publish(frame)
+        broadcaster.jpeg(quality)
+        broadcaster.jpeg(quality, preview_width)
+
+    return summarize(timed(publish_and_encode, [(f,) for f in frames]))
+
+# 2. End to end
+
+class BenchmarkStreamServer:
+    """Publishes to the in-process broadcasters without opening a port."""
+    def start(self):
+        pass
+
+    def update_frame(self, frame, camera=None):
+        set_output_frame(frame, camera)
+
+class BenchmarkPipeline(Pipeline):
+    """Pipeline that records the capture-to-output latency of every frame."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def _stage_output(self, ctx):
+        ctx = super()._stage_output(ctx)
+        self.latencies.append(time.time() - ctx['time'])
+        return ctx
+
+def write_clip(frames, path, fps=30):
+    h, w = frames[0].shape[:2]
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+
+def bench_pipeline(config, clip_path, detector, work_dir, execution='sequential'):
+    config = copy.deepcopy(config)
+    config['camera']['source'] = str(clip_path)
+    config.setdefault('pipeline', {})['execution'] = execution
+    config.setdefault('system', {})['output_dir'] = str(work_dir / 'output')
+    config['alerts'].setdefault('database', {})['path'] = str(work_dir / 'bench.db')
+    config['alerts'].setdefault('telegram', {})['enabled'] = False
+
+    pipeline = BenchmarkPipeline(config=config, detector=detector, stream_server=BenchmarkStreamServer())
+    start = time.perf_counter()
+    pipeline.run()
+    elapsed = time.perf_counter() - start
+    pipeline.stop()
+
+    result = summarize(pipeline.latencies)
+    # Throughput is frames over wall time (stages overlap in staged mode)
+    result['throughput_per_s'] = pipeline.frame_count / elapsed if elapsed > 0 else 0.0
+    result['frames'] = pipeline.frame_count
+    result['detector_skip_rate'] = pipeline.scheduler.skip_rate()
+    return result
+
+# 3. Baseline comparison
+
+def compare(results, baseline, tolerance, min_delta_ms=0.05):
+    """
+    Returns a list of (benchmark, metric, baseline, current, change) regressions.
+    Latency changes smaller than min_delta_ms are timer noise and ignored.
+    """
+    regressions = []
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if previous is None:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if metric.endswith('_ms') and abs(new - old) < min_delta_ms:
+                continue
+            worse = change > tolerance if metric in LOWER_IS_BETTER else change < -tolerance
+            if worse:
+                regressions.append((name, metric, old, new, change))
+    return regressions
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'opencv_threads': cv2.getNumThreads()
+    }
+
+def print_table(results):
+    print(f"{'benchmark':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'per s':>12}")
+    for name, r in results['benchmarks'].items():
+        print(f"{name:<22}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['throughput_per_s']:>12.1f}")
+    if results.get('peak_rss_mb'):
+        print(f"Peak RSS of the run: {results['peak_rss_mb']:.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Component and end-to-end pipeline benchmarks")
+    parser.add_argument("--config", type=str, default="configs/config.yaml")
+    parser.add_argument("--video", type=str, default=None, help="Recorded clip (default: synthetic)")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--width", type=int, default=1920, help="Synthetic clip width")
+    parser.add_argument("--height", type=int, default=1080, help="Synthetic clip height")
+    parser.add_argument("--level", choices=["components", "pipeline", "all"], default="all")
+    parser.add_argument("--execution", choices=["sequential", "staged"], default="sequential",
+                        help="Pipeline execution mode for the end-to-end run")
+    parser.add_argument("--stub", action="store_true", help="Use the stub detector even if weights exist")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="Simulated inference time of the stub")
+    parser.add_argument("--output", type=str, default=None, help="Write the results JSON here")
+    parser.add_argument("--baseline", type=str, default=None, help="Results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="Ignore latency changes below this")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+
+    # Fixed seeds so two runs see the same input
+    np.random.seed(0)
+    if args.video:
+        frames = video_frames(args.video, args.frames)
+    else:
+        frames = synthetic_frames(args.frames, args.width, args.height)
+    detector, detector_kind = make_detector(config, args.stub, args.stub_latency_ms)
+
+    results = {
+        'timestamp': time.time(),
+        'input': {
+            'source': args.video or 'synthetic',
+            'frames': len(frames),
+            'resolution': f"{frames[0].shape[1]}x{frames[0].shape[0]}",
+            'detector': detector_kind,
+            'execution': args.execution
+        },
+        'environment': environment(),
+        'benchmarks': {}
+    }
+    benchmarks = results['benchmarks']
+
+    if args.level in ('components', 'all'):
+        benchmarks['motion'] = bench_motion(config, frames)
+        benchmarks['detector'] = bench_detector(detector, frames)
+        benchmarks['filter'] = bench_filter(config, frames)
+        benchmarks['tracker'] = bench_tracker(config, frames)
+        benchmarks['mjpeg_encode'] = bench_mjpeg(frames)
+
+    if args.level in ('pipeline', 'all'):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            clip = Path(args.video) if args.video else tmp / 'clip.mp4'
+            if not args.video:
+                write_clip(frames, clip)
+            benchmarks[f'pipeline_{args.execution}'] = bench_pipeline(
+                config, clip, detector, tmp, execution=args.execution
+            )
+
+    results['peak_rss_mb'] = peak_rss_mb()
+    print_table(results)
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        for name, metric, old, new, change in regressions:
+            print(f"REGRESSION {name}.{metric}: {old:.2f} -> {new:.2f} ({change:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
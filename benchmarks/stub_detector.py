@@ -0,0 +1,36 @@
+import time
+import numpy as np
+
+from detection.model import make_results
+
+class StubDetector:
+    """
+    Stand-in for LeopardDetector when no weights are available (CI, CPU-only
+    boxes). Finds the bright blob drawn by the synthetic clips and can sleep
+    for `latency_ms` per call to mimic the cost of a real model.
+    """
+    def __init__(self, config=None, latency_ms=0.0, threshold=180, stride=4):
+        self.config = config or {}
+        self.names = {0: 'leopard'}
+        self.latency = latency_ms / 1000.0
+        self.threshold = threshold
+        self.stride = stride
+        self.calls = 0
+
+    def _detect(self, frame):
+        # Red channel of a subsampled frame; the synthetic background stays below 120
+        small = frame[::self.stride, ::self.stride, 2]
+        ys, xs = np.nonzero(small > self.threshold)
+        if len(xs) == 0:
+            return np.zeros((0, 6), dtype=np.float32)
+        s = self.stride
+        return np.array([[xs.min() * s, ys.min() * s, (xs.max() + 1) * s, (ys.max() + 1) * s, 0.9, 0]], dtype=np.float32)
+
+    def predict(self, frame):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return make_results(frame, self._detect(frame), self.names)
+
+    def predict_batch(self, frames):
+        return [self.predict(frame) for frame in frames]
@@ -1,8 +1,16 @@
 import albumentations as A
+import argparse
 import cv2
 import logging
+import shutil
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
 from pathlib import Path
 from tqdm import tqdm
+import numpy as np
 import random
 import os
 
@@ -10,81 +18,217 @@ import os
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+def build_transform():
+    # Robustness-focused augmentation pipeline
+    return A.Compose([
+        A.RandomRotate90(p=0.5),
+        A.Flip(p=0.5),
+        A.Transpose(p=0.5),
+        A.OneOf([
+            A.GaussNoise(var_limit=(10.0, 50.0)),
+            A.ISONoise(),
+        ], p=0.2),
+        A.OneOf([
+            A.MotionBlur(p=0.2),
+            A.MedianBlur(blur_limit=3, p=0.1),
+            A.Blur(blur_limit=3, p=0.1),
+        ], p=0.2),
+        A.ShiftScaleRotate(shift_limit=0.0625, scale_limit=0.2, rotate_limit=45, p=0.2),
+        A.OneOf([
+            A.OpticalDistortion(p=0.3),
+            A.GridDistortion(p=0.1),
+            A.PiecewiseAffine(p=0.3),
+        ], p=0.2),
+        A.OneOf([
+            A.CLAHE(clip_limit=2),
+            A.Sharpen(),
+            A.Emboss(),
+            A.RandomBrightnessContrast(),
+        ], p=0.3),
+        A.HueSaturationValue(p=0.3),
+        # Weather simulation
+        A.OneOf([
+            A.RandomRain(brightness_coefficient=0.9, drop_width=1, blur_value=7, p=1),
+            A.RandomFog(fog_coef_lower=0.3, fog_coef_upper=1, alpha_coef=0.08, p=1),
+            A.RandomShadow(p=1),
+        ], p=0.3),
+    ])
+
+def aug_name(img_path, index):
+    return f"{img_path.stem}_aug_{index}{img_path.suffix}"
+
+def image_seed(base_seed, name, index):
+    """Seed for one augmentation of one image: independent of worker count and order."""
+    return zlib.crc32(f"{base_seed}:{name}:{index}".encode())
+
+def leaf_transforms(transform):
+    children = getattr(transform, 'transforms', None)
+    if children is None:
+        return [transform]
+    return [leaf for child in children for leaf in leaf_transforms(child)]
+
+def instrument(transform, timings):
+    """Times each leaf transform's apply() into timings[name] = [seconds, calls]."""
+    def timed(name, apply):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return apply(*args, **kwargs)
+            finally:
+                entry = timings.setdefault(name, [0.0, 0])
+                entry[0] += time.perf_counter() - start
+                entry[1] += 1
+        return wrapper
+
+    for leaf in leaf_transforms(transform):
+        leaf.apply = timed(type(leaf).__name__, leaf.apply)
+    return transform
+
+# Worker process state
+_transform = None
+_timings = {}
+_writer = None
+_jpeg_quality = 95
+
+def _init_worker(write_threads, jpeg_quality):
+    global _transform, _writer, _jpeg_quality
+    # Parallelism comes from the pool; keep OpenCV from oversubscribing the cores
+    cv2.setNumThreads(1)
+    _transform = instrument(build_transform(), _timings)
+    _writer = ThreadPoolExecutor(max_workers=write_threads)
+    _jpeg_quality = jpeg_quality
+
+def _write(path, image):
+    # Temporary name keeps the suffix (it picks the encoder); the rename makes the file appear complete
+    tmp = path.with_name(f".{path.stem}.tmp{path.suffix}")
+    if not cv2.imwrite(str(tmp), image, [cv2.IMWRITE_JPEG_QUALITY, _jpeg_quality]):
+        raise IOError(f"Could not write {path}")
+    os.replace(tmp, path)
+
+def _augment_image(task):
+    path, output_dir, todo = task
+    img_path, output_dir = Path(path), Path(output_dir)
+    try:
+        # Originals are copied as files, not decoded and re-encoded
+        original = output_dir / img_path.name
+        if not original.exists():
+            shutil.copy2(img_path, original)
+
+        # The random colour shifts are symmetric, so augmenting OpenCV's BGR directly
+        # gives the same distribution as converting to RGB and back
+        image = cv2.imread(path)
+        if image is None:
+            raise IOError("unreadable image")
+
+        writes = []
+        for index, seed in todo:
+            random.seed(seed)
+            np.random.seed(seed)
+            start = time.perf_counter()
+            augmented = _transform(image=image)['image']
+            entry = _timings.setdefault('Compose', [0.0, 0])
+            entry[0] += time.perf_counter() - start
+            entry[1] += 1
+            # Encoding and writing overlap with the next augmentation
+            writes.append(_writer.submit(_write, output_dir / aug_name(img_path, index), augmented))
+        for write in writes:
+            write.result()
+
+        timings = {name: tuple(entry) for name, entry in _timings.items()}
+        _timings.clear()
+        return {'path': path, 'written': len(writes), 'timings': timings}
+    except Exception as e:
+        _timings.clear()
+        return {'path': path, 'error': str(e)}
+
 class DataAugmentor:
-    def __init__(self, input_dir="dataset/processed", output_dir="dataset/augmented", num_augmentations=5):
+    def __init__(self, input_dir="dataset/processed", output_dir="dataset/augmented", num_augmentations=5,
+                 workers=None, seed=0, write_threads=2, jpeg_quality=95):
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.num_augmentations = num_augmentations
-        
-        # Robustness-focused augmentation pipeline
-        self.transform = A.Compose([
-            A.RandomRotate90(p=0.5),
-            A.Flip(p=0.5),
-            A.Transpose(p=0.5),
-            A.OneOf([
-                A.GaussNoise(var_limit=(10.0, 50.0)),
-                A.ISONoise(),
-            ], p=0.2),
-            A.OneOf([
-                A.MotionBlur(p=0.2),
-                A.MedianBlur(blur_limit=3, p=0.1),
-                A.Blur(blur_limit=3, p=0.1),
-            ], p=0.2),
-            A.ShiftScaleRotate(shift_limit=0.0625, scale_limit=0.2, rotate_limit=45, p=0.2),
-            A.OneOf([
-                A.OpticalDistortion(p=0.3),
-                A.GridDistortion(p=0.1),
-                A.PiecewiseAffine(p=0.3),
-            ], p=0.2),
-            A.OneOf([
-                A.CLAHE(clip_limit=2),
-                A.Sharpen(),
-                A.Emboss(),
-                A.RandomBrightnessContrast(),
-            ], p=0.3),
-            A.HueSaturationValue(p=0.3),
-            # Weather simulation
-            A.OneOf([
-                A.RandomRain(brightness_coefficient=0.9, drop_width=1, blur_value=7, p=1),
-                A.RandomFog(fog_coef_lower=0.3, fog_coef_upper=1, alpha_coef=0.08, p=1),
-                A.RandomShadow(p=1),
-            ], p=0.3),
-        ])
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = seed
+        self.write_threads = write_threads
+        self.jpeg_quality = jpeg_quality
 
     def augment_dataset(self):
+        """Augments new images in input_dir on a process pool. Returns summary stats."""
         logger.info("Starting data augmentation...")
-        
-        for class_dir in self.input_dir.iterdir():
-            if not class_dir.is_dir():
-                continue
-                
-            output_class_dir = self.output_dir / class_dir.name
-            output_class_dir.mkdir(parents=True, exist_ok=True)
-            
-            images = list(class_dir.glob("*.[jJ][pP][gG]")) + list(class_dir.glob("*.[pP][nN][gG]"))
-            
-            logger.info(f"Augmenting class {class_dir.name} with {len(images)} source images...")
-            
-            for img_path in tqdm(images):
-                try:
-                    image = cv2.imread(str(img_path))
-                    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                    
-                    # Copy original
-                    cv2.imwrite(str(output_class_dir / img_path.name), cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
-                    
-                    # Generate augmentations
-                    for i in range(self.num_augmentations):
-                        augmented = self.transform(image=image)['image']
-                        aug_filename = f"{img_path.stem}_aug_{i}{img_path.suffix}"
-                        cv2.imwrite(str(output_class_dir / aug_filename), cv2.cvtColor(augmented, cv2.COLOR_RGB2BGR))
-                        
-                except Exception as e:
-                    logger.error(f"Error augmenting {img_path}: {e}")
-                    
-        logger.info("Data augmentation complete.")
+        start = time.time()
+        stats = Counter()
+        skipped = [0]  # counted on the pool's task feeder thread
+        timings = {}
+
+        def tasks():
+            for class_dir in sorted(p for p in self.input_dir.iterdir() if p.is_dir()):
+                output_class_dir = self.output_dir / class_dir.name
+                output_class_dir.mkdir(parents=True, exist_ok=True)
+                images = sorted(p for p in class_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+                logger.info(f"Augmenting class {class_dir.name} with {len(images)} source images...")
+
+                for img_path in images:
+                    # Resume: only the augmentations that are not on disk yet
+                    todo = [i for i in range(self.num_augmentations)
+                            if not (output_class_dir / aug_name(img_path, i)).exists()]
+                    if not todo and (output_class_dir / img_path.name).exists():
+                        skipped[0] += 1
+                        continue
+                    seeds = [image_seed(self.seed, f"{class_dir.name}/{img_path.name}", i) for i in todo]
+                    yield str(img_path), str(output_class_dir), list(zip(todo, seeds))
+
+        with Pool(self.workers, initializer=_init_worker, initargs=(self.write_threads, self.jpeg_quality)) as pool:
+            for result in tqdm(pool.imap_unordered(_augment_image, tasks(), chunksize=4), unit='img'):
+                if result.get('error'):
+                    logger.error(f"Error augmenting {result['path']}: {result['error']}")
+                    stats['errors'] += 1
+                    continue
+                stats['images'] += 1
+                stats['written'] += result['written']
+                for name, (total, calls) in result['timings'].items():
+                    entry = timings.setdefault(name, [0.0, 0])
+                    entry[0] += total
+                    entry[1] += calls
+
+        elapsed = time.time() - start
+        summary = {
+            'images': stats['images'],
+            'skipped': skipped[0],
+            'errors': stats['errors'],
+            'augmentations_written': stats['written'],
+            'elapsed': round(elapsed, 1),
+            'augmentations_per_s': round(stats['written'] / elapsed, 1) if elapsed > 0 else 0.0,
+            'transforms': {name: {'calls': calls, 'total_s': round(total, 3), 'mean_ms': round(total / calls * 1000, 2)}
+                           for name, (total, calls) in timings.items() if calls}
+        }
+        logger.info(
+            f"Data augmentation complete: {summary['images']} images, {summary['skipped']} already done, "
+            f"{summary['augmentations_written']} augmentations ({summary['augmentations_per_s']}/s), "
+            f"{summary['errors']} errors"
+        )
+        self.log_timings(summary['transforms'])
+        return summary
+
+    def log_timings(self, transforms):
+        """Per-transform cost, slowest first; 'Compose' is the whole pipeline per augmentation."""
+        if not transforms:
+            return
+        logger.info(f"{'transform':<28}{'calls':>8}{'total s':>10}{'mean ms':>10}")
+        for name, t in sorted(transforms.items(), key=lambda item: -item[1]['total_s']):
+            logger.info(f"{name:<28}{t['calls']:>8}{t['total_s']:>10.2f}{t['mean_ms']:>10.2f}")
 
 if __name__ == "__main__":
-    augmentor = DataAugmentor()
+    parser = argparse.ArgumentParser(description="Parallel, reproducible dataset augmentation")
+    parser.add_argument("--input-dir", type=str, default="dataset/processed")
+    parser.add_argument("--output-dir", type=str, default="dataset/augmented")
+    parser.add_argument("--num-augmentations", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed; same seed and inputs give the same outputs")
+    args = parser.parse_args()
+
+    augmentor = DataAugmentor(args.input_dir, args.output_dir, args.num_augmentations,
+                              workers=args.workers, seed=args.seed)
     augmentor.augment_dataset()
@@ -1,89 +1,334 @@
+import argparse
 import cv2
-import hashlib
+import os
 import shutil
+import sqlite3
 import logging
+import time
+from collections import Counter
+from multiprocessing import Pool
 from pathlib import Path
 from tqdm import tqdm
 import numpy as np
+from PIL import Image
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+def image_size(path):
+    """(width, height) from the file header only, None if it is not a readable image."""
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None
+
+def dhash(gray, size=8):
+    """Difference hash: sign of horizontal gradients on a (size+1)xsize thumbnail, as a 64-bit int."""
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    return _pack(small[:, 1:] > small[:, :-1])
+
+def phash(gray, size=8):
+    """Perceptual hash: low-frequency DCT coefficients of a 32x32 thumbnail against their median."""
+    small = cv2.resize(gray, (size * 4, size * 4), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:size, :size]
+    return _pack(low > np.median(low))
+
+def _pack(bits):
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), 'big')
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes. Finds every hash within a Hamming
+    distance without comparing against the whole index.
+    """
+    def __init__(self):
+        self.root = None  # [hash, item, {distance: child}]
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, item, {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, item, {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """Returns [(distance, item)] for all hashes within max_distance."""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= max_distance:
+                found.append((d, node[1]))
+            # Triangle inequality: only children at distance d +/- max_distance can match
+            for child_distance, child in node[2].items():
+                if d - max_distance <= child_distance <= d + max_distance:
+                    stack.append(child)
+        return found
+
+class HashIndex:
+    """
+    Persistent record of every image the cleaner has looked at (SQLite).
+    Keeps the status and hashes per file so a rerun only analyzes new or
+    changed files, and rebuilds the BK-tree of kept images on open.
+    Paths are keys relative to the raw directory, so relative and absolute
+    runs share the index.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS images (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                status TEXT,
+                width INTEGER,
+                height INTEGER,
+                phash TEXT,
+                dhash TEXT,
+                duplicate_of TEXT
+            )
+        ''')
+        self.conn.commit()
+        self.pending = []
+
+        # Hashes are stored as hex text: SQLite integers are signed 64-bit
+        self.seen = {}
+        # key -> pHash of the images currently kept. Tree entries carry the
+        # pHash they were added with, so entries of keys that were forgotten
+        # or re-hashed since no longer match anything
+        self.kept = {}
+        self.tree = BKTree()
+        for key, size, mtime, status, ph, dh in self.conn.execute(
+            'SELECT path, size, mtime, status, phash, dhash FROM images'
+        ):
+            self.seen[key] = (size, mtime)
+            if status == 'kept':
+                self.kept[key] = int(ph, 16)
+                self.tree.add(self.kept[key], (key, self.kept[key], int(dh, 16)))
+
+    def is_current(self, key, stat):
+        return self.seen.get(key) == (stat.st_size, stat.st_mtime)
+
+    def was_kept(self, key):
+        return key in self.kept
+
+    def forget(self, key):
+        """Drop a kept image from duplicate matching (its file changed and is being re-analyzed)."""
+        self.kept.pop(key, None)
+
+    def find_duplicate(self, ph, dh, max_distance, key=None):
+        """Another kept image whose pHash and dHash are both within max_distance, or None."""
+        for _, (other, other_ph, other_dh) in sorted(self.tree.search(ph, max_distance)):
+            if other == key or self.kept.get(other) != other_ph:
+                continue
+            if hamming(dh, other_dh) <= max_distance:
+                return other
+        return None
+
+    def record(self, key, result, duplicate_of=None):
+        ph, dh = result.get('phash'), result.get('dhash')
+        if result['status'] == 'kept':
+            if self.kept.get(key) != ph:
+                self.tree.add(ph, (key, ph, dh))
+            self.kept[key] = ph
+        else:
+            self.kept.pop(key, None)
+        self.seen[key] = (result['size'], result['mtime'])
+        self.pending.append((
+            key, result['size'], result['mtime'], result['status'],
+            result.get('width'), result.get('height'),
+            f"{ph:016x}" if ph is not None else None,
+            f"{dh:016x}" if dh is not None else None,
+            duplicate_of
+        ))
+        if len(self.pending) >= 500:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.conn.executemany('INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', self.pending)
+            self.conn.commit()
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+def analyze_image(path, min_res, blur_threshold):
+    """Quality checks and hashes for one image; runs in a worker process."""
+    stat = os.stat(path)
+    result = {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    # 1. Minimum resolution from the header, before paying for a full decode
+    size = image_size(path)
+    if size is None:
+        result['status'] = 'corrupt'
+        return result
+    result['width'], result['height'] = size
+    if size[0] < min_res[0] or size[1] < min_res[1]:
+        result['status'] = 'low_res'
+        return result
+
+    gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        result['status'] = 'corrupt'
+        return result
+
+    # 2. Blur check
+    if cv2.Laplacian(gray, cv2.CV_64F).var() < blur_threshold:
+        result['status'] = 'blurry'
+        return result
+
+    # 3. Hashes for the near-duplicate check (done in the parent against the index)
+    result['phash'] = phash(gray)
+    result['dhash'] = dhash(gray)
+    result['status'] = 'kept'
+    return result
+
+def _analyze(args):
+    class_name, path = args[:2]
+    try:
+        result = analyze_image(path, *args[2:])
+    except Exception as e:
+        result = {'path': path, 'status': 'error', 'error': str(e)}
+    result['class'] = class_name
+    return result
+
 class DataCleaner:
-    def __init__(self, raw_dir="dataset/raw", processed_dir="dataset/processed", min_res=(640, 640), blur_threshold=100.0):
+    def __init__(self, raw_dir="dataset/raw", processed_dir="dataset/processed", min_res=(640, 640), blur_threshold=100.0,
+                 index_path=None, workers=None, hash_distance=6):
         self.raw_dir = Path(raw_dir)
         self.processed_dir = Path(processed_dir)
         self.processed_dir.mkdir(parents=True, exist_ok=True)
-        self.min_res = min_res
+        self.min_res = tuple(min_res)
         self.blur_threshold = blur_threshold
-        self.hashes = set()
-
-    def get_image_hash(self, image):
-        # Convert to grayscale and resize for hashing
-        resized = cv2.resize(image, (8, 8), interpolation=cv2.INTER_AREA)
-        gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
-        avg = gray.mean()
-        # Binary string based on average
-        diff = gray > avg
-        # Convert binary string to hex
-        return hashlib.md5(diff.tobytes()).hexdigest()
+        self.index_path = Path(index_path) if index_path else self.processed_dir / 'clean_index.db'
+        self.workers = workers or os.cpu_count() or 1
+        self.hash_distance = hash_distance
 
     def is_blurry(self, image):
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         fm = cv2.Laplacian(gray, cv2.CV_64F).var()
         return fm < self.blur_threshold
 
+    def iter_images(self):
+        """Streams (class_name, path) without listing the whole raw folder up front."""
+        for class_dir in sorted(p for p in self.raw_dir.iterdir() if p.is_dir()):
+            with os.scandir(class_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and Path(entry.name).suffix.lower() in IMAGE_EXTENSIONS:
+                        yield class_dir.name, entry.path
+
+    def key(self, path):
+        """Index key of a raw image: its path relative to raw_dir, with forward slashes."""
+        return Path(os.path.relpath(path, self.raw_dir)).as_posix()
+
     def process_dataset(self):
+        """Cleans new and changed images in raw_dir. Returns summary stats."""
         logger.info("Starting dataset cleaning...")
-        
-        # Traverse all class directories
-        for class_dir in self.raw_dir.iterdir():
-            if not class_dir.is_dir():
-                continue
-            
-            output_class_dir = self.processed_dir / class_dir.name
-            output_class_dir.mkdir(parents=True, exist_ok=True)
-            
-            logger.info(f"Processing class: {class_dir.name}")
-            
-            images = list(class_dir.glob("*.[jJ][pP][gG]")) + list(class_dir.glob("*.[pP][nN][gG]"))
-            
-            for img_path in tqdm(images):
-                try:
-                    img = cv2.imread(str(img_path))
-                    
-                    if img is None:
-                        logger.warning(f"Corrupt image removed: {img_path}")
-                        continue
-                        
-                    # 1. Minimum Resolution Check
-                    h, w = img.shape[:2]
-                    if w < self.min_res[0] or h < self.min_res[1]:
-                        # logger.info(f"Skipping low res ({w}x{h}): {img_path}")
-                        continue
-                        
-                    # 2. Blur Check
-                    if self.is_blurry(img):
-                        # logger.info(f"Skipping blurry image: {img_path}")
-                        continue
-                        
-                    # 3. Duplicate Check
-                    img_hash = self.get_image_hash(img)
-                    if img_hash in self.hashes:
-                        # logger.info(f"Skipping duplicate: {img_path}")
+        start = time.time()
+        index = HashIndex(self.index_path)
+        stats = Counter()
+        skipped = [0]  # counted on the pool's task feeder thread
+        per_class = {}
+
+        def tasks():
+            for class_name, path in self.iter_images():
+                if index.is_current(self.key(path), os.stat(path)):
+                    skipped[0] += 1
+                    continue
+                yield class_name, path, self.min_res, self.blur_threshold
+
+        try:
+            with Pool(self.workers) as pool:
+                # Ordered results so the first of two duplicates is always the one kept
+                for result in tqdm(pool.imap(_analyze, tasks(), chunksize=32), unit='img'):
+                    path, class_name = result['path'], result['class']
+                    key = self.key(path)
+                    status = result['status']
+                    duplicate_of = None
+                    output_path = self.processed_dir / class_name / Path(path).name
+
+                    if status == 'error':
+                        logger.error(f"Error processing {path}: {result['error']}")
+                        stats['error'] += 1
                         continue
-                    
-                    self.hashes.add(img_hash)
-                    
-                    # Save valid image
-                    shutil.copy2(img_path, output_class_dir / img_path.name)
-                    
-                except Exception as e:
-                    logger.error(f"Error processing {img_path}: {e}")
 
-        logger.info("Dataset cleaning complete.")
+                    # A changed file that was kept before must not match its own old entry
+                    was_kept = index.was_kept(key)
+                    index.forget(key)
+
+                    if status == 'kept':
+                        duplicate_of = index.find_duplicate(result['phash'], result['dhash'], self.hash_distance, key)
+                        if duplicate_of is not None:
+                            status = result['status'] = 'duplicate'
+                        else:
+                            output_path.parent.mkdir(parents=True, exist_ok=True)
+                            shutil.copy2(path, output_path)
+                    if was_kept and status != 'kept' and output_path.exists():
+                        output_path.unlink()  # stale copy from the earlier run
+
+                    index.record(key, result, duplicate_of)
+                    stats[status] += 1
+                    per_class.setdefault(class_name, Counter())[status] += 1
+        finally:
+            index.close()
+
+        elapsed = time.time() - start
+        analyzed = sum(stats.values())
+        summary = {
+            'analyzed': analyzed,
+            'skipped': skipped[0],
+            'kept': stats['kept'],
+            'duplicate': stats['duplicate'],
+            'low_res': stats['low_res'],
+            'blurry': stats['blurry'],
+            'corrupt': stats['corrupt'],
+            'error': stats['error'],
+            'indexed_unique': len(index.kept),
+            'per_class': {name: dict(counts) for name, counts in per_class.items()},
+            'elapsed': round(elapsed, 1),
+            'images_per_s': round(analyzed / elapsed, 1) if elapsed > 0 else 0.0
+        }
+        logger.info(
+            f"Dataset cleaning complete: {summary['analyzed']} analyzed ({summary['images_per_s']}/s), "
+            f"{summary['skipped']} unchanged, {summary['kept']} kept, {summary['duplicate']} duplicates, "
+            f"{summary['low_res']} low res, {summary['blurry']} blurry, {summary['corrupt']} corrupt"
+        )
+        for name, counts in summary['per_class'].items():
+            logger.info(f"  {name}: {counts}")
+        return summary
 
 if __name__ == "__main__":
-    cleaner = DataCleaner()
+    parser = argparse.ArgumentParser(description="Filter low-res, blurry and near-duplicate images")
+    parser.add_argument("--raw-dir", type=str, default="dataset/raw")
+    parser.add_argument("--processed-dir", type=str, default="dataset/processed")
+    parser.add_argument("--index", type=str, default=None, help="Hash index (default: <processed-dir>/clean_index.db)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--min-res", type=int, nargs=2, default=(640, 640), metavar=("W", "H"))
+    parser.add_argument("--blur-threshold", type=float, default=100.0)
+    parser.add_argument("--hash-distance", type=int, default=6, help="Max Hamming distance for near duplicates")
+    args = parser.parse_args()
+
+    cleaner = DataCleaner(args.raw_dir, args.processed_dir, args.min_res, args.blur_threshold,
+                          index_path=args.index, workers=args.workers, hash_distance=args.hash_distance)
     cleaner.process_dataset()
@@ -2,59 +2,230 @@ import os
 import requests
 import hashlib
 import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from tqdm import tqdm
-import cv2
-import numpy as np
+from PIL import Image
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Leading bytes of the formats we keep, and the extension they are saved with
+MAGIC = (
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+    (b'RIFF', '.webp'),  # confirmed by the WEBP tag at offset 8
+)
+
+# Outcomes that are final; anything else (network errors, 5xx) is retried on the next run
+FINAL_STATUSES = ('ok', 'duplicate', 'invalid', 'too_large', 'http_error')
+
+def sniff_extension(head):
+    """Image extension from the first bytes of a file, None if it is not an image we keep."""
+    for magic, ext in MAGIC:
+        if head.startswith(magic):
+            if ext == '.webp' and head[8:12] != b'WEBP':
+                return None
+            return ext
+    return None
+
+class Manifest:
+    """
+    Persistent record of every URL fetched and every image stored (SQLite).
+    URLs with a final outcome are skipped on later runs, and content hashes
+    dedup the same image served from different URLs.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                class_name TEXT,
+                status TEXT,
+                sha256 TEXT,
+                bytes INTEGER,
+                error TEXT,
+                fetched_at REAL
+            )
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS images (
+                sha256 TEXT PRIMARY KEY,
+                path TEXT,
+                width INTEGER,
+                height INTEGER
+            )
+        ''')
+        self.conn.commit()
+        self.lock = threading.Lock()
+
+    def is_done(self, url):
+        with self.lock:
+            row = self.conn.execute('SELECT status FROM urls WHERE url = ?', (url,)).fetchone()
+        return row is not None and row[0] in FINAL_STATUSES
+
+    def claim(self, sha256, path, size):
+        """Registers new content. Returns the path already stored for it, or None if it is new."""
+        with self.lock:
+            row = self.conn.execute('SELECT path FROM images WHERE sha256 = ?', (sha256,)).fetchone()
+            if row is not None:
+                return row[0]
+            self.conn.execute('INSERT INTO images VALUES (?, ?, ?, ?)', (sha256, str(path), size[0], size[1]))
+            self.conn.commit()
+        return None
+
+    def record(self, url, class_name, status, sha256=None, size=None, error=None):
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, class_name, status, sha256, size, error, time.time())
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
 class DataScraper:
-    def __init__(self, download_dir="dataset/raw", max_workers=8):
+    def __init__(self, download_dir="dataset/raw", max_workers=8, per_host=4, max_bytes=20 * 1024 * 1024,
+                 retries=3, backoff=0.5, timeout=10, manifest_path=None):
         self.download_dir = Path(download_dir)
         self.download_dir.mkdir(parents=True, exist_ok=True)
         self.max_workers = max_workers
+        self.per_host = per_host
+        self.max_bytes = max_bytes
+        self.timeout = timeout
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        self.manifest = Manifest(manifest_path or self.download_dir / 'manifest.db')
+
+        # One pooled session for all threads; urllib3 retries connection errors,
+        # 429 and 5xx with exponential backoff (and honors Retry-After)
+        retry = Retry(
+            total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=('GET',), raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=max(max_workers, per_host), max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.host_limits = {}
+        self.host_lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        with self.host_lock:
+            if host not in self.host_limits:
+                self.host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self.host_limits[host]
 
     def download_image(self, url, class_name):
+        """Fetches one URL into download_dir/class_name. Returns the outcome status."""
+        if self.manifest.is_done(url):
+            return 'skipped'
+
+        class_dir = self.download_dir / class_name
+        class_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = class_dir / f".{hashlib.md5(url.encode()).hexdigest()}.part"
+
         try:
-            class_dir = self.download_dir / class_name
-            class_dir.mkdir(parents=True, exist_ok=True)
-
-            # Generate filename from hash of URL
-            url_hash = hashlib.md5(url.encode()).hexdigest()
-            file_path = class_dir / f"{url_hash}.jpg"
-
-            if file_path.exists():
-                return  # Skip existing
-
-            response = requests.get(url, headers=self.headers, timeout=10)
-            if response.status_code == 200:
-                # Basic validity check using OpenCV
-                image_array = np.asarray(bytearray(response.content), dtype=np.uint8)
-                img = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-
-                if img is not None:
-                    # Save locally
-                    with open(file_path, 'wb') as f:
-                        f.write(response.content)
-                else:
-                    logger.warning(f"Invalid image found at {url}")
-            else:
-                logger.warning(f"Failed to download {url}: Status {response.status_code}")
+            with self._host_slot(url):
+                status, sha256, size, ext = self._fetch(url, tmp_path)
 
-        except Exception as e:
+            if status != 'ok':
+                self.manifest.record(url, class_name, status, size=size)
+                return status
+
+            # Cheap validity check: parse the header only, no full decode
+            try:
+                with Image.open(tmp_path) as img:
+                    dims = img.size
+            except Exception:
+                dims = None
+            if not dims or min(dims) <= 0:
+                logger.warning(f"Invalid image found at {url}")
+                self.manifest.record(url, class_name, 'invalid', sha256, size)
+                return 'invalid'
+
+            # Dedup by content: the same image at two URLs is stored once
+            file_path = class_dir / f"{sha256[:32]}{ext}"
+            if self.manifest.claim(sha256, file_path, dims) is not None:
+                self.manifest.record(url, class_name, 'duplicate', sha256, size)
+                return 'duplicate'
+            os.replace(tmp_path, file_path)
+            self.manifest.record(url, class_name, 'ok', sha256, size)
+            return 'ok'
+
+        except requests.RequestException as e:
             logger.error(f"Error downloading {url}: {e}")
+            self.manifest.record(url, class_name, 'error', error=str(e))
+            return 'error'
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def _fetch(self, url, tmp_path):
+        """Streams the body to tmp_path, hashing as it goes. Returns (status, sha256, bytes, ext)."""
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            if response.status_code != 200:
+                logger.warning(f"Failed to download {url}: Status {response.status_code}")
+                # Server errors that outlived the retries may clear up by the next run
+                return ('error' if response.status_code >= 500 or response.status_code == 429 else 'http_error'), None, None, None
+
+            content_type = response.headers.get('Content-Type', '')
+            if content_type and not content_type.startswith(('image/', 'application/octet-stream', 'binary/')):
+                logger.warning(f"Not an image at {url}: {content_type}")
+                return 'invalid', None, None, None
+            length = response.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > self.max_bytes:
+                return 'too_large', None, int(length), None
+
+            hasher = hashlib.sha256()
+            size = 0
+            ext = None
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    if ext is None:
+                        ext = sniff_extension(chunk[:16])
+                        if ext is None:
+                            logger.warning(f"Invalid image found at {url}")
+                            return 'invalid', None, None, None
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        return 'too_large', None, size, None
+                    hasher.update(chunk)
+                    f.write(chunk)
+            if ext is None:
+                return 'invalid', None, 0, None
+        return 'ok', hasher.hexdigest(), size, ext
 
     def download_batch(self, urls, class_name):
+        """Downloads urls concurrently; returns a Counter of outcomes."""
         logger.info(f"Downloading {len(urls)} images for class '{class_name}'...")
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            list(tqdm(executor.map(lambda url: self.download_image(url, class_name), urls), total=len(urls)))
+            outcomes = Counter(tqdm(executor.map(lambda url: self.download_image(url, class_name), urls), total=len(urls)))
+        logger.info(f"Class '{class_name}': {dict(outcomes)}")
+        return outcomes
+
+    def close(self):
+        self.session.close()
+        self.manifest.close()
 
     def download_kaggle_dataset(self, dataset_name, path=None):
         """
@@ -74,12 +245,12 @@ class DataScraper:
 if __name__ == "__main__":
     # Example usage
     scraper = DataScraper()
-    
+
     # Placeholder for actual URL lists
     leopard_urls = [
         # "https://example.com/leopard1.jpg",
         # "https://example.com/leopard2.jpg"
     ]
-    
+
     # scraper.download_batch(leopard_urls, "leopard")
     # scraper.download_kaggle_dataset("soumikrakshit/animal-image-dataset-90-different-animals")
@@ -0,0 +1,118 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+class BatchInferenceWorker:
+    """
+    Shares a single LeopardDetector between several camera pipelines.
+    Frames submitted through predict() are collected into batches and sent to
+    the model in one predict call; each caller gets back its own result.
+    Exposes the same predict() interface as LeopardDetector.
+    """
+    def __init__(self, detector, batch_size=8, max_wait=0.02):
+        self.detector = detector
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.running = False
+        self.thread = None
+
+        # Stats
+        self.batches = 0
+        self.frames = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def submit(self, frame):
+        """Queue a frame for inference. Returns a Future resolving to its result."""
+        future = Future()
+        if not self.running:
+            future.set_exception(RuntimeError("Inference worker is not running"))
+            return future
+        self.requests.put((frame, future))
+        return future
+
+    @property
+    def config(self):
+        return self.detector.config
+
+    @property
+    def names(self):
+        return self.detector.names
+
+    def predict(self, frame):
+        """Blocking inference on a single frame (batched with other cameras)."""
+        return self.submit(frame).result()
+
+    def predict_batch(self, frames):
+        futures = [self.submit(frame) for frame in frames]
+        return [future.result() for future in futures]
+
+    def _collect_batch(self):
+        try:
+            batch = [self.requests.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        # Wait a short while for other cameras to fill the batch
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while self.running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            frames = [frame for frame, _ in batch]
+            try:
+                results = self.detector.predict_batch(frames)
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"Batched inference failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self.batches += 1
+            self.frames += len(batch)
+
+        self._fail_pending()
+
+    def _fail_pending(self):
+        # Fail anything still waiting so camera threads can exit
+        while True:
+            try:
+                _, future = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(RuntimeError("Inference worker stopped"))
+
+    def average_batch_size(self):
+        if self.batches == 0:
+            return 0.0
+        return self.frames / self.batches
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self._fail_pending()
+            logger.info(f"Inference worker stopped. Avg batch size: {self.average_batch_size():.2f}")
@@ -4,62 +4,101 @@ import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Reason codes returned by DetectionFilter.validate_batch
+VALID, BAD_ASPECT, TOO_SMALL, NO_MOTION, EXCLUDED_ZONE = range(5)
+REASONS = ("Valid", "Invalid aspect ratio", "Too small", "No motion correlation", "Outside detection zones")
+REASON_KEYS = ("valid", "aspect_ratio", "too_small", "no_motion", "zone")  # metric labels
+
 class DetectionFilter:
     def __init__(self, config):
         self.config = config
         self.history = {} # Track ID -> history of detections
         self.min_hits = config.get('tracking', {}).get('min_hits', 3)
         self.min_confidence = config.get('detection', {}).get('conf_threshold', 0.6)
+        # Motion check: 'rects' (overlap with motion bounding rects, the default)
+        # or 'mask' (share of the box's pixels that move, from the motion summed-area table)
+        self.motion_check = config.get('detection', {}).get('motion_check', 'rects')
+        self.min_motion_coverage = config.get('detection', {}).get('min_motion_coverage', 0.1)
+        # Share of a box that must lie inside the camera's detection zones
+        self.min_zone_overlap = (config.get('camera', {}).get('zones') or {}).get('min_overlap', 0.5)
 
     def validate_detection(self, bbox, confidence, track_id=None, motion_rects=None):
         """
         Validates a detection based on heuristic rules and history.
         """
-        x1, y1, x2, y2 = bbox
+        valid, reasons = self.validate_batch(np.asarray([bbox], dtype=np.float32), motion_rects)
+        if not valid[0]:
+            return False, REASONS[reasons[0]]
+
+        # 5. Temporal Consistency (if tracking enabled)
+        if track_id is not None:
+            return self.confirm_track(track_id)
+
+        return True, "Valid"
+
+    def validate_batch(self, boxes, motion_rects=None, coverage=None, zones=None):
+        """
+        Heuristic checks for a whole frame of detections at once.
+        boxes: (N, >=4) array of x1, y1, x2, y2 (e.g. results.boxes.data).
+        motion_rects: (M, 4) array or list of x, y, w, h; None or empty skips the motion check.
+        coverage: MotionCoverage of the frame's motion mask, used instead of the
+        rects when motion_check is 'mask'.
+        zones: summed-area table of the camera's zone mask (app.zones.Zones.coverage).
+        Returns (valid mask (N,), reason codes (N,)) with codes indexing REASONS.
+        """
+        boxes = np.asarray(boxes, dtype=np.float32)
+        if boxes.ndim != 2:
+            boxes = boxes.reshape(-1, 4)
+        x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
         w = x2 - x1
         h = y2 - y1
-        
+
         # 1. Aspect Ratio Check (Leopards are generally horizontal)
-        aspect_ratio = w / h
-        if aspect_ratio < 0.5 or aspect_ratio > 4.0:
-            return False, "Invalid aspect ratio"
-            
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aspect_ratio = w / h
+        bad_aspect = ~((aspect_ratio >= 0.5) & (aspect_ratio <= 4.0))
+
         # 2. Minimum Size Check
-        if w < 50 or h < 50:
-             return False, "Too small"
+        too_small = (w < 50) | (h < 50)
 
-        # 3. Motion Validation (Intersection with motion mask)
-        if motion_rects:
-            has_overlap = False
-            box_area = w * h
-            
-            for mx, my, mw, mh in motion_rects:
-                # Calculate Intersection
-                ix1 = max(x1, mx)
-                iy1 = max(y1, my)
-                ix2 = min(x2, mx + mw)
-                iy2 = min(y2, my + mh)
-                
-                iw = max(0, ix2 - ix1)
-                ih = max(0, iy2 - iy1)
-                
-                intersection = iw * ih
-                if intersection > 0.3 * box_area: # at least 30% overlap with motion
-                    has_overlap = True
-                    break
-            
-            if not has_overlap:
-                return False, "No motion correlation"
+        # 3. Static zones: mostly inside an excluded area
+        excluded = np.zeros(len(boxes), dtype=bool)
+        if zones is not None:
+            excluded = zones.fraction(boxes) < self.min_zone_overlap
 
-        # 4. Temporal Consistency (if tracking enabled)
-        if track_id is not None:
-            if track_id not in self.history:
-                self.history[track_id] = {'hits': 0, 'first_seen': time.time()}
-            
-            self.history[track_id]['hits'] += 1
-            
-            if self.history[track_id]['hits'] < self.min_hits:
-                return False, f"Waiting for confirmation ({self.history[track_id]['hits']}/{self.min_hits})"
+        # 4. Motion Validation
+        no_motion = np.zeros(len(boxes), dtype=bool)
+        if coverage is not None and self.motion_check == 'mask':
+            # Moving pixels inside each box, four lookups per box
+            no_motion = coverage.fraction(boxes) < self.min_motion_coverage
+        elif motion_rects is not None and len(motion_rects):
+            # Intersection of every box with every motion rect (N x M)
+            rects = np.asarray(motion_rects, dtype=np.float32).reshape(-1, 4)
+            mx1, my1 = rects[:, 0], rects[:, 1]
+            mx2, my2 = mx1 + rects[:, 2], my1 + rects[:, 3]
+            iw = np.minimum(x2[:, None], mx2) - np.maximum(x1[:, None], mx1)
+            ih = np.minimum(y2[:, None], my2) - np.maximum(y1[:, None], my1)
+            intersection = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+            # at least 30% overlap with one motion rect
+            no_motion = ~(intersection > 0.3 * (w * h)[:, None]).any(axis=1)
+
+        # First failing check wins, in the order above
+        reasons = np.select(
+            [bad_aspect, too_small, excluded, no_motion], [BAD_ASPECT, TOO_SMALL, EXCLUDED_ZONE, NO_MOTION], VALID
+        ).astype(np.uint8)
+        return reasons == VALID, reasons
+
+    def confirm_track(self, track_id):
+        """
+        Temporal consistency: a track must be seen min_hits times before it is reported.
+        """
+        if track_id not in self.history:
+            self.history[track_id] = {'hits': 0, 'first_seen': time.time()}
+        
+        self.history[track_id]['hits'] += 1
+        
+        if self.history[track_id]['hits'] < self.min_hits:
+            return False, f"Waiting for confirmation ({self.history[track_id]['hits']}/{self.min_hits})"
 
         return True, "Valid"
 
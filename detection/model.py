@@ -1,6 +1,11 @@
 from ultralytics import YOLO
+from ultralytics.engine.results import Results
 import logging
+import time
+import numpy as np
 import torch
+from detection.engines import create_engine, LetterboxCache, postprocess
+from detection.resolution import ResolutionController
 
 logger = logging.getLogger(__name__)
 
@@ -8,30 +13,82 @@ class LeopardDetector:
     def __init__(self, model_path, config):
         self.config = config
         self.device = 'cuda' if torch.cuda.is_available() and config.get('device') == 'cuda' else 'cpu'
+        self.engine_name = config.get('engine', 'torch')
+        self.engine = None
+        self.model = None
+        self.img_size = config.get('img_size', 640)
+        # Input size (fixed or adaptive) and letterboxing we do ourselves for both paths,
+        # so scale/padding and buffers are computed once per source resolution
+        self.resolution = ResolutionController(config)
+        self.letterbox = LetterboxCache()
+        dummy_frame = np.zeros((640, 640, 3), dtype=np.uint8)
+
+        if self.engine_name != 'torch':
+            # Exported runtime (ONNX Runtime / OpenVINO) with our own pre/post-processing
+            logger.info(f"Loading {self.engine_name} engine for {model_path}...")
+            try:
+                self.engine = create_engine(model_path, config)
+                self.names = self.engine.names
+                self.predict(dummy_frame)
+            except Exception as e:
+                logger.error(f"Failed to load {self.engine_name} engine: {e}")
+                raise
+            return
+
         logger.info(f"Loading YOLOv8 model from {model_path} on {self.device}...")
         try:
             self.model = YOLO(model_path)
+            self.names = self.model.names
             # Warmup with dummy image
-            import numpy as np
-            dummy_frame = np.zeros((640, 640, 3), dtype=np.uint8)
-            self.model.predict(source=dummy_frame, device=self.device, verbose=False)
+            self.predict(dummy_frame)
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             raise
 
+    def _predict_kwargs(self):
+        return {
+            'conf': self.config.get('conf_threshold', 0.6),
+            'iou': self.config.get('iou_threshold', 0.45),
+            'classes': self.config.get('classes', [0]), # Default class filter
+            'device': self.device,
+            'verbose': False
+        }
+
     def predict(self, frame):
         """
         Run inference on a frame.
         """
-        conf_thres = self.config.get('conf_threshold', 0.6)
-        iou_thres = self.config.get('iou_threshold', 0.45)
-        classes = self.config.get('classes', [0]) # Default class filter
-        
-        results = self.model.predict(
-            frame, 
-            conf=conf_thres, 
-            iou=iou_thres, 
-            classes=classes, 
-            verbose=False
-        )
-        return results[0]  # Return first result (single frame)
+        return self.predict_batch([frame])[0]
+
+    def predict_batch(self, frames):
+        """
+        Run inference on a list of frames in a single model call.
+        Returns one result per frame, in order.
+        """
+        if not frames:
+            return []
+        start = time.perf_counter()
+        batch, entries = self.letterbox.prepare(frames, self.resolution.size)
+        if self.engine is not None:
+            dets = postprocess(
+                self.engine.infer(batch),
+                conf_threshold=self.config.get('conf_threshold', 0.6),
+                iou_threshold=self.config.get('iou_threshold', 0.45),
+                classes=self.config.get('classes', [0])
+            )
+        else:
+            # A letterboxed tensor skips ultralytics' own resize/pad; boxes come back in input coordinates
+            results = self.model.predict(torch.from_numpy(batch), **self._predict_kwargs())
+            dets = [r.boxes.data.cpu().numpy() for r in results]
+
+        # Same Results objects for every path so downstream code is unchanged
+        results = [
+            make_results(frame, self.letterbox.to_source(d, entry), self.names)
+            for frame, d, entry in zip(frames, dets, entries)
+        ]
+        self.resolution.observe(time.perf_counter() - start, len(frames))
+        return results
+
+def make_results(frame, dets, names):
+    """Wrap an (N, 6) array of frame-coordinate boxes in an ultralytics Results."""
+    return Results(orig_img=frame, path='', names=names, boxes=dets)
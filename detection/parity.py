@@ -0,0 +1,124 @@
+import argparse
+import copy
+import logging
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from detection.model import LeopardDetector
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def _boxes(result):
+    if result.boxes is None or len(result.boxes) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+    data = result.boxes.data
+    if hasattr(data, 'cpu'):
+        data = data.cpu().numpy()
+    return np.asarray(data, dtype=np.float32)
+
+def _iou_matrix(a, b):
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+def compare(reference, candidate, iou_threshold=0.9):
+    """
+    Greedily matches candidate boxes to reference boxes of the same class.
+    Returns (matched, reference_count, candidate_count, max_conf_diff).
+    """
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0, len(reference), len(candidate), 0.0
+
+    ious = _iou_matrix(reference, candidate)
+    ious[reference[:, None, 5] != candidate[None, :, 5]] = 0
+    matched = 0
+    max_conf_diff = 0.0
+    for i in np.argsort(-reference[:, 4]):
+        j = int(ious[i].argmax())
+        if ious[i, j] >= iou_threshold:
+            matched += 1
+            max_conf_diff = max(max_conf_diff, abs(float(reference[i, 4] - candidate[j, 4])))
+            ious[:, j] = 0
+    return matched, len(reference), len(candidate), max_conf_diff
+
+def load_images(source, limit):
+    path = Path(source)
+    if path.is_dir():
+        files = sorted(p for p in path.iterdir() if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+        return [img for img in (cv2.imread(str(f)) for f in files[:limit]) if img is not None]
+
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def check_parity(model_path, det_config, images, engine, iou_threshold=0.9):
+    """Runs the PyTorch model and `engine` on the same images and compares boxes."""
+    torch_config = dict(det_config, engine='torch')
+    engine_config = dict(copy.deepcopy(det_config), engine=engine)
+    reference = LeopardDetector(model_path, torch_config)
+    candidate = LeopardDetector(model_path, engine_config)
+
+    totals = {'matched': 0, 'reference': 0, 'candidate': 0, 'max_conf_diff': 0.0}
+    for image in images:
+        matched, n_ref, n_cand, conf_diff = compare(
+            _boxes(reference.predict(image)), _boxes(candidate.predict(image)), iou_threshold
+        )
+        totals['matched'] += matched
+        totals['reference'] += n_ref
+        totals['candidate'] += n_cand
+        totals['max_conf_diff'] = max(totals['max_conf_diff'], conf_diff)
+
+    totals['recall'] = totals['matched'] / totals['reference'] if totals['reference'] else 1.0
+    totals['precision'] = totals['matched'] / totals['candidate'] if totals['candidate'] else 1.0
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare an exported engine against the PyTorch model")
+    parser.add_argument("--source", type=str, required=True, help="Image directory or video file")
+    parser.add_argument("--engine", type=str, default="onnx", help="onnx or openvino")
+    parser.add_argument("--int8", action="store_true", help="Compare the INT8 export")
+    parser.add_argument("--config", type=str, default="configs/config.yaml")
+    parser.add_argument("--limit", type=int, default=50, help="Max images/frames")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="Fail below this match rate")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        det_config = yaml.safe_load(f)['detection']
+    det_config['int8'] = args.int8
+
+    images = load_images(args.source, args.limit)
+    if not images:
+        logger.error(f"No images found in {args.source}")
+        sys.exit(1)
+
+    totals = check_parity(det_config['model_path'], det_config, images, args.engine)
+    logger.info(
+        f"Parity ({args.engine}{' int8' if args.int8 else ''}) on {len(images)} images: "
+        f"recall {totals['recall']:.3f}, precision {totals['precision']:.3f}, "
+        f"max conf diff {totals['max_conf_diff']:.4f}"
+    )
+    if totals['recall'] < args.min_recall or totals['precision'] < args.min_recall:
+        logger.error("Engine outputs diverge from the PyTorch model")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+def load_per_core():
+    """1-minute load average per core, None where the OS does not report it."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+class ResolutionController:
+    """
+    Chooses the detector input size (long side, multiple of 32).
+    Fixed at `img_size` unless `adaptive_size.enabled`; then it steps down
+    through `sizes` while per-frame inference misses the 1/target_fps budget
+    or the machine is loaded, and back up once the next size is predicted to
+    fit with headroom. Decisions need `patience` agreeing observations
+    (three times as many to grow), so the size does not flap.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.base_size = config.get('img_size', 640)
+        adaptive = config.get('adaptive_size') or {}
+        self.enabled = adaptive.get('enabled', False)
+        sizes = adaptive.get('sizes', [320, 416, 512, 640]) if self.enabled else [self.base_size]
+        self.sizes = sorted({int(s) // 32 * 32 for s in sizes if s >= 32})
+        self.budget = 1.0 / adaptive.get('target_fps', 5)
+        self.max_load = adaptive.get('max_load', 0.85)
+        self.headroom = adaptive.get('headroom', 0.6)
+        self.patience = adaptive.get('patience', 10)
+        self.ema_alpha = adaptive.get('ema_alpha', 0.2)
+
+        fitting = [s for s in self.sizes if s <= self.base_size]
+        self.index = self.sizes.index(fitting[-1]) if fitting else 0
+        self.max_size = None  # upper bound set by the scene profile (app.profiles)
+        self.latency = {}    # size -> EMA of seconds per frame
+        self.votes = 0
+        self.changes = 0
+
+    @property
+    def size(self):
+        size = self.sizes[self.index]
+        return min(size, self.max_size) if self.max_size else size
+
+    def limit(self, size):
+        """Cap the input size below the adaptive/fixed choice (None removes the cap)."""
+        self.max_size = max(32, int(size) // 32 * 32) if size else None
+
+    def observe(self, seconds, frames=1):
+        """Feed the wall time of one detector call covering `frames` frames."""
+        size = self.size
+        per_frame = seconds / max(frames, 1)
+        previous = self.latency.get(size)
+        self.latency[size] = per_frame if previous is None else previous + self.ema_alpha * (per_frame - previous)
+        if not self.enabled or size != self.sizes[self.index]:
+            return  # fixed, or held below the adaptive choice by the cap
+
+        latency = self.latency[size]
+        load = load_per_core()
+        overloaded = load is not None and load > self.max_load
+        if (latency > self.budget or overloaded) and self.index > 0:
+            self.votes = min(self.votes, 0) - 1
+        elif self.index < len(self.sizes) - 1 and not overloaded and self._predicted(self.index + 1) < self.headroom * self.budget:
+            self.votes = max(self.votes, 0) + 1
+        else:
+            self.votes = 0
+
+        if self.votes <= -self.patience:
+            self._step(-1, latency, load)
+        elif self.votes >= 3 * self.patience:
+            self._step(1, latency, load)
+
+    def _predicted(self, index):
+        """Measured latency at sizes[index], or scaled from the current one (cost ~ pixels)."""
+        size = self.sizes[index]
+        if size in self.latency:
+            return self.latency[size]
+        current = self.sizes[self.index]
+        return self.latency[current] * (size / current) ** 2
+
+    def _step(self, direction, latency, load):
+        old = self.sizes[self.index]
+        self.index += direction
+        self.votes = 0
+        self.changes += 1
+        load_text = f", load {load:.2f}/core" if load is not None else ""
+        logger.info(
+            f"Inference size {old} -> {self.sizes[self.index]} "
+            f"({latency * 1000:.0f} ms/frame against a {self.budget * 1000:.0f} ms budget{load_text})"
+        )
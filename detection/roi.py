@@ -0,0 +1,136 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def merge_rects(rects, frame_shape, padding=32, min_size=256):
+    """
+    Turns motion rects (x, y, w, h) into a list of disjoint, padded crop
+    regions (x1, y1, x2, y2) clipped to the frame.
+    Small regions are grown to min_size so the detector keeps some context.
+    """
+    height, width = frame_shape[:2]
+    regions = []
+    for x, y, w, h in rects:
+        x1, y1, x2, y2 = x - padding, y - padding, x + w + padding, y + h + padding
+
+        # Grow small regions around their centre
+        if x2 - x1 < min_size:
+            cx = (x1 + x2) / 2
+            x1, x2 = cx - min_size / 2, cx + min_size / 2
+        if y2 - y1 < min_size:
+            cy = (y1 + y2) / 2
+            y1, y2 = cy - min_size / 2, cy + min_size / 2
+
+        regions.append([
+            int(max(0, x1)), int(max(0, y1)),
+            int(min(width, x2)), int(min(height, y2))
+        ])
+
+    # Union overlapping regions until all are disjoint
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        while regions:
+            current = regions.pop()
+            i = 0
+            while i < len(regions):
+                if _overlaps(current, regions[i]):
+                    other = regions.pop(i)
+                    current = [
+                        min(current[0], other[0]), min(current[1], other[1]),
+                        max(current[2], other[2]), max(current[3], other[3])
+                    ]
+                    merged = True
+                else:
+                    i += 1
+            result.append(current)
+        regions = result
+
+    return [tuple(r) for r in regions if r[2] > r[0] and r[3] > r[1]]
+
+def nms(dets, iou_threshold=0.45):
+    """
+    Class-aware non-maximum suppression.
+    dets: (N, 6) array of x1, y1, x2, y2, conf, cls. Returns the kept rows.
+    """
+    if len(dets) == 0:
+        return dets
+
+    # Offset boxes per class so different classes never overlap
+    offsets = dets[:, 5:6] * (dets[:, :4].max() + 1)
+    boxes = dets[:, :4] + offsets
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = dets[:, 4].argsort()[::-1]
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        ix1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        iy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        ix2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        iy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+
+    return dets[keep]
+
+def plan_crops(frame_shape, motion_rects, config):
+    """
+    Returns the crop regions to run the detector on, or None when full-frame
+    inference is cheaper (motion covers most of the frame or is too scattered).
+    """
+    if not motion_rects:
+        return None
+
+    regions = merge_rects(
+        motion_rects, frame_shape,
+        padding=config.get('roi_padding', 32),
+        min_size=config.get('roi_min_size', 256)
+    )
+
+    max_crops = config.get('roi_max_crops', 4)
+    if len(regions) > max_crops:
+        # Too scattered: use a single crop around all of the motion
+        regions = [(
+            min(r[0] for r in regions), min(r[1] for r in regions),
+            max(r[2] for r in regions), max(r[3] for r in regions)
+        )]
+
+    frame_area = frame_shape[0] * frame_shape[1]
+    crop_area = sum((r[2] - r[0]) * (r[3] - r[1]) for r in regions)
+    if crop_area > config.get('roi_max_area', 0.6) * frame_area:
+        return None
+
+    return regions
+
+def predict_regions(detector, frame, regions, iou_threshold=0.45):
+    """
+    Runs the detector on each crop in one batch and maps the boxes back to
+    full-frame coordinates. Returns an (N, 6) array after cross-crop NMS.
+    """
+    crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+    results = detector.predict_batch(crops)
+
+    all_dets = []
+    for (x1, y1, _, _), result in zip(regions, results):
+        if result.boxes is None or len(result.boxes) == 0:
+            continue
+        data = result.boxes.data
+        if hasattr(data, 'cpu'):
+            data = data.cpu().numpy()
+        dets = np.array(data, dtype=np.float32)
+        dets[:, [0, 2]] += x1
+        dets[:, [1, 3]] += y1
+        all_dets.append(dets)
+
+    if not all_dets:
+        return np.zeros((0, 6), dtype=np.float32)
+    return nms(np.concatenate(all_dets), iou_threshold)
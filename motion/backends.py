@@ -0,0 +1,223 @@
+import cv2
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Reference resolution for `min_area` (pixels at 640x480)
+REFERENCE_AREA = 640 * 480
+
+class MotionBackend:
+    """
+    Base class for motion backends.
+    detect(frame) returns (has_motion, motion_mask, motion_rects) where the mask
+    is at processing resolution and rects (x, y, w, h) are in frame coordinates.
+    """
+    def __init__(self, config, default_size=(640, 480), pool=None):
+        self.config = config
+        self.base_config = config
+        self.size = (config.get('width', default_size[0]), config.get('height', default_size[1]))
+        # Keep the configured min_area meaningful at any processing resolution
+        self.min_area = config.get('min_area', 500) * (self.size[0] * self.size[1]) / REFERENCE_AREA
+
+        # Intermediate images are written into preallocated buffers (dst=) so
+        # detect() does not allocate per frame. The returned mask comes from
+        # the frame pool because downstream stages may still hold older ones.
+        self.pool = pool
+        self.buffers = {}
+        self.gray_index = 0
+
+        # Static include/exclude zones at processing resolution (set by the pipeline)
+        self.zone_mask = None
+
+    def configure(self, params):
+        """
+        Live update of the thresholds (scene profiles): params override the
+        construction config, so keys left out return to it. The processing
+        size is fixed.
+        """
+        self.config = {**self.base_config, **params}
+        self.min_area = self.config.get('min_area', 500) * (self.size[0] * self.size[1]) / REFERENCE_AREA
+
+    def _buffer(self, name, shape, dtype=np.uint8):
+        buf = self.buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = self.buffers[name] = np.empty(shape, dtype)
+        return buf
+
+    def _mask_buffer(self):
+        shape = (self.size[1], self.size[0])
+        if self.pool is not None:
+            return self.pool.acquire(shape)
+        return np.empty(shape, np.uint8)
+
+    def _preprocess(self, frame, blur=21):
+        w, h = self.size
+        small_frame = cv2.resize(frame, self.size, dst=self._buffer('small', (h, w, 3)))
+        # Two gray buffers used alternately, so the previous frame survives for differencing
+        self.gray_index ^= 1
+        gray = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY, dst=self._buffer(f'gray{self.gray_index}', (h, w)))
+        if blur:
+            cv2.GaussianBlur(gray, (blur, blur), 0, dst=gray)
+        return small_frame, gray
+
+    def _find_rects(self, motion_mask, frame_shape):
+        # Drop motion in excluded zones before it can become a rect
+        if self.zone_mask is not None:
+            cv2.bitwise_and(motion_mask, self.zone_mask, dst=motion_mask)
+
+        # Find contours of motion
+        contours, _ = cv2.findContours(motion_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        motion_rects = []
+        has_motion = False
+        scale_x = frame_shape[1] / self.size[0]
+        scale_y = frame_shape[0] / self.size[1]
+
+        for contour in contours:
+            if cv2.contourArea(contour) < self.min_area:
+                continue
+
+            has_motion = True
+            # Build bounding rect (scaled back to original size)
+            x, y, w, h = cv2.boundingRect(contour)
+            motion_rects.append((
+                int(x * scale_x),
+                int(y * scale_y),
+                int(w * scale_x),
+                int(h * scale_y)
+            ))
+
+        return has_motion, motion_rects
+
+    def detect(self, frame):
+        raise NotImplementedError
+
+class FarnebackBackend(MotionBackend):
+    """Dense Farneback optical flow. Most accurate, most expensive."""
+    def __init__(self, config, pool=None):
+        super().__init__(config, pool=pool)
+        self.prev_gray = None
+        self.kernel = np.ones((5, 5), np.uint8)
+        # Sensitivity controlled by flow_threshold (falls back to var_threshold)
+        self.threshold = self.config.get('flow_threshold', self.config.get('var_threshold', 2.0))
+
+    def configure(self, params):
+        super().configure(params)
+        self.threshold = self.config.get('flow_threshold', self.config.get('var_threshold', 2.0))
+
+    def detect(self, frame):
+        small_frame, gray = self._preprocess(frame)
+
+        if self.prev_gray is None:
+            self.prev_gray = gray
+            return False, None, []
+
+        # Calculate Optical Flow
+        h, w = gray.shape
+        flow = cv2.calcOpticalFlowFarneback(
+            self.prev_gray, gray, self._buffer('flow', (h, w, 2), np.float32), 0.5, 3, 15, 3, 5, 1.2, 0
+        )
+
+        # Threshold the squared magnitude to create the motion mask (no sqrt / angle needed)
+        squared = np.multiply(flow, flow, out=self._buffer('flow_sq', (h, w, 2), np.float32))
+        magnitude = np.add(squared[..., 0], squared[..., 1], out=self._buffer('magnitude', (h, w), np.float32))
+        raw_mask = cv2.compare(magnitude, self.threshold ** 2, cv2.CMP_GT, dst=self._buffer('raw_mask', (h, w)))
+
+        # Morphological operations to clean up noise
+        dilated = cv2.dilate(raw_mask, self.kernel, dst=self._buffer('dilated', (h, w)), iterations=2)
+        motion_mask = cv2.erode(dilated, self.kernel, dst=self._mask_buffer(), iterations=1)
+
+        has_motion, motion_rects = self._find_rects(motion_mask, frame.shape)
+        self.prev_gray = gray
+
+        return has_motion, motion_mask, motion_rects
+
+class BackgroundSubtractorBackend(MotionBackend):
+    """OpenCV MOG2 / KNN background subtraction using the motion config parameters."""
+    def __init__(self, config, method='mog2', pool=None):
+        super().__init__(config, pool=pool)
+        self.method = method
+        history = config.get('history', 500)
+        detect_shadows = config.get('detect_shadows', True)
+        if method == 'knn':
+            self.subtractor = cv2.createBackgroundSubtractorKNN(
+                history=history,
+                dist2Threshold=config.get('dist2_threshold', 400.0),
+                detectShadows=detect_shadows
+            )
+        else:
+            self.subtractor = cv2.createBackgroundSubtractorMOG2(
+                history=history,
+                varThreshold=config.get('var_threshold', 16),
+                detectShadows=detect_shadows
+            )
+        self.learning_rate = config.get('learning_rate', -1)
+        self.kernel = np.ones((3, 3), np.uint8)
+        self.frames_seen = 0
+        # The model needs a few frames before its output means anything
+        self.warmup_frames = config.get('warmup_frames', 10)
+
+    def configure(self, params):
+        super().configure(params)
+        if self.method == 'knn':
+            self.subtractor.setDist2Threshold(self.config.get('dist2_threshold', 400.0))
+        else:
+            self.subtractor.setVarThreshold(self.config.get('var_threshold', 16))
+        self.learning_rate = self.config.get('learning_rate', -1)
+
+    def detect(self, frame):
+        _, gray = self._preprocess(frame, blur=5)
+
+        fg_mask = self.subtractor.apply(gray, fgmask=self._buffer('fg_mask', gray.shape), learningRate=self.learning_rate)
+        self.frames_seen += 1
+        if self.frames_seen <= self.warmup_frames:
+            return False, None, []
+
+        # Shadows are marked 127, keep only definite foreground
+        cv2.threshold(fg_mask, 200, 255, cv2.THRESH_BINARY, dst=fg_mask)
+        opened = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, self.kernel, dst=self._buffer('opened', gray.shape))
+        motion_mask = cv2.dilate(opened, self.kernel, dst=self._mask_buffer(), iterations=2)
+
+        has_motion, motion_rects = self._find_rects(motion_mask, frame.shape)
+        return has_motion, motion_mask, motion_rects
+
+class FrameDiffBackend(MotionBackend):
+    """Absolute difference of consecutive downscaled frames. Cheapest option."""
+    def __init__(self, config, pool=None):
+        super().__init__(config, default_size=(320, 240), pool=pool)
+        self.prev_gray = None
+        self.diff_threshold = config.get('diff_threshold', 25)
+        self.kernel = np.ones((3, 3), np.uint8)
+
+    def configure(self, params):
+        super().configure(params)
+        self.diff_threshold = self.config.get('diff_threshold', 25)
+
+    def detect(self, frame):
+        _, gray = self._preprocess(frame, blur=11)
+
+        if self.prev_gray is None:
+            self.prev_gray = gray
+            return False, None, []
+
+        diff = cv2.absdiff(self.prev_gray, gray, dst=self._buffer('diff', gray.shape))
+        cv2.threshold(diff, self.diff_threshold, 255, cv2.THRESH_BINARY, dst=diff)
+        motion_mask = cv2.dilate(diff, self.kernel, dst=self._mask_buffer(), iterations=2)
+        self.prev_gray = gray
+
+        has_motion, motion_rects = self._find_rects(motion_mask, frame.shape)
+        return has_motion, motion_mask, motion_rects
+
+BACKENDS = {
+    'farneback': FarnebackBackend,
+    'mog2': lambda config, pool=None: BackgroundSubtractorBackend(config, method='mog2', pool=pool),
+    'knn': lambda config, pool=None: BackgroundSubtractorBackend(config, method='knn', pool=pool),
+    'framediff': FrameDiffBackend,
+}
+
+def create_backend(config, pool=None):
+    name = config.get('backend', 'farneback')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown motion backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    return BACKENDS[name](config, pool=pool)
@@ -0,0 +1,85 @@
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from motion.backends import BACKENDS, create_backend
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def synthetic_frames(count, width=1920, height=1080, seed=0):
+    """Noisy static background with a moving blob, roughly like a trap camera scene."""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(40, 120, size=(height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        x = int((i * 40) % (width - 300))
+        cv2.ellipse(frame, (x + 150, height // 2), (140, 60), 0, 0, 360, (60, 140, 200), -1)
+        frames.append(frame)
+    return frames
+
+def video_frames(path, count):
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def benchmark_backend(name, config, frames, warmup=5):
+    backend_config = dict(config, backend=name)
+    backend = create_backend(backend_config)
+    timings = []
+    motion_frames = 0
+    for i, frame in enumerate(frames):
+        start = time.perf_counter()
+        has_motion, _, _ = backend.detect(frame)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            motion_frames += int(has_motion)
+
+    timings = np.array(timings)
+    return {
+        'backend': name,
+        'frames': len(timings),
+        'mean_ms': float(timings.mean()),
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'motion_ratio': motion_frames / max(len(timings), 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame cost of each motion backend")
+    parser.add_argument("--video", type=str, default=None, help="Video to benchmark on (default: synthetic 1080p)")
+    parser.add_argument("--frames", type=int, default=200, help="Number of frames")
+    parser.add_argument("--config", type=str, default="configs/config.yaml", help="Config with the motion section")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), help="Backends to compare")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        motion_config = yaml.safe_load(f).get('motion', {})
+
+    frames = video_frames(args.video, args.frames) if args.video else synthetic_frames(args.frames)
+    logger.info(f"Benchmarking {len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    print(f"{'backend':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'motion':>10}")
+    for name in args.backends:
+        r = benchmark_backend(name, motion_config, frames)
+        print(f"{r['backend']:<12}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['motion_ratio']:>10.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import cv2
+import numpy as np
+
+class MotionCoverage:
+    """
+    Summed-area table of a binary motion mask (0/255).
+    fraction(boxes) gives the share of each box's pixels that are actually
+    moving with four table lookups per box, however many motion regions
+    the frame has. Boxes are in frame coordinates; the mask may be smaller.
+    """
+    def __init__(self, mask, frame_shape, table=None):
+        self.mask_h, self.mask_w = mask.shape[:2]
+        self.scale_x = self.mask_w / frame_shape[1]
+        self.scale_y = self.mask_h / frame_shape[0]
+        # (h+1, w+1) int32 sums of the 0/255 values; 640x480x255 fits easily
+        self.table = cv2.integral(mask, sum=table, sdepth=cv2.CV_32S)
+
+    def total_fraction(self):
+        """Moving share of the whole mask (same as countNonZero / size)."""
+        return float(self.table[-1, -1]) / (255.0 * self.mask_w * self.mask_h)
+
+    def fraction(self, boxes):
+        """boxes: (N, >=4) array of x1, y1, x2, y2 in frame coordinates. Returns (N,) floats in [0, 1]."""
+        boxes = np.asarray(boxes, dtype=np.float32)
+        if boxes.ndim != 2:
+            boxes = boxes.reshape(-1, 4)
+        # Mask cells touched by each box
+        x1 = np.clip(np.floor(boxes[:, 0] * self.scale_x), 0, self.mask_w).astype(np.intp)
+        y1 = np.clip(np.floor(boxes[:, 1] * self.scale_y), 0, self.mask_h).astype(np.intp)
+        x2 = np.clip(np.ceil(boxes[:, 2] * self.scale_x), 0, self.mask_w).astype(np.intp)
+        y2 = np.clip(np.ceil(boxes[:, 3] * self.scale_y), 0, self.mask_h).astype(np.intp)
+
+        t = self.table
+        moving = (t[y2, x2] - t[y1, x2] - t[y2, x1] + t[y1, x1]).astype(np.float64) / 255.0
+        area = (x2 - x1) * (y2 - y1)
+        return np.divide(moving, area, out=np.zeros(len(boxes)), where=area > 0)
@@ -0,0 +1,61 @@
+import sys
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.append(os.getcwd())
+
+from app import batch
+from benchmarks.stub_detector import StubDetector
+
+def _clip(path, frames=20):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+    for i in range(frames):
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        frame[10:30, i:i + 20] = 255  # bright blob the stub detector finds
+        writer.write(frame)
+    writer.release()
+    return path
+
+def _options(tmp_path, **overrides):
+    options = {'output_dir': str(tmp_path / 'out'), 'batch_size': 4, 'stride': 1, 'workers': 1,
+               'format': 'json', 'queue_size': 2, 'stub': True}
+    options.update(overrides)
+    return options
+
+def test_resume_only_reuses_results_of_the_same_stride(tmp_path):
+    clip = _clip(tmp_path / 'clip.mp4')
+    options = _options(tmp_path)
+    done, failed = batch.run([clip], {'detection': {}}, options)
+    assert failed == [] and done[0]['frames_processed'] == 20 and done[0]['detections'] == 20
+    assert batch.is_done(clip, options['output_dir'], 'json', stride=1)
+
+    # Same file, same stride: skipped
+    assert batch.run([clip], {'detection': {}}, options) == ([], [])
+    # A different stride is a different result
+    assert not batch.is_done(clip, options['output_dir'], 'json', stride=5)
+    done, _ = batch.run([clip], {'detection': {}}, _options(tmp_path, stride=5))
+    assert done[0]['frames_processed'] == 4 and done[0]['fingerprint']['stride'] == 5
+    result = batch.read_result(batch.output_path(clip, options['output_dir'], 'json'))
+    assert result['detections']['frame'] == [0, 5, 10, 15]
+
+def test_detector_error_stops_the_reader_thread(tmp_path, monkeypatch):
+    clip = _clip(tmp_path / 'clip.mp4')
+    readers = []
+
+    class RecordingReader(batch.FrameReader):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            readers.append(self)
+
+    class FailingDetector(StubDetector):
+        def predict_batch(self, frames):
+            raise RuntimeError("out of memory")
+
+    monkeypatch.setattr(batch, 'FrameReader', RecordingReader)
+    with pytest.raises(RuntimeError):
+        batch.process_file(clip, FailingDetector(), _options(tmp_path, batch_size=1, queue_size=1))
+    assert not readers[0].thread.is_alive()
+    assert not batch.is_done(clip, str(tmp_path / 'out'), 'json')
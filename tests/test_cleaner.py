@@ -0,0 +1,86 @@
+import sys
+import os
+import sqlite3
+
+import cv2
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from dataset.cleaner import DataCleaner, HashIndex, dhash, hamming, phash
+
+def _image(seed, size=128):
+    rng = np.random.default_rng(seed)
+    return cv2.resize(rng.integers(0, 255, (16, 16, 3), dtype=np.uint8), (size, size), interpolation=cv2.INTER_CUBIC)
+
+def _rows(index_path):
+    conn = sqlite3.connect(str(index_path))
+    try:
+        return {path: (status, dup) for path, status, dup in conn.execute('SELECT path, status, duplicate_of FROM images')}
+    finally:
+        conn.close()
+
+def test_changed_kept_file_is_not_its_own_duplicate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    raw = tmp_path / 'raw' / 'leopard'
+    raw.mkdir(parents=True)
+    cv2.imwrite(str(raw / 'a.jpg'), _image(0))
+    cv2.imwrite(str(raw / 'c.jpg'), _image(1))
+    index = tmp_path / 'index.db'
+
+    def clean(raw_dir):
+        cleaner = DataCleaner(raw_dir, tmp_path / 'processed', min_res=(32, 32), blur_threshold=1.0,
+                              index_path=index, workers=1)
+        return cleaner.process_dataset()
+
+    summary = clean('raw')  # relative raw_dir
+    assert summary['kept'] == 2
+    cv2.imwrite(str(raw / 'b.jpg'), np.clip(_image(0).astype(int) + 3, 0, 255).astype(np.uint8))  # near copy of a
+    summary = clean('raw')
+    assert summary['analyzed'] == 1 and summary['duplicate'] == 1
+    assert _rows(index)['leopard/b.jpg'] == ('duplicate', 'leopard/a.jpg')
+
+    # Touching a kept file re-analyzes it; it must stay kept, not match its old entry
+    stat = os.stat(raw / 'a.jpg')
+    os.utime(raw / 'a.jpg', (stat.st_atime, stat.st_mtime + 10))
+    summary = clean('raw')
+    assert summary['analyzed'] == 1 and summary['kept'] == 1 and summary['duplicate'] == 0
+    assert _rows(index)['leopard/a.jpg'] == ('kept', None)
+    assert summary['indexed_unique'] == 2
+    assert (tmp_path / 'processed' / 'leopard' / 'a.jpg').exists()
+
+    # An absolute raw_dir shares the index written by the relative run
+    summary = clean(tmp_path / 'raw')
+    assert summary['analyzed'] == 0 and summary['skipped'] == 3
+
+    # A kept file replaced by a copy of another image becomes a duplicate and its old copy goes
+    cv2.imwrite(str(raw / 'c.jpg'), _image(0))
+    summary = clean('raw')
+    assert summary['duplicate'] == 1
+    assert _rows(index)['leopard/c.jpg'] == ('duplicate', 'leopard/a.jpg')
+    assert not (tmp_path / 'processed' / 'leopard' / 'c.jpg').exists()
+
+def test_rehashed_image_does_not_match_its_old_hash(tmp_path):
+    def kept(image, mtime):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return {'status': 'kept', 'size': 1, 'mtime': mtime, 'phash': phash(gray), 'dhash': dhash(gray)}
+
+    old_result, new_result = kept(_image(0), 1.0), kept(_image(5), 2.0)
+    assert hamming(old_result['phash'], new_result['phash']) > 6
+
+    index = HashIndex(tmp_path / 'index.db')
+    index.record('leopard/a.jpg', old_result)
+    assert index.find_duplicate(old_result['phash'], old_result['dhash'], 6) == 'leopard/a.jpg'
+
+    # a.jpg now holds different content: an image like its old content is not its duplicate
+    index.forget('leopard/a.jpg')
+    index.record('leopard/a.jpg', new_result)
+    assert index.find_duplicate(old_result['phash'], old_result['dhash'], 6) is None
+    assert index.find_duplicate(new_result['phash'], new_result['dhash'], 6) == 'leopard/a.jpg'
+    index.close()
+
+    # Same after reopening (the tree is rebuilt from the stored hashes)
+    index = HashIndex(tmp_path / 'index.db')
+    assert index.find_duplicate(old_result['phash'], old_result['dhash'], 6) is None
+    assert index.find_duplicate(new_result['phash'], new_result['dhash'], 6) == 'leopard/a.jpg'
+    index.close()
@@ -0,0 +1,91 @@
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from detection.engines import LetterboxCache, postprocess
+from detection.parity import compare
+
+def test_letterbox_round_trip_on_non_square_frames():
+    cache = LetterboxCache()
+    rng = np.random.default_rng(0)
+    for h, w, size in ((720, 1280, 640), (1080, 1920, 416), (480, 270, 320), (300, 500, 640)):
+        frame = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+        batch, (entry,) = cache.prepare([frame], size)
+        ch, cw = entry['canvas']
+        assert batch.shape == (1, 3, ch, cw)
+        assert ch % 32 == 0 and cw % 32 == 0 and max(ch, cw) == size
+
+        # The frame sits centred in the canvas, the border keeps the pad colour
+        rows, cols = entry['window']
+        assert rows.start == (ch - (rows.stop - rows.start)) // 2 and cols.start == (cw - (cols.stop - cols.start)) // 2
+        if rows.start:
+            assert np.allclose(batch[0, :, 0, :], 114 / 255)
+
+        # Source boxes mapped into the model input and back
+        boxes = np.array([[0, 0, w, h], [w * 0.25, h * 0.1, w * 0.5, h * 0.9]], dtype=np.float32)
+        model_boxes = boxes / entry['scale'] + entry['offset']
+        dets = np.column_stack([model_boxes, [0.9, 0.8], [0, 0]]).astype(np.float32)
+        cache.to_source(dets, entry)
+        assert np.allclose(dets[:, :4], boxes, atol=1e-3)
+
+    # Boxes reaching into the padding are clipped to the frame
+    entry = cache.entry((720, 1280), 640)
+    dets = np.array([[-5, 0, 700, 400, 0.9, 0]], dtype=np.float32)
+    cache.to_source(dets, entry)
+    assert dets[0, :4].tolist() == [0, 0, 1280, 720]
+
+def _raw(anchors):
+    """(1, 4 + 2 classes, N) raw output from (cx, cy, w, h, score0, score1) rows."""
+    return np.asarray(anchors, dtype=np.float32).T[None]
+
+def test_postprocess_confidence_class_aware_nms_and_scaling():
+    output = _raw([
+        (100, 100, 50, 40, 0.90, 0.01),   # kept
+        (102, 101, 50, 40, 0.80, 0.01),   # same object, same class: suppressed
+        (100, 100, 50, 40, 0.01, 0.85),   # same box, other class: kept
+        (300, 200, 60, 60, 0.10, 0.05),   # below conf_threshold
+        (400, 300, 40, 80, 0.02, 0.70),   # separate class 1 box
+    ])
+    (dets,) = postprocess(output, conf_threshold=0.25, iou_threshold=0.45)
+    assert np.allclose(dets, [
+        [75, 80, 125, 120, 0.90, 0],
+        [75, 80, 125, 120, 0.85, 1],
+        [380, 260, 420, 340, 0.70, 1],
+    ])
+
+    (dets,) = postprocess(output, conf_threshold=0.25, iou_threshold=0.45, classes=[0])
+    assert dets[:, 5].tolist() == [0]
+    (dets,) = postprocess(output, conf_threshold=0.95)
+    assert dets.shape == (0, 6)
+
+    # Input coordinates -> 1280x720 source (scale 2, 12 px of padding on top)
+    cache = LetterboxCache()
+    entry = cache.entry((720, 1280), 640)
+    (dets,) = postprocess(output)
+    cache.to_source(dets, entry)
+    assert np.allclose(dets[0], [150, 136, 250, 216, 0.90, 0])
+
+def test_compare_matches_same_class_boxes_once():
+    reference = np.array([
+        [0, 0, 100, 100, 0.9, 0],
+        [200, 200, 300, 300, 0.8, 0],
+        [0, 0, 100, 100, 0.7, 1],
+    ], dtype=np.float32)
+    candidate = np.array([
+        [1, 1, 100, 100, 0.88, 0],       # matches the first box
+        [200, 200, 300, 300, 0.75, 1],   # right place, wrong class
+        [0, 0, 100, 100, 0.72, 1],       # matches the class 1 box
+    ], dtype=np.float32)
+    matched, n_ref, n_cand, conf_diff = compare(reference, candidate)
+    assert (matched, n_ref, n_cand) == (2, 3, 3)
+    assert np.isclose(conf_diff, 0.02)
+
+    # One candidate cannot match two references
+    duplicate = np.array([[0, 0, 100, 100, 0.9, 0], [0, 0, 100, 100, 0.85, 0]], dtype=np.float32)
+    assert compare(duplicate, duplicate[:1])[0] == 1
+    # Below the IoU threshold nothing matches
+    assert compare(reference[:1], np.array([[0, 0, 100, 80, 0.9, 0]], dtype=np.float32))[0] == 0
+    assert compare(reference, np.zeros((0, 6), dtype=np.float32)) == (0, 3, 0, 0.0)
@@ -0,0 +1,125 @@
+import sys
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from alerts.events import EventManager
+from alerts.notifier import AlertSystem
+
+FRAME = np.zeros((4, 4, 3), dtype=np.uint8)
+
+def _detection(camera, track_id, conf=0.8):
+    return {'camera': camera, 'track_id': track_id, 'conf': conf, 'bbox': [0, 0, 2, 2]}
+
+def test_cooldown_limits_notifications_per_camera():
+    events = EventManager({'cooldown': 60, 'timeout': 5})
+    first = events.observe(_detection('gate', 1), FRAME, now=1000)
+    assert first['notify']
+    # Same track again: no new event
+    assert events.observe(_detection('gate', 1), FRAME, now=1001) is None
+    # A second animal on the same camera within the cooldown opens a silent event
+    second = events.observe(_detection('gate', 2), FRAME, now=1010)
+    assert second is not None and not second['notify']
+    # Other cameras have their own cooldown
+    assert events.observe(_detection('river', 1), FRAME, now=1010)['notify']
+    # After the cooldown the camera notifies again
+    assert events.observe(_detection('gate', 3), FRAME, now=1061)['notify']
+
+def test_timeout_closes_event_with_best_frame():
+    events = EventManager({'cooldown': 0, 'timeout': 5})
+    best = np.full_like(FRAME, 7)
+    events.observe(_detection('gate', 1, conf=0.5), FRAME, now=1000)
+    events.observe(_detection('gate', 1, conf=0.9), best, now=1002)
+    events.observe(_detection('gate', 1, conf=0.6), FRAME, now=1004)
+
+    assert events.expire(now=1008) == []  # seen 4 s ago
+    closed = events.expire(now=1010)
+    assert len(closed) == 1 and closed[0]['closed']
+    assert closed[0]['detections'] == 3 and closed[0]['best_conf'] == 0.9
+    assert (closed[0]['best_frame'] == 7).all()
+    assert events.open_count() == 0
+
+    # The track coming back later is a new event
+    assert events.observe(_detection('gate', 1), FRAME, now=1020) is not None
+
+def test_max_duration_splits_long_sighting():
+    events = EventManager({'cooldown': 60, 'timeout': 5, 'max_duration': 10})
+    first = events.observe(_detection('gate', 1), FRAME, now=1000)
+    for t in range(1001, 1011):
+        assert events.observe(_detection('gate', 1), FRAME, now=t) is None
+    second = events.observe(_detection('gate', 1), FRAME, now=1011)
+    assert second is not None and second['id'] != first['id']
+    assert not second['notify']  # still within the cooldown
+
+    closed = events.expire(now=1012)
+    assert [e['id'] for e in closed] == [first['id']]
+    assert first['detections'] == 11
+    assert [e['id'] for e in events.expire(now=1012, force=True)] == [second['id']]
+
+def test_full_queue_drops_start_notifications_but_never_end_jobs(tmp_path, monkeypatch):
+    config = {
+        'system': {'output_dir': str(tmp_path)},
+        'alerts': {
+            'events': {'cooldown': 0, 'timeout': 0.2},
+            'queue_size': 2,
+            'drop_policy': 'drop_oldest',
+            'database': {'enabled': False},
+        },
+    }
+    release = threading.Event()
+    notified, recorded = [], []
+    monkeypatch.setattr(AlertSystem, '_notify_start', lambda self, event: (release.wait(5), notified.append(event['id'])))
+    monkeypatch.setattr(AlertSystem, '_record_event', lambda self, event: recorded.append(event['id']))
+
+    alerts = AlertSystem(config)
+    try:
+        # One camera per sighting so every event wants a notification
+        opened = []
+        for i in range(6):
+            alerts.trigger_alert(_detection(f"cam{i}", 1), FRAME)
+            opened.append(alerts.events.events[(f"cam{i}", 1)]['id'])
+        # The alert thread holds at most one job, the queue two: the rest were dropped
+        assert alerts.dropped_alerts >= 3
+        assert alerts.alert_queue.qsize() <= 2
+        release.set()
+    finally:
+        alerts.stop()
+
+    assert len(notified) == 6 - alerts.dropped_alerts
+    assert sorted(recorded) == sorted(opened)
+    assert alerts.events.open_count() == 0
+
+class _Recorder:
+    def __init__(self, clip):
+        self.clip = clip
+        self.ended = []
+
+    def start_clip(self, event_id):
+        return self.clip
+
+    def end_clip(self, event_id):
+        self.ended.append(event_id)
+
+def test_event_without_clip_stores_no_video_path(tmp_path):
+    config = {
+        'system': {'output_dir': str(tmp_path)},
+        'alerts': {'events': {'cooldown': 0}, 'database': {'path': str(tmp_path / 'data.db')}},
+    }
+    alerts = AlertSystem(config)
+    without, with_clip = _Recorder(None), _Recorder(tmp_path / 'clip.mp4')
+    alerts.register_recorder('gate', without)
+    alerts.register_recorder('river', with_clip)
+    try:
+        alerts.trigger_alert(_detection('gate', 1), FRAME)
+        alerts.trigger_alert(_detection('river', 1), FRAME)
+    finally:
+        alerts.stop()
+
+    assert without.ended == [] and len(with_clip.ended) == 1
+    with sqlite3.connect(str(tmp_path / 'data.db')) as conn:
+        rows = dict(conn.execute('SELECT camera, video_path FROM detections'))
+    assert rows == {'gate': '', 'river': str(tmp_path / 'clip.mp4')}
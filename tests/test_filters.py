@@ -0,0 +1,107 @@
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from detection.filters import DetectionFilter, REASONS, VALID, NO_MOTION
+from motion.coverage import MotionCoverage
+
+def _reference_validate(bbox, motion_rects=None):
+    """The per-box rules validate_batch replaced, kept here as the reference."""
+    x1, y1, x2, y2 = bbox
+    w = x2 - x1
+    h = y2 - y1
+    aspect_ratio = w / h
+    if aspect_ratio < 0.5 or aspect_ratio > 4.0:
+        return False, "Invalid aspect ratio"
+    if w < 50 or h < 50:
+        return False, "Too small"
+    if motion_rects:
+        box_area = w * h
+        for mx, my, mw, mh in motion_rects:
+            iw = max(0, min(x2, mx + mw) - max(x1, mx))
+            ih = max(0, min(y2, my + mh) - max(y1, my))
+            if iw * ih > 0.3 * box_area:
+                break
+        else:
+            return False, "No motion correlation"
+    return True, "Valid"
+
+def _random_case(rng, w=1280, h=720):
+    n = int(rng.integers(1, 30))
+    x1, y1 = rng.integers(0, w - 100, n), rng.integers(0, h - 100, n)
+    boxes = np.stack([x1, y1, x1 + rng.integers(10, 500, n), y1 + rng.integers(10, 300, n),
+                      rng.uniform(0.2, 1.0, n), np.zeros(n)], axis=1).astype(np.float32)
+    m = int(rng.integers(0, 6))
+    rects = [tuple(int(v) for v in r) for r in np.column_stack([
+        rng.integers(0, w - 100, m), rng.integers(0, h - 100, m), rng.integers(20, 400, m), rng.integers(20, 300, m)
+    ])]
+    return boxes, rects
+
+def _check(detection_filter, boxes, rects):
+    valid, reasons = detection_filter.validate_batch(boxes, rects)
+    expected = [_reference_validate(tuple(float(v) for v in box[:4]), rects) for box in boxes]
+    assert valid.tolist() == [ok for ok, _ in expected]
+    assert [REASONS[code] for code in reasons] == [reason for _, reason in expected]
+    # The single-box wrapper gives the same answer
+    for box, (ok, reason) in zip(boxes, expected):
+        assert detection_filter.validate_detection(box[:4], box[4], motion_rects=rects) == (ok, reason)
+
+def test_validate_batch_matches_per_box_rules():
+    detection_filter = DetectionFilter({'detection': {'motion_check': 'rects'}})
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        _check(detection_filter, *_random_case(rng))
+
+def test_validate_batch_boundaries_and_no_motion():
+    detection_filter = DetectionFilter({'detection': {'motion_check': 'rects'}})
+    boxes = np.array([
+        [0, 0, 100, 200, 0.9, 0],    # aspect exactly 0.5 (kept)
+        [0, 0, 400, 100, 0.9, 0],    # aspect exactly 4.0 (kept)
+        [0, 0, 401, 100, 0.9, 0],    # aspect just above 4
+        [0, 0, 50, 50, 0.9, 0],      # exactly the minimum size (kept)
+        [0, 0, 49, 60, 0.9, 0],      # too narrow
+        [0, 0, 100, 100, 0.9, 0],    # overlap exactly 30%, must be more
+        [0, 0, 100, 100, 0.9, 0],
+    ], dtype=np.float32)
+    _check(detection_filter, boxes, None)   # no motion information: motion check skipped
+    _check(detection_filter, boxes, [])
+    _check(detection_filter, boxes, [(0, 0, 30, 100)])     # 30% overlap: rejected
+    _check(detection_filter, boxes, [(0, 0, 31, 100)])     # 31%: accepted
+    _check(detection_filter, boxes, [(900, 900, 10, 10)])  # motion elsewhere: all rejected for motion
+
+def test_validate_batch_empty():
+    detection_filter = DetectionFilter({})
+    for boxes in (np.zeros((0, 6), dtype=np.float32), [], np.zeros((0, 4))):
+        valid, reasons = detection_filter.validate_batch(boxes, [(0, 0, 10, 10)])
+        assert valid.shape == (0,) and reasons.shape == (0,)
+        assert reasons.dtype == np.uint8
+    valid, reasons = detection_filter.validate_batch(np.zeros((0, 6)), None)
+    assert len(valid) == 0 and (reasons == VALID).all()
+
+def test_mask_motion_check():
+    # Moving pixels in the left half of a 640x480 frame, mask at half resolution
+    mask = np.zeros((240, 320), dtype=np.uint8)
+    mask[:, :160] = 255
+    coverage = MotionCoverage(mask, (480, 640))
+    boxes = np.array([
+        [0, 0, 200, 200, 0.9, 0],      # fully moving
+        [280, 0, 480, 200, 0.9, 0],    # 40 of 200 px wide moving: 20%
+        [300, 0, 500, 200, 0.9, 0],    # 20 px: 10%, exactly the minimum (kept)
+        [310, 0, 510, 200, 0.9, 0],    # 5%
+        [400, 0, 600, 200, 0.9, 0],    # static
+    ], dtype=np.float32)
+    rects = [(0, 0, 320, 480)]
+
+    detection_filter = DetectionFilter({'detection': {'motion_check': 'mask', 'min_motion_coverage': 0.1}})
+    valid, reasons = detection_filter.validate_batch(boxes, rects, coverage=coverage)
+    assert valid.tolist() == [True, True, True, False, False]
+    assert reasons[3] == reasons[4] == NO_MOTION
+
+    # The default stays the rect overlap check, which ignores the mask
+    default_filter = DetectionFilter({})
+    assert default_filter.motion_check == 'rects'
+    valid, _ = default_filter.validate_batch(boxes, rects, coverage=coverage)
+    assert valid.tolist() == [True, False, False, False, False]
@@ -9,8 +9,12 @@ def test_imports():
         print("CameraStream imported")
         from app.streaming import StreamServer
         print("StreamServer imported")
+        from app.async_streaming import AsyncStreamServer
+        print("AsyncStreamServer imported")
         from motion.optical_flow import MotionDetector
         print("MotionDetector imported")
+        from motion.coverage import MotionCoverage
+        print("MotionCoverage imported")
         from detection.model import LeopardDetector
         print("LeopardDetector imported")
         from detection.filters import DetectionFilter
@@ -19,8 +23,44 @@ def test_imports():
         print("ObjectTracker imported")
         from alerts.notifier import AlertSystem
         print("AlertSystem imported")
+        from alerts.events import EventManager
+        print("EventManager imported")
+        from alerts.storage import DetectionStore
+        print("DetectionStore imported")
         from app.pipeline import Pipeline
         print("Pipeline imported")
+        from detection.engines import create_engine
+        print("Inference engines imported")
+        from detection.roi import plan_crops
+        print("ROI helpers imported")
+        from detection.resolution import ResolutionController
+        print("ResolutionController imported")
+        from detection.batching import BatchInferenceWorker
+        print("BatchInferenceWorker imported")
+        from app.multi_camera import MultiCameraPipeline
+        print("MultiCameraPipeline imported")
+        from app.metrics import REGISTRY
+        print("Metrics registry imported")
+        from app.frame_pool import FramePool
+        print("FramePool imported")
+        from app.recorder import VideoRecorder
+        print("VideoRecorder imported")
+        from app.batch import FrameReader
+        print("Batch processing imported")
+        from training.sweep import pareto_front
+        print("Evaluation sweep imported")
+        from app.stages import StagedExecutor
+        print("StagedExecutor imported")
+        from app.scheduler import DetectionScheduler
+        print("DetectionScheduler imported")
+        from app.profiles import SceneProfiler
+        print("SceneProfiler imported")
+        from app.zones import Zones
+        print("Zones imported")
+        from tracking.propagation import FlowPropagator
+        print("FlowPropagator imported")
+        from benchmarks.stub_detector import StubDetector
+        print("StubDetector imported")
         print("All imports successful!")
     except Exception as e:
         print(f"Import failed: {e}")
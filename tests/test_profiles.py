@@ -0,0 +1,128 @@
+import sys
+import os
+import copy
+
+import cv2
+import numpy as np
+import yaml
+
+sys.path.append(os.getcwd())
+
+from app.profiles import SceneProfiler, DEFAULT_PROFILES
+
+def _frame(b, g, r):
+    return np.full((64, 64, 3), (b, g, r), dtype=np.uint8)
+
+DAY = _frame(100, 150, 200)    # luminance ~159, colourful
+DUSK = _frame(40, 70, 100)     # luminance ~76
+NIGHT = _frame(10, 20, 30)     # luminance ~21
+IR = _frame(130, 130, 130)     # bright but grey: camera in IR mode
+
+def _profiler(**config):
+    return SceneProfiler({'enabled': True, 'interval': 1, 'confirm': 1, 'min_dwell': 0, **config})
+
+def test_lighting_and_activity_classification():
+    for frame, motion, expected in ((DAY, 1.0, 'day'), (DAY, 0.0, 'idle'), (DUSK, 0.0, 'dusk'),
+                                    (NIGHT, 0.0, 'night'), (IR, 0.0, 'night')):
+        profiler = _profiler()
+        assert profiler.observe_frame(frame, motion) == DEFAULT_PROFILES[expected]
+        assert profiler.profile == expected
+
+    # A recent detection keeps a still daylight scene active
+    profiler = _profiler()
+    profiler.observe_detections(1)
+    profiler.observe_frame(DAY, 0.0)
+    assert profiler.profile == 'day'
+
+    assert SceneProfiler({}).observe_frame(NIGHT, 0.0) is None  # disabled
+
+def test_hysteresis_confirmation_and_dwell():
+    profiler = _profiler(confirm=3, min_dwell=60)
+    profiler.measure(DUSK)
+    profiler._evaluate(0.0)
+    assert profiler.profile == 'dusk'
+
+    # Just above the dusk threshold (90) but inside the margin: still dusk
+    profiler.luminance = 95
+    assert profiler._classify_lighting() == 'dusk'
+    profiler.luminance = 99
+    assert profiler._classify_lighting() == 'day'
+
+    # Day needs `confirm` agreeing evaluations and `min_dwell` seconds in dusk
+    profiler.motion_ema = 1.0
+    assert profiler._evaluate(100.0) is None
+    assert profiler._evaluate(101.0) is None
+    assert profiler._evaluate(102.0) == DEFAULT_PROFILES['day']
+    profiler.luminance = 75
+    for now in (110.0, 111.0, 112.0, 113.0):
+        assert profiler._evaluate(now) is None  # agreeing, but within min_dwell of the last switch
+    assert profiler._evaluate(163.0) == DEFAULT_PROFILES['dusk']
+
+    # A disagreeing evaluation resets the votes
+    profiler.luminance = 150
+    profiler._evaluate(300.0)
+    profiler._evaluate(301.0)
+    profiler.luminance = 75
+    profiler._evaluate(302.0)
+    profiler.luminance = 150
+    assert profiler._evaluate(303.0) is None
+    assert profiler.switches == 2
+
+def test_leaving_idle_is_immediate():
+    profiler = _profiler(confirm=3, min_dwell=600)
+    profiler.observe_frame(DAY, 0.0)
+    assert profiler.profile == 'idle'
+    profiler.luminance = 20
+    assert profiler._evaluate(1.0) == DEFAULT_PROFILES['night']
+
+class _StreamServer:
+    def start(self):
+        pass
+
+    def update_frame(self, frame, camera=None):
+        pass
+
+def test_apply_profile_restores_base_settings(tmp_path):
+    from app.pipeline import Pipeline
+    from alerts.notifier import AlertSystem
+    from benchmarks.stub_detector import StubDetector
+
+    clip = tmp_path / 'clip.mp4'
+    writer = cv2.VideoWriter(str(clip), cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+    writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+
+    with open('configs/config.yaml') as f:
+        config = yaml.safe_load(f)
+    config['camera']['source'] = str(clip)
+    config['camera'].pop('zones', None)
+    config['motion']['backend'] = 'mog2'
+    config['alerts']['database']['enabled'] = False
+    base = copy.deepcopy(config)
+
+    alerts = AlertSystem(config)
+    pipeline = Pipeline(config=config, detector=StubDetector(), alert_system=alerts, stream_server=_StreamServer())
+    try:
+        backend = pipeline.motion_detector.backend
+        base_area = backend.min_area
+
+        pipeline._apply_profile(DEFAULT_PROFILES['night'])
+        assert backend.min_area < base_area
+        assert backend.subtractor.getVarThreshold() == 12
+        assert pipeline.scheduler.detect_interval == 1
+        assert pipeline.stream_interval == 0.1
+
+        pipeline._apply_profile(DEFAULT_PROFILES['day'])
+        assert backend.min_area == base_area
+        assert backend.subtractor.getVarThreshold() == base['motion']['var_threshold']
+        assert backend.config.get('diff_threshold') is None
+        assert pipeline.scheduler.detect_interval == DEFAULT_PROFILES['day']['scheduler']['detect_interval']
+
+        pipeline._apply_profile({})
+        assert pipeline.scheduler.detect_interval == base['scheduler']['detect_interval']
+        assert pipeline.scheduler.idle_interval == base['scheduler']['idle_interval']
+        assert pipeline.stream_interval == 0.0
+        assert config == base  # the base config is never modified
+    finally:
+        pipeline.stop()
+        alerts.stop()
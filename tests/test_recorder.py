@@ -0,0 +1,39 @@
+import sys
+import os
+import time
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from app.recorder import VideoRecorder
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_clip_needs_frames_and_commands_skip_full_frame_queue(tmp_path):
+    recorder = VideoRecorder({'fps': 10, 'queue_size': 1, 'pre_event_seconds': 1, 'post_event_seconds': 0},
+                             output_dir=tmp_path)
+    try:
+        # Nothing recorded yet: no clip, so nothing can point at a missing file
+        assert recorder.start_clip('early') is None
+
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        recorder.write(frame, 0.0)
+        assert _wait_for(lambda: recorder.frame_size is not None)
+
+        # Fill the frame queue: clip commands must neither block nor be dropped
+        for i in range(1, 30):
+            recorder.write(frame, i / 10)
+        started = time.perf_counter()
+        path = recorder.start_clip('event')
+        recorder.end_clip('event')
+        assert time.perf_counter() - started < 0.1
+        assert path is not None and path.parent == tmp_path / 'clips'
+    finally:
+        recorder.stop()
+    assert path.exists() and path.stat().st_size > 0
+    assert not recorder.clips
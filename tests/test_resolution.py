@@ -0,0 +1,87 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+
+from detection import resolution
+from detection.resolution import ResolutionController
+
+def _controller(monkeypatch, img_size=640, load=0.1, **adaptive):
+    monkeypatch.setattr(resolution, 'load_per_core', lambda: load)
+    settings = {'enabled': True, 'sizes': [320, 416, 512, 640], 'target_fps': 10,
+                'patience': 3, 'ema_alpha': 1.0, 'headroom': 0.6, 'max_load': 0.85}
+    settings.update(adaptive)
+    return ResolutionController({'img_size': img_size, 'adaptive_size': settings})
+
+def test_steps_down_after_patience_slow_frames(monkeypatch):
+    controller = _controller(monkeypatch)
+    assert controller.size == 640 and controller.budget == 0.1
+    for _ in range(2):
+        controller.observe(0.2)
+    assert controller.size == 640
+    # A frame within budget resets the count
+    controller.observe(0.09)
+    controller.observe(0.2)
+    controller.observe(0.2)
+    assert controller.size == 640
+    controller.observe(0.2)
+    assert controller.size == 512 and controller.changes == 1
+
+    # Batches are judged per frame: 4 frames in 0.3 s fit the budget
+    for _ in range(5):
+        controller.observe(0.3, frames=4)
+    assert controller.size == 512
+
+def test_steps_up_only_with_headroom_and_three_times_the_patience(monkeypatch):
+    controller = _controller(monkeypatch, img_size=320)
+    assert controller.size == 320
+    # 10 ms at 320 predicts ~17 ms at 416, well under 60% of the budget
+    for _ in range(8):
+        controller.observe(0.01)
+    assert controller.size == 320
+    controller.observe(0.01)
+    assert controller.size == 416
+
+    # Growing again is predicted from 416 (~28 ms at 512), and 640 would miss the headroom later
+    for _ in range(9):
+        controller.observe(0.02)
+    assert controller.size == 512
+    for _ in range(20):
+        controller.observe(0.045)  # ~70 ms predicted at 640 > 60 ms headroom
+    assert controller.size == 512
+
+def test_measured_latency_blocks_regrowth(monkeypatch):
+    controller = _controller(monkeypatch)
+    for _ in range(3):
+        controller.observe(0.2)
+    assert controller.size == 512
+    # Fast at 512, but 640 was measured too slow: no flapping back up
+    for _ in range(30):
+        controller.observe(0.01)
+    assert controller.size == 512
+
+def test_load_forces_step_down_and_blocks_growth(monkeypatch):
+    controller = _controller(monkeypatch, load=0.95)
+    for _ in range(3):
+        controller.observe(0.01)
+    assert controller.size == 512
+    controller = _controller(monkeypatch, img_size=320, load=0.95)
+    for _ in range(30):
+        controller.observe(0.001)
+    assert controller.size == 320  # already the smallest; no growth while loaded
+
+def test_profile_cap_and_fixed_size(monkeypatch):
+    controller = _controller(monkeypatch)
+    controller.limit(416)
+    assert controller.size == 416
+    for _ in range(10):
+        controller.observe(0.2)  # measured at the cap, not the adaptive choice
+    assert controller.sizes[controller.index] == 640 and controller.changes == 0
+    controller.limit(None)
+    assert controller.size == 640
+
+    fixed = ResolutionController({'img_size': 600})
+    assert fixed.sizes == [576] and fixed.size == 576
+    for _ in range(10):
+        fixed.observe(1.0)
+    assert fixed.size == 576 and fixed.changes == 0
@@ -0,0 +1,59 @@
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from benchmarks.stub_detector import StubDetector
+from detection import roi
+
+def _frame(blobs, shape=(720, 1280)):
+    """Dark frame with bright red (x1, y1, x2, y2) blobs the stub detector finds."""
+    frame = np.full(shape + (3,), 40, dtype=np.uint8)
+    for x1, y1, x2, y2 in blobs:
+        frame[y1:y2, x1:x2, 2] = 255
+    return frame
+
+def test_crop_boxes_map_back_to_frame_coordinates():
+    frame = _frame([(600, 300, 680, 360), (100, 500, 140, 560)])
+    detector = StubDetector(stride=1)
+    regions = [(500, 200, 800, 450), (50, 450, 250, 650)]
+
+    dets = roi.predict_regions(detector, frame, regions)
+    assert detector.calls == 2  # one detector call per crop, boxes in crop coordinates
+    boxes = sorted(d[:4].tolist() for d in dets)
+    assert boxes == [[100, 500, 140, 560], [600, 300, 680, 360]]
+
+def test_object_seen_by_two_crops_is_reported_once():
+    frame = _frame([(600, 300, 680, 360)])
+    regions = [(500, 200, 700, 400), (580, 280, 900, 500)]
+
+    dets = roi.predict_regions(StubDetector(stride=1), frame, regions)
+    assert dets.shape == (1, 6)
+    assert dets[0, :4].tolist() == [600, 300, 680, 360]
+
+def test_crop_with_nothing_in_it_returns_empty():
+    frame = _frame([])
+    dets = roi.predict_regions(StubDetector(stride=1), frame, [(0, 0, 300, 300)])
+    assert dets.shape == (0, 6)
+
+def test_plan_crops_pads_merges_and_falls_back_to_full_frame():
+    shape = (720, 1280, 3)
+    config = {'roi_padding': 32, 'roi_min_size': 256, 'roi_max_crops': 4, 'roi_max_area': 0.6}
+
+    # A small rect is padded, grown to min_size and clipped to the frame
+    assert roi.plan_crops(shape, [(10, 10, 20, 20)], config) == [(0, 0, 148, 148)]
+
+    # Overlapping padded rects become one region
+    regions = roi.plan_crops(shape, [(600, 300, 40, 40), (700, 320, 40, 40)], config)
+    assert regions == [(492, 192, 848, 468)]
+
+    # No motion or motion over most of the frame: full-frame inference
+    assert roi.plan_crops(shape, [], config) is None
+    assert roi.plan_crops(shape, [(0, 0, 1200, 700)], config) is None
+
+    # Too many scattered crops collapse into one around all of the motion
+    rects = [(x, 50, 10, 10) for x in (0, 300, 600, 900, 1200)]
+    regions = roi.plan_crops(shape, rects, {**config, 'roi_min_size': 0, 'roi_max_area': 1.0})
+    assert regions == [(0, 18, 1242, 92)]
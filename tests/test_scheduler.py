@@ -0,0 +1,81 @@
+import sys
+import os
+
+import cv2
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from app.scheduler import DetectionScheduler
+from tracking.propagation import FlowPropagator
+
+def _detected(scheduler, frames, has_motion=False, motion_fraction=0.0):
+    return [i for i in frames if scheduler.should_detect(i, has_motion, motion_fraction)]
+
+def _track(status='confirmed', time_since_update=0, last_conf=0.9):
+    return {'status': status, 'time_since_update': time_since_update, 'last_conf': last_conf}
+
+def test_interval_per_mode():
+    scheduler = DetectionScheduler({'detect_interval': 3, 'idle_interval': 30})
+    # Quiet scene: the idle cadence, starting with the first frame
+    assert _detected(scheduler, range(0, 61)) == [0, 30, 60]
+    assert scheduler.mode == 'idle'
+    # Steady motion (not rising): every detect_interval frames
+    assert _detected(scheduler, range(61, 70), has_motion=True, motion_fraction=0.001) == [63, 66, 69]
+    assert scheduler.mode == 'tracking'
+    # A confirmed, confident track keeps the tracking cadence without motion
+    scheduler.observe_tracks({1: _track()})
+    assert _detected(scheduler, range(70, 76)) == [72, 75]
+    assert scheduler.skip_rate() == 1 - 8 / 76
+
+def test_forced_detection():
+    scheduler = DetectionScheduler({'detect_interval': 3, 'idle_interval': 30, 'motion_rise': 2.0})
+    assert _detected(scheduler, range(0, 5)) == [0]
+
+    # Motion jumping above motion_rise x its average: every frame
+    assert _detected(scheduler, range(5, 8), has_motion=True, motion_fraction=0.05) == [5, 6, 7]
+    assert scheduler.mode == 'burst'
+    # Once the average catches up it is no longer a rise
+    for i in range(8, 100):
+        scheduler.should_detect(i, True, 0.05)
+    assert scheduler.mode == 'tracking'
+
+    # Uncertain tracks force every frame too
+    for tracks in ({1: _track(status='tentative')},                 # needs consecutive hits
+                   {1: _track(time_since_update=1)},               # confirmed but missed
+                   {1: _track(last_conf=0.2)}):                    # low confidence
+        scheduler.observe_tracks(tracks)
+        assert scheduler._select_mode(False, 0.0) == 'burst'
+    scheduler.observe_tracks({})
+    assert scheduler._select_mode(False, 0.0) == 'idle'
+
+def test_configure_changes_cadence():
+    scheduler = DetectionScheduler({})
+    assert (scheduler.detect_interval, scheduler.idle_interval) == (1, 30)
+    scheduler.configure({'detect_interval': 4, 'idle_interval': 0})
+    assert (scheduler.detect_interval, scheduler.idle_interval) == (4, 1)
+
+def _texture(h, w, seed=0):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (h // 8, w // 8, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(cv2.resize(small, (w, h), interpolation=cv2.INTER_CUBIC), (5, 5), 0)
+
+def _shift(frame, dx, dy):
+    matrix = np.float32([[1, 0, dx], [0, 1, dy]])
+    return cv2.warpAffine(frame, matrix, (frame.shape[1], frame.shape[0]), borderMode=cv2.BORDER_REFLECT)
+
+def test_flow_propagator_follows_translation():
+    frame = _texture(720, 1280)  # propagated at 640 wide, boxes stay in frame pixels
+    propagator = FlowPropagator({'lk_width': 640, 'lk_grid': 4})
+    boxes = {1: (400, 200, 700, 420), 2: (800, 400, 1000, 560)}
+    assert propagator.propagate(frame, boxes) == {}  # no previous frame yet
+
+    moved = propagator.propagate(_shift(frame, 12, -8), boxes)
+    assert set(moved) == {1, 2}
+    for track_id, (x1, y1, x2, y2) in boxes.items():
+        assert np.allclose(moved[track_id], (x1 + 12, y1 - 8, x2 + 12, y2 - 8), atol=1.5)
+
+    # After reset() the boxes refer to the given frame again
+    propagator.reset(frame)
+    assert np.allclose(propagator.propagate(frame, boxes)[1], boxes[1], atol=0.5)
+    assert propagator.propagate(frame, {}) == {}
@@ -0,0 +1,86 @@
+import sys
+import os
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from dataset.scraper import DataScraper
+
+def _jpeg(seed):
+    image = np.random.default_rng(seed).integers(0, 255, (48, 64, 3), dtype=np.uint8)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+IMAGE_A = _jpeg(0)
+IMAGE_B = _jpeg(1)
+IMAGE_C = _jpeg(2)
+
+class ImageHost(BaseHTTPRequestHandler):
+    """Local stand-in for an image host: duplicates, junk, oversized and flaky URLs."""
+    hits = Counter()
+    flaky_failures = 1
+
+    def do_GET(self):
+        self.hits[self.path] += 1
+        if self.path in ('/a.jpg', '/mirror/a.jpg'):
+            self._send(200, IMAGE_A, 'image/jpeg')
+        elif self.path == '/b.jpg':
+            self._send(200, IMAGE_B, 'image/jpeg')
+        elif self.path == '/page.html':
+            self._send(200, b'<html></html>', 'text/html')
+        elif self.path == '/fake.jpg':
+            self._send(200, b'not really a jpeg' * 10, 'image/jpeg')
+        elif self.path == '/huge.jpg':
+            self._send(200, IMAGE_A + b'\0' * 200_000, 'image/jpeg')
+        elif self.path == '/flaky.jpg':
+            if self.hits[self.path] <= self.flaky_failures:
+                self._send(503, b'busy', 'text/plain')
+            else:
+                self._send(200, IMAGE_C, 'image/jpeg')
+        else:
+            self._send(404, b'missing', 'text/plain')
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_scraper_dedup_validation_and_resume(tmp_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHost)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [base + p for p in ('/a.jpg', '/mirror/a.jpg', '/b.jpg', '/page.html', '/fake.jpg',
+                               '/huge.jpg', '/flaky.jpg', '/missing.jpg')]
+    try:
+        scraper = DataScraper(tmp_path / 'raw', max_workers=4, per_host=2, max_bytes=100_000, backoff=0.01)
+        outcomes = scraper.download_batch(urls, 'leopard')
+        assert outcomes['ok'] == 3          # a, b and flaky after one retry
+        assert outcomes['duplicate'] == 1   # a served from a second URL
+        assert outcomes['invalid'] == 2     # html page and junk bytes
+        assert outcomes['too_large'] == 1
+        assert outcomes['http_error'] == 1
+        assert ImageHost.hits['/flaky.jpg'] == 2
+
+        stored = sorted(p.suffix for p in (tmp_path / 'raw' / 'leopard').iterdir())
+        assert stored == ['.jpg', '.jpg', '.jpg']
+        scraper.close()
+
+        # A new run with the same manifest fetches nothing again
+        before = sum(ImageHost.hits.values())
+        scraper = DataScraper(tmp_path / 'raw', max_workers=4)
+        outcomes = scraper.download_batch(urls, 'leopard')
+        assert outcomes == Counter(skipped=len(urls))
+        assert sum(ImageHost.hits.values()) == before
+        scraper.close()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,81 @@
+import sys
+import os
+import threading
+import time
+
+sys.path.append(os.getcwd())
+
+from app.frame_pool import FramePool
+from app.stages import StageQueue, StagedExecutor
+
+def test_drop_oldest_keeps_newest_and_counts():
+    q = StageQueue(2, drop_oldest=True)
+    for i in range(5):
+        q.put(i)
+    assert q.dropped == 3
+    assert [q.get(timeout=1), q.get(timeout=1)] == [3, 4]
+    assert q.blocked_time == 0.0
+
+def test_blocking_queue_records_backpressure():
+    q = StageQueue(1)
+    q.put(0)
+    threading.Timer(0.1, q.get).start()
+    q.put(1)  # waits for the timer to make room
+    assert q.dropped == 0 and q.blocked_time >= 0.05
+    assert q.get(timeout=1) == 1
+
+def test_dropped_item_releases_its_pool_buffer():
+    pool = FramePool(4)
+    q = StageQueue(1, drop_oldest=True)
+    frame = pool.acquire((48, 64, 3))
+    q.put({'frame': frame, 'index': 0})
+    del frame
+    # Still referenced from the queue: a second buffer is handed out
+    other = pool.acquire((48, 64, 3))
+    assert pool.stats()['buffers'] == 2
+    q.put({'frame': other, 'index': 1})  # drops index 0
+    del other
+    assert q.dropped == 1
+    pool.acquire((48, 64, 3))
+    stats = pool.stats()
+    assert stats['buffers'] == 2 and stats['hits'] == 1 and stats['misses'] == 0
+
+def test_close_drains_items_in_flight_in_order():
+    out = []
+
+    def slow(item):
+        time.sleep(0.005)
+        return item
+
+    def fail_on_seven(item):
+        if item == 7:
+            raise ValueError("bad frame")
+        return item
+
+    executor = StagedExecutor([('a', slow), ('b', fail_on_seven), ('c', out.append)], queue_size=2).start()
+    for i in range(20):
+        executor.feed(i)
+    executor.close(timeout=5)
+    assert out == [i for i in range(20) if i != 7]
+    assert not any(stage.thread.is_alive() for stage in executor.stages)
+    stats = executor.stats()
+    assert stats['b']['errors'] == 1 and stats['c']['processed'] == 19
+    assert all(s['dropped'] == 0 for s in stats.values())
+
+def test_close_with_drop_stale_accounts_for_every_item():
+    out = []
+    release = threading.Event()
+
+    def blocked(item):
+        release.wait(5)
+        return item
+
+    executor = StagedExecutor([('a', blocked), ('b', out.append)], queue_size=2, drop_stale=True).start()
+    for i in range(50):
+        executor.feed(i)
+    release.set()
+    executor.close(timeout=5)
+    dropped = sum(q.dropped for q in executor.queues)
+    assert len(out) + dropped == 50
+    assert out == sorted(out) and out[-1] == 49  # the newest frame always gets through
+    assert not any(stage.thread.is_alive() for stage in executor.stages)
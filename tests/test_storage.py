@@ -0,0 +1,58 @@
+import sys
+import os
+import subprocess
+from datetime import datetime
+
+sys.path.append(os.getcwd())
+
+from alerts.storage import DetectionStore, query_detections
+
+def test_query_accepts_t_and_space_separated_bounds(tmp_path):
+    store = DetectionStore(tmp_path / 'data.db')
+    store.add(datetime(2026, 10, 17, 1, 36, 39), 0.9, camera='north')
+    store.add(datetime(2026, 10, 17, 1, 40, 0), 0.7, camera='north')
+    assert store.flush()
+
+    for sep in ('T', ' '):
+        start = f"2026-10-17{sep}01:36:39"
+        rows = store.query(start=start)
+        assert len(rows) == 2, sep
+        rows = store.query(start=start, end=f"2026-10-17{sep}01:37:00")
+        assert [row['confidence'] for row in rows] == [0.9], sep
+        assert store.query(start=f"2026-10-17{sep}01:40:01") == []
+    # Epoch seconds and datetimes land on the same stored form
+    assert len(store.query(start=datetime(2026, 10, 17, 1, 36, 39).timestamp())) == 2
+    assert len(store.query(end=datetime(2026, 10, 17, 1, 36, 39))) == 1
+    store.close()
+
+def test_cli_reads_without_writing(tmp_path):
+    path = tmp_path / 'data.db'
+    store = DetectionStore(path)
+    store.add(datetime(2026, 10, 17, 1, 36, 39), 0.9, image_path='a.jpg', camera='north')
+    store.close()
+    assert len(query_detections(path, start='2026-10-17T01:00:00')) == 1
+
+    def cli(db):
+        return subprocess.run(
+            [sys.executable, '-m', 'alerts.storage', '--db', str(db), '--since', '2026-10-17T01:00:00'],
+            capture_output=True, text=True, cwd=os.getcwd()
+        )
+
+    result = cli(path)
+    assert result.returncode == 0, result.stderr
+    assert 'a.jpg' in result.stdout
+
+    # Querying a missing database must not create one
+    missing = tmp_path / 'missing.db'
+    assert cli(missing).returncode != 0
+    assert not missing.exists()
+
+def test_rollup_commits_pending_rows_once(tmp_path):
+    store = DetectionStore(tmp_path / 'data.db', batch_size=100, flush_interval=60)
+    store.add(datetime(2026, 10, 17, 1, 36, 39), 0.9, camera='north')
+    store.add(datetime(2026, 10, 17, 1, 40, 0), 0.7, camera='north')
+    store.rollup(older_than_days=10000)  # nothing is that old: both rows stay
+    assert store.flush()
+    assert len(store.query()) == 2
+    assert store.rows_written == 2
+    store.close()
@@ -0,0 +1,78 @@
+import sys
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+sys.path.append(os.getcwd())
+
+from app import streaming
+from app.async_streaming import AsyncStreamServer
+
+@pytest.fixture
+def cameras(monkeypatch):
+    """Fresh broadcaster table with one camera ('gate') that has published a frame."""
+    monkeypatch.setattr(streaming, 'broadcasters', {})
+    monkeypatch.setattr(streaming, 'default_camera', None)
+    streaming.set_output_frame(np.zeros((48, 64, 3), dtype=np.uint8), 'gate')
+
+def test_unknown_camera_is_404_and_not_created(cameras):
+    client = streaming.app.test_client()
+    assert client.get('/video/nope').status_code == 404
+    assert client.get('/snapshot/nope.jpg').status_code == 404
+    assert streaming.get_broadcaster('nope') is None
+    assert set(streaming.broadcasters) == {'gate'}
+
+    response = client.get('/snapshot/gate.jpg')
+    assert response.status_code == 200 and response.data[:2] == b'\xff\xd8'
+    assert client.get('/snapshot.jpg').status_code == 200  # default feed follows gate
+
+def test_async_server_rejects_unknown_camera(cameras):
+    server = AsyncStreamServer('127.0.0.1', 0)
+    server.start()
+    try:
+        deadline = time.time() + 5
+        while server.server is None and time.time() < deadline:
+            time.sleep(0.01)
+        base = f"http://127.0.0.1:{server.server.sockets[0].getsockname()[1]}"
+        for path in ('/video/nope', '/snapshot/nope.jpg'):
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(base + path, timeout=5)
+            assert error.value.code == 404
+        with urllib.request.urlopen(base + '/snapshot/gate.jpg', timeout=5) as response:
+            assert response.status == 200
+        assert set(streaming.broadcasters) == {'gate'}
+    finally:
+        server.stop()
+
+def test_concurrent_clients_share_one_encode(monkeypatch):
+    encode = streaming.cv2.imencode
+
+    def slow_encode(*args):
+        time.sleep(0.05)  # long enough for every client to ask while it runs
+        return encode(*args)
+
+    monkeypatch.setattr(streaming.cv2, 'imencode', slow_encode)
+    broadcaster = streaming.FrameBroadcaster(80)
+    clients = 10
+    for frame_number in range(1, 4):
+        broadcaster.publish(np.full((48, 64, 3), frame_number, dtype=np.uint8))
+        barrier = threading.Barrier(clients)
+        results = []
+
+        def client():
+            barrier.wait()
+            results.append(broadcaster.jpeg())
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert broadcaster.encodes == frame_number
+        assert len({data for _, data in results}) == 1 and results[0][1] is not None
+        assert {seq for seq, _ in results} == {broadcaster.seq}
@@ -0,0 +1,63 @@
+import sys
+import os
+
+import numpy as np
+import pytest
+
+sys.path.append(os.getcwd())
+
+from training.sweep import IOU_THRESHOLDS, accuracy, average_precision, match
+
+GT = np.array([
+    [0, 0, 0, 100, 100],        # class, x1, y1, x2, y2
+    [0, 200, 200, 300, 300],
+], dtype=np.float32)
+
+PRED = np.array([
+    [0, 0, 100, 100, 0.9, 0],       # exact hit on the first box
+    [0, 0, 100, 100, 0.8, 0],       # duplicate of it: that box is already taken
+    [200, 200, 300, 276, 0.7, 0],   # IoU 0.76 with the second box
+    [200, 200, 300, 300, 0.6, 1],   # right place, class without ground truth
+], dtype=np.float32)
+
+def test_match_uses_each_ground_truth_once_and_masks_classes():
+    tp = match(PRED, GT)
+    assert tp.shape == (4, len(IOU_THRESHOLDS))
+    assert tp[0].all()
+    assert not tp[1].any()
+    assert tp[2].tolist() == [t <= 0.76 for t in IOU_THRESHOLDS]
+    assert not tp[3].any()
+    assert not match(PRED[:0], GT).any() and not match(PRED, GT[:0]).any()
+
+def test_average_precision_known_values():
+    # TP, FP, TP over two boxes: precision 1 up to recall 0.5, then 2/3 up to 1
+    tp = np.repeat([[True], [False], [True]], len(IOU_THRESHOLDS), axis=1)
+    ap = average_precision(tp, np.array([0.9, 0.8, 0.7]), 2)
+    assert ap == pytest.approx(0.5 + 0.5 * 2 / 3, abs=0.01)
+    # TP, FP, FP: recall stops at 0.5 and, as in ultralytics, precision
+    # falls linearly from 1/3 there to 0 at recall 1
+    missed = average_precision(tp[[0, 1, 1]], np.array([0.9, 0.8, 0.7]), 2)
+    assert missed == pytest.approx(0.5 + 0.5 * (1 / 3) / 2, abs=0.01)
+    # Perfect ranking
+    perfect = np.ones((2, len(IOU_THRESHOLDS)), dtype=bool)
+    assert average_precision(perfect, np.array([0.9, 0.8]), 2) == pytest.approx(1.0, abs=0.01)
+    # Order comes from the confidences, not the row order
+    assert average_precision(tp[[2, 1, 0]], np.array([0.7, 0.8, 0.9]), 2)[0] == pytest.approx(ap[0])
+    assert not average_precision(tp, np.array([0.9, 0.8, 0.7]), 0).any()
+
+def test_accuracy_map_and_precision_recall_per_threshold():
+    result = accuracy([PRED[[3, 1, 2, 0]]], [(None, GT)], [0.75, 0.65, 0.5])
+    # Class 1 has no ground truth: only class 0 is averaged
+    assert result['map50'] == pytest.approx(0.5 + 0.5 * 2 / 3, abs=0.01)
+    # Up to IoU 0.75 as above; from 0.8 the third box is a miss (TP, FP, FP)
+    assert result['map'] == pytest.approx((6 * (0.5 + 0.5 * 2 / 3) + 4 * (0.5 + 0.5 * (1 / 3) / 2)) / 10, abs=0.01)
+
+    by_conf = result['by_conf']
+    assert by_conf[0.75] == pytest.approx({'precision': 0.5, 'recall': 0.5, 'f1': 0.5})
+    assert by_conf[0.65] == pytest.approx({'precision': 2 / 3, 'recall': 1.0, 'f1': 0.8})
+    assert by_conf[0.5] == pytest.approx({'precision': 0.5, 'recall': 1.0, 'f1': 2 / 3})
+
+    # Ground truth spread over several images counts once per box
+    split = accuracy([PRED[:2], PRED[2:]], [(None, GT[:1]), (None, GT[1:])], [0.65])
+    assert split['map50'] == pytest.approx(result['map50'])
+    assert split['by_conf'][0.65] == pytest.approx(by_conf[0.65])
@@ -0,0 +1,78 @@
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from tracking import tracker as tracker_module
+from tracking.tracker import ObjectTracker, iou_matrix, linear_assignment
+
+def _det(x, y, w=100, h=60, conf=0.9):
+    return (x, y, x + w, y + h, -1, conf, 0)
+
+def test_iou_matrix():
+    a = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [100, 100, 110, 110]], dtype=np.float32)
+    ious = iou_matrix(a, b)
+    assert ious.shape == (2, 3)
+    np.testing.assert_allclose(ious[0], [1.0, 50 / 150, 0.0], atol=1e-6)
+    np.testing.assert_allclose(ious[1], 0.0, atol=1e-6)
+    assert iou_matrix(np.zeros((0, 4)), b).shape == (0, 3)
+
+def test_linear_assignment_is_optimal_and_respects_limit():
+    # Greedy would take (0, 0) at cost 0.1 and leave row 1 with 0.95;
+    # the optimal assignment is the cross pairing (0.2 + 0.2)
+    cost = np.array([[0.1, 0.2], [0.2, 0.95]])
+    if tracker_module.HAS_LAP:
+        assert sorted(linear_assignment(cost, cost_limit=1.0)) == [(0, 1), (1, 0)]
+    # Pairs above the limit are never matched
+    matches = linear_assignment(np.array([[0.9, 0.8], [0.85, 0.95]]), cost_limit=0.7)
+    assert matches == []
+    assert linear_assignment(np.zeros((0, 2)), cost_limit=0.7) == []
+
+def test_linear_assignment_greedy_fallback(monkeypatch):
+    monkeypatch.setattr(tracker_module, 'HAS_LAP', False)
+    assert sorted(linear_assignment(np.array([[0.1, 0.5], [0.4, 0.3]]), cost_limit=0.7)) == [(0, 0), (1, 1)]
+
+def test_ids_persist_across_frames():
+    tracker = ObjectTracker({'max_age': 5, 'min_hits': 3, 'iou_threshold': 0.3})
+    ids = []
+    for i in range(6):
+        # Two animals moving in opposite directions, listed in alternating order
+        dets = [_det(100 + 8 * i, 100), _det(600 - 8 * i, 300)]
+        tracks = tracker.update(dets if i % 2 else dets[::-1])
+        by_x = sorted(tracker.active_tracks().items(), key=lambda item: item[1]['bbox'][1])
+        ids.append([tid for tid, _ in by_x])
+    assert all(frame_ids == ids[0] for frame_ids in ids)
+    assert len(tracks) == 2
+    assert all(t['status'] == 'confirmed' and t['hits'] == 6 for t in tracks.values())
+
+def test_track_dies_after_max_age_detector_runs():
+    tracker = ObjectTracker({'max_age': 3, 'min_hits': 1})
+    tracker.update([_det(100, 100)])
+    for _ in range(3):
+        assert len(tracker.update([])) == 1
+    assert tracker.update([]) == {}
+
+def test_predicted_frames_count_towards_max_age():
+    # Detector every third frame: max_age is still counted in frames
+    tracker = ObjectTracker({'max_age': 5, 'min_hits': 1})
+    tracker.update([_det(100, 100)])
+    tracks = tracker.predict()
+    tracks = tracker.predict()
+    track = next(iter(tracks.values()))
+    assert track['time_since_update'] == 0  # predicted frames are not detector misses
+    tracker.update([])  # frame 3
+    tracker.predict()   # frame 4
+    assert len(tracker.predict()) == 1  # frame 5
+    assert tracker.predict() == {}      # frame 6 > max_age
+
+def test_matched_track_is_kept_alive_by_predictions_and_updates():
+    tracker = ObjectTracker({'max_age': 2, 'min_hits': 1})
+    tracker.update([_det(100, 100)])
+    track_id = next(iter(tracker.tracks))
+    for i in range(1, 10):
+        tracker.predict()
+        tracks = tracker.update([_det(100 + 4 * i, 100)])
+        assert list(tracks) == [track_id]
@@ -0,0 +1,79 @@
+import sys
+import os
+
+import cv2
+import numpy as np
+import pytest
+import yaml
+
+sys.path.append(os.getcwd())
+
+pytest.importorskip('shapely', exc_type=ImportError)  # imported lazily by app.zones
+
+from app.zones import Zones, inference_size
+
+INCLUDE = [[0.1, 0.2], [0.9, 0.2], [0.9, 0.9], [0.1, 0.9]]
+EXCLUDE = [[0.5, 0.5], [1.0, 0.5], [1.0, 1.0], [0.5, 1.0]]
+
+def _hand_mask(w, h):
+    """The same active area drawn pixel by pixel (x in [0.1w, 0.9w) etc.)."""
+    mask = np.zeros((h, w), np.uint8)
+    mask[int(0.2 * h):int(0.9 * h), int(0.1 * w):int(0.9 * w)] = 255
+    mask[int(0.5 * h):, int(0.5 * w):] = 0
+    return mask
+
+def test_mask_and_coverage_match_hand_drawn_polygon():
+    zones = Zones({'include': [INCLUDE], 'exclude': [EXCLUDE]})
+    w, h = 320, 180
+    mask = zones.mask((w, h))
+    expected = _hand_mask(w, h)
+    assert mask.shape == (h, w) and set(np.unique(mask)) <= {0, 255}
+    # Only the outline pixels may differ (fillPoly includes the far edges)
+    assert np.count_nonzero(mask != expected) <= 2 * (w + h)
+    assert zones.mask((w, h)) is mask  # cached per size
+
+    # Boxes in 1280x720 frame pixels against the 320x180 mask
+    frame_shape = (720, 1280, 3)
+    coverage = zones.coverage(frame_shape, (w, h))
+    assert zones.coverage(frame_shape, (w, h)) is coverage
+    boxes = np.array([
+        [200, 200, 500, 300],    # inside the include zone
+        [800, 400, 1100, 600],   # in the excluded corner
+        [0, 0, 100, 100],        # outside the include zone
+        [500, 300, 800, 500],    # straddling the excluded corner
+    ], dtype=np.float32)
+    scale = w / frame_shape[1]
+    for box, fraction in zip(boxes, coverage.fraction(boxes)):
+        x1, y1, x2, y2 = (box * scale).round().astype(int)
+        assert fraction == pytest.approx(expected[y1:y2, x1:x2].mean() / 255, abs=0.03)
+
+def test_pipeline_builds_inference_mask_up_front(tmp_path):
+    from app.pipeline import Pipeline
+    from alerts.notifier import AlertSystem
+    from benchmarks.stub_detector import StubDetector
+
+    clip = tmp_path / 'clip.mp4'
+    writer = cv2.VideoWriter(str(clip), cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+    writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+
+    with open('configs/config.yaml') as f:
+        config = yaml.safe_load(f)
+    config['camera']['source'] = str(clip)
+    config['camera']['zones'] = {'include': [INCLUDE], 'exclude': [EXCLUDE]}
+    config['alerts']['database']['enabled'] = False
+
+    class StreamServer:
+        def start(self):
+            pass
+
+    alerts = AlertSystem(config)
+    pipeline = Pipeline(config=config, detector=StubDetector(), alert_system=alerts, stream_server=StreamServer())
+    try:
+        size = inference_size(config)
+        assert size in pipeline.zones.masks
+        assert pipeline.motion_detector.size in pipeline.zones.masks
+        assert ((config['camera']['height'], config['camera']['width']), size) in pipeline.zones.coverages
+    finally:
+        pipeline.stop()
+        alerts.stop()
@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+class FlowPropagator:
+    """
+    Moves track boxes between detector runs with sparse Lucas-Kanade flow on a
+    small grid of points inside each box (corners and interior).
+    """
+    def __init__(self, config):
+        self.config = config
+        self.width = config.get('lk_width', 640)
+        self.grid = config.get('lk_grid', 4)
+        self.prev_gray = None
+        self.scale = 1.0
+        self.lk_params = dict(
+            winSize=(15, 15),
+            maxLevel=2,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03)
+        )
+
+    def _gray(self, frame):
+        self.scale = self.width / frame.shape[1]
+        size = (self.width, int(round(frame.shape[0] * self.scale)))
+        return cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+
+    def reset(self, frame):
+        """Remember the frame the boxes currently refer to (e.g. after a detection)."""
+        self.prev_gray = self._gray(frame)
+
+    def _grid_points(self, bbox):
+        x1, y1, x2, y2 = [v * self.scale for v in bbox]
+        # Inset so points stay on the animal rather than the background
+        dx, dy = (x2 - x1) * 0.1, (y2 - y1) * 0.1
+        xs = np.linspace(x1 + dx, x2 - dx, self.grid)
+        ys = np.linspace(y1 + dy, y2 - dy, self.grid)
+        return np.array([[x, y] for y in ys for x in xs], dtype=np.float32).reshape(-1, 1, 2)
+
+    def propagate(self, frame, boxes):
+        """
+        boxes: dict track_id -> (x1, y1, x2, y2) in the previous frame.
+        Returns dict track_id -> propagated box for the tracks that could be followed.
+        """
+        gray = self._gray(frame)
+        prev_gray, self.prev_gray = self.prev_gray, gray
+        if prev_gray is None or prev_gray.shape != gray.shape or not boxes:
+            return {}
+
+        track_ids = list(boxes.keys())
+        points = [self._grid_points(boxes[tid]) for tid in track_ids]
+        all_points = np.concatenate(points)
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, all_points, None, **self.lk_params)
+
+        propagated = {}
+        per_box = len(points[0])
+        for i, track_id in enumerate(track_ids):
+            sl = slice(i * per_box, (i + 1) * per_box)
+            ok = status[sl].ravel() == 1
+            if ok.sum() < per_box // 2:
+                continue  # lost most points, let the Kalman prediction handle it
+            old = all_points[sl][ok].reshape(-1, 2)
+            new = next_points[sl][ok].reshape(-1, 2)
+            shift = np.median(new - old, axis=0) / self.scale
+
+            # Scale change from the spread of the points around their median
+            old_spread = np.median(np.linalg.norm(old - np.median(old, axis=0), axis=1))
+            new_spread = np.median(np.linalg.norm(new - np.median(new, axis=0), axis=1))
+            zoom = float(np.clip(new_spread / old_spread, 0.8, 1.25)) if old_spread > 1e-3 else 1.0
+
+            x1, y1, x2, y2 = boxes[track_id]
+            cx, cy = (x1 + x2) / 2 + shift[0], (y1 + y2) / 2 + shift[1]
+            w, h = (x2 - x1) * zoom, (y2 - y1) * zoom
+            propagated[track_id] = (cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2)
+        return propagated
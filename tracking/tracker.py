@@ -2,61 +2,216 @@ import logging
 import time
 from collections import deque
 import numpy as np
+from filterpy.kalman import KalmanFilter
+
+try:
+    import lap  # provided by lapx
+    HAS_LAP = True
+except ImportError:
+    HAS_LAP = False
 
 logger = logging.getLogger(__name__)
 
+def iou_matrix(boxes_a, boxes_b):
+    """Vectorized IoU between (N, 4) and (M, 4) arrays of x1, y1, x2, y2. Returns (N, M)."""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    a = np.asarray(boxes_a, dtype=np.float32)[:, None, :4]
+    b = np.asarray(boxes_b, dtype=np.float32)[None, :, :4]
+    iw = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    ih = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = iw * ih
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / (area_a + area_b - inter + 1e-9)
+
+def linear_assignment(cost, cost_limit):
+    """
+    Minimum-cost matching of rows to columns, ignoring pairs above cost_limit.
+    Uses the Hungarian solver from lapx when available, greedy matching otherwise.
+    Returns a list of (row, col) pairs.
+    """
+    if cost.size == 0:
+        return []
+    if HAS_LAP:
+        _, x, _ = lap.lapjv(cost, extend_cost=True, cost_limit=cost_limit)
+        return [(i, j) for i, j in enumerate(x) if j >= 0]
+
+    matches = []
+    used_rows, used_cols = set(), set()
+    for flat in np.argsort(cost, axis=None):
+        i, j = np.unravel_index(flat, cost.shape)
+        if cost[i, j] > cost_limit:
+            break
+        if i in used_rows or j in used_cols:
+            continue
+        used_rows.add(i)
+        used_cols.add(j)
+        matches.append((int(i), int(j)))
+    return matches
+
+def _bbox_to_z(bbox):
+    """x1, y1, x2, y2 -> centre x, centre y, area, aspect ratio"""
+    w = bbox[2] - bbox[0]
+    h = bbox[3] - bbox[1]
+    return np.array([bbox[0] + w / 2.0, bbox[1] + h / 2.0, w * h, w / float(h + 1e-9)]).reshape((4, 1))
+
+def _x_to_bbox(x):
+    w = np.sqrt(max(x[2, 0] * x[3, 0], 0.0))
+    h = x[2, 0] / w if w > 0 else 0.0
+    return (x[0, 0] - w / 2.0, x[1, 0] - h / 2.0, x[0, 0] + w / 2.0, x[1, 0] + h / 2.0)
+
+def _create_kalman(bbox):
+    """Constant velocity model on (cx, cy, area, aspect), as in SORT."""
+    kf = KalmanFilter(dim_x=7, dim_z=4)
+    kf.F = np.array([
+        [1, 0, 0, 0, 1, 0, 0],
+        [0, 1, 0, 0, 0, 1, 0],
+        [0, 0, 1, 0, 0, 0, 1],
+        [0, 0, 0, 1, 0, 0, 0],
+        [0, 0, 0, 0, 1, 0, 0],
+        [0, 0, 0, 0, 0, 1, 0],
+        [0, 0, 0, 0, 0, 0, 1]
+    ], dtype=float)
+    kf.H = np.array([
+        [1, 0, 0, 0, 0, 0, 0],
+        [0, 1, 0, 0, 0, 0, 0],
+        [0, 0, 1, 0, 0, 0, 0],
+        [0, 0, 0, 1, 0, 0, 0]
+    ], dtype=float)
+    kf.R[2:, 2:] *= 10.0
+    kf.P[4:, 4:] *= 1000.0  # high uncertainty for the unobserved velocities
+    kf.P *= 10.0
+    kf.Q[-1, -1] *= 0.01
+    kf.Q[4:, 4:] *= 0.01
+    kf.x[:4] = _bbox_to_z(bbox)
+    return kf
+
 class ObjectTracker:
     def __init__(self, config):
         self.config = config
         self.tracks = {}  # track_id -> TrackState
+        # Frames (detector runs and predicted frames alike) a track survives without a matching detection
         self.max_age = config.get('max_age', 30)
         self.min_hits = config.get('min_hits', 3)
-        
+        self.iou_threshold = config.get('iou_threshold', 0.3)
+        self.next_id = 1
+        if not HAS_LAP:
+            logger.warning("lapx not installed, using greedy track association")
+
+    def _predict_tracks(self):
+        track_ids = list(self.tracks.keys())
+        predicted = np.zeros((len(track_ids), 4), dtype=np.float32)
+        for i, track_id in enumerate(track_ids):
+            kf = self.tracks[track_id]['kf']
+            # Keep the area positive
+            if kf.x[2, 0] + kf.x[6, 0] <= 0:
+                kf.x[6, 0] = 0.0
+            kf.predict()
+            predicted[i] = _x_to_bbox(kf.x)
+        return track_ids, predicted
+
+    def predict(self, measurements=None):
+        """
+        Advance every track one frame without detections (e.g. on frames where the
+        detector is skipped). Track boxes move to their Kalman prediction, or to
+        the box given in `measurements` (track_id -> bbox, e.g. from optical flow).
+        It is not a hit, and time_since_update (misses of the detector) stays
+        the same, but the frame counts towards max_age so a track lives
+        max_age frames whatever the detection cadence.
+        """
+        measurements = measurements or {}
+        track_ids, predicted = self._predict_tracks()
+        for track_id, bbox in zip(track_ids, predicted):
+            track = self.tracks[track_id]
+            if track_id in measurements:
+                bbox = measurements[track_id]
+                track['kf'].update(_bbox_to_z(bbox))
+            track['bbox'] = tuple(float(v) for v in bbox)
+            track['age'] += 1
+            track['frames_since_update'] += 1
+            if track['frames_since_update'] > self.max_age:
+                del self.tracks[track_id]
+        return self.tracks
+
     def update(self, detections):
         """
-        Update tracks with new detections from YOLO tracker.
-        detections: List of (x1, y1, x2, y2, id, conf, class)
+        Associate detections with existing tracks and update them.
+        detections: List of (x1, y1, x2, y2, id, conf, class). The incoming id is
+        ignored; ids are assigned by the tracker.
+        Returns the track dict. Tracks matched this frame have time_since_update == 0.
         """
-        current_ids = set()
-        
-        for det in detections:
-            if len(det) < 7: # Standard YOLO format with track ID
+        dets = [det for det in detections if len(det) >= 7]
+        det_boxes = np.array([det[:4] for det in dets], dtype=np.float32).reshape(-1, 4)
+
+        track_ids, predicted = self._predict_tracks()
+        ious = iou_matrix(det_boxes, predicted)
+        matches = linear_assignment(1.0 - ious, cost_limit=1.0 - self.iou_threshold)
+
+        now = time.time()
+        matched_dets = set()
+        matched_tracks = set()  # also collects the tracks created below
+        for d, t in matches:
+            if ious[d, t] < self.iou_threshold:
+                continue
+            matched_dets.add(d)
+            matched_tracks.add(track_ids[t])
+            x1, y1, x2, y2, _, conf, cls = dets[d][:7]
+
+            track = self.tracks[track_ids[t]]
+            track['kf'].update(_bbox_to_z((x1, y1, x2, y2)))
+            track['hits'] += 1
+            track['age'] += 1
+            track['time_since_update'] = 0
+            track['frames_since_update'] = 0
+            track['last_seen'] = now
+            track['bbox'] = (x1, y1, x2, y2)
+            track['conf'] = max(track['conf'], conf)
+            track['last_conf'] = conf
+            track['cls'] = cls
+            track['history'].append((x1, y1, x2, y2))
+
+            if track['hits'] >= self.min_hits:
+                track['status'] = 'confirmed'
+
+        # New tracks for unmatched detections
+        for d, det in enumerate(dets):
+            if d in matched_dets:
                 continue
-                
-            x1, y1, x2, y2, track_id, conf, cls = det
-            track_id = int(track_id)
-            current_ids.add(track_id)
-            
-            if track_id not in self.tracks:
-                self.tracks[track_id] = {
-                    'hits': 1,
-                    'last_seen': time.time(),
-                    'bbox': (x1, y1, x2, y2),
-                    'conf': conf,
-                    'status': 'probation',
-                    'history': deque(maxlen=30)
-                }
-            else:
-                track = self.tracks[track_id]
-                track['hits'] += 1
-                track['last_seen'] = time.time()
-                track['bbox'] = (x1, y1, x2, y2)
-                track['conf'] = max(track['conf'], conf)
-                track['history'].append((x1, y1, x2, y2))
-                
-                if track['hits'] >= self.min_hits:
-                    track['status'] = 'confirmed'
+            x1, y1, x2, y2, _, conf, cls = det[:7]
+            track_id = self.next_id
+            self.next_id += 1
+            matched_tracks.add(track_id)
+            self.tracks[track_id] = {
+                'hits': 1,
+                'age': 1,
+                'time_since_update': 0,
+                'frames_since_update': 0,
+                'last_seen': now,
+                'bbox': (x1, y1, x2, y2),
+                'conf': conf,
+                'last_conf': conf,
+                'cls': cls,
+                'status': 'confirmed' if self.min_hits <= 1 else 'probation',
+                'history': deque([(x1, y1, x2, y2)], maxlen=30),
+                'kf': _create_kalman((x1, y1, x2, y2))
+            }
 
         # Cleanup lost tracks
-        self._prune_tracks(current_ids)
-        
+        self._prune_tracks(matched_tracks)
+
         return self.tracks
 
-    def _prune_tracks(self, current_ids):
-        now = time.time()
+    def _prune_tracks(self, updated_ids):
         for track_id in list(self.tracks.keys()):
-            if track_id not in current_ids:
-                age = now - self.tracks[track_id]['last_seen']
-                if age > self.max_age: # Remove if not seen for max_age seconds? No, usually max_age frames.
-                    # Adapting to time-based for robustness against FPS drops
-                    del self.tracks[track_id]
+            if track_id in updated_ids:
+                continue
+            track = self.tracks[track_id]
+            track['time_since_update'] += 1
+            track['frames_since_update'] += 1
+            if track['frames_since_update'] > self.max_age:
+                del self.tracks[track_id]
+
+    def active_tracks(self):
+        """Tracks that were matched to a detection on the last update."""
+        return {tid: t for tid, t in self.tracks.items() if t['time_since_update'] == 0}
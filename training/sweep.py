@@ -0,0 +1,401 @@
+import argparse
+import copy
+import csv
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.run import summarize, timed, bench_pipeline, environment
+from detection.parity import _boxes, _iou_matrix
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+RECALL_POINTS = np.linspace(0, 1, 101)
+OBJECTIVES = ('f1', 'recall', 'precision', 'map50', 'map')
+
+# 1. Validation set (YOLO layout: images/... with labels/... next to it)
+
+def split_images(data_yaml, split='val'):
+    """Image paths of one split of a YOLO data.yaml (directories, list files or single images)."""
+    data_yaml = Path(data_yaml)
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+    root = Path(data.get('path') or data_yaml.parent)
+    if not root.is_absolute():
+        root = data_yaml.parent / root
+    entries = data[split] if isinstance(data[split], list) else [data[split]]
+
+    images = []
+    for entry in entries:
+        path = root / entry
+        if path.is_dir():
+            images.extend(sorted(p for p in path.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS))
+        elif path.suffix == '.txt':
+            with open(path, 'r') as f:
+                images.extend(root / line.strip() for line in f if line.strip())
+        else:
+            images.append(path)
+    return images
+
+def label_path(image_path):
+    """Ultralytics convention: .../images/x.jpg -> .../labels/x.txt"""
+    text = str(image_path)
+    images_dir, labels_dir = f"{os.sep}images{os.sep}", f"{os.sep}labels{os.sep}"
+    if images_dir in text:
+        text = labels_dir.join(text.rsplit(images_dir, 1))
+    return Path(text).with_suffix('.txt')
+
+def load_labels(image_path, shape):
+    """(M, 5) array of cls, x1, y1, x2, y2 in pixels; empty without a label file."""
+    path = label_path(image_path)
+    if not path.exists():
+        return np.zeros((0, 5), dtype=np.float32)
+    rows = np.loadtxt(path, dtype=np.float32, ndmin=2)
+    if rows.size == 0:
+        return np.zeros((0, 5), dtype=np.float32)
+    h, w = shape[:2]
+    cls, cx, cy, bw, bh = rows[:, 0], rows[:, 1] * w, rows[:, 2] * h, rows[:, 3] * w, rows[:, 4] * h
+    return np.stack([cls, cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+
+def load_samples(paths, classes=None):
+    samples = []
+    for path in paths:
+        image = cv2.imread(str(path))
+        if image is None:
+            logger.warning(f"Skipping unreadable image {path}")
+            continue
+        labels = load_labels(path, image.shape)
+        if classes is not None:
+            labels = labels[np.isin(labels[:, 0], classes)]
+        samples.append((image, labels))
+    return samples
+
+# 2. Accuracy
+
+def match(pred, gt):
+    """
+    True-positive flags (N, len(IOU_THRESHOLDS)) of predictions (N, 6), sorted by
+    confidence, against ground truth (M, 5). Each ground-truth box is matched once.
+    """
+    tp = np.zeros((len(pred), len(IOU_THRESHOLDS)), dtype=bool)
+    if len(pred) == 0 or len(gt) == 0:
+        return tp
+    ious = _iou_matrix(pred[:, :4], gt[:, 1:])
+    ious[pred[:, None, 5] != gt[None, :, 0]] = 0
+    for t, threshold in enumerate(IOU_THRESHOLDS):
+        candidates = ious >= threshold
+        used = np.zeros(len(gt), dtype=bool)
+        for i in np.flatnonzero(candidates.any(axis=1)):
+            free = candidates[i] & ~used
+            if free.any():
+                j = int(np.argmax(np.where(free, ious[i], -1)))
+                used[j] = True
+                tp[i, t] = True
+    return tp
+
+def average_precision(tp, conf, n_gt):
+    """
+    AP of one class for each IoU threshold (tp: (N, T) flags), computed like
+    ultralytics' val so the numbers line up with training/evaluate.py.
+    """
+    if n_gt == 0 or len(tp) == 0:
+        return np.zeros(len(IOU_THRESHOLDS))
+    order = np.argsort(-conf, kind='stable')
+    tpc = np.cumsum(tp[order], axis=0)
+    recall = tpc / n_gt
+    precision = tpc / np.arange(1, len(tp) + 1)[:, None]
+    ap = np.zeros(len(IOU_THRESHOLDS))
+    for t in range(len(IOU_THRESHOLDS)):
+        # Precision envelope, interpolated at 101 recall points and integrated
+        mrec = np.concatenate(([0.0], recall[:, t], [1.0]))
+        mpre = np.flip(np.maximum.accumulate(np.flip(np.concatenate(([1.0], precision[:, t], [0.0])))))
+        curve = np.interp(RECALL_POINTS, mrec, mpre)
+        ap[t] = float(((curve[1:] + curve[:-1]) / 2 * np.diff(RECALL_POINTS)).sum())
+    return ap
+
+def accuracy(predictions, samples, conf_thresholds):
+    """
+    mAP over all predictions (made at a low confidence) plus precision, recall
+    and F1 at IoU 0.5 for every deployment confidence threshold.
+    """
+    gts = [gt for _, gt in samples]
+    preds = [pred[np.argsort(-pred[:, 4], kind='stable')] for pred in predictions]
+    flags = [match(pred, gt) for pred, gt in zip(preds, gts)]
+    tp = np.concatenate(flags) if flags else np.zeros((0, len(IOU_THRESHOLDS)), dtype=bool)
+    pred_all = np.concatenate(preds) if preds else np.zeros((0, 6), dtype=np.float32)
+    gt_cls = np.concatenate([gt[:, 0] for gt in gts]) if gts else np.zeros(0)
+
+    aps = [
+        average_precision(tp[pred_all[:, 5] == c], pred_all[pred_all[:, 5] == c, 4], int((gt_cls == c).sum()))
+        for c in np.unique(gt_cls)
+    ]
+    ap = np.mean(aps, axis=0) if aps else np.zeros(len(IOU_THRESHOLDS))
+    result = {'map50': float(ap[0]), 'map': float(ap.mean()), 'by_conf': {}}
+    for conf in conf_thresholds:
+        keep = pred_all[:, 4] >= conf
+        hits = int(tp[keep, 0].sum())
+        precision = hits / int(keep.sum()) if keep.any() else 0.0
+        recall = hits / len(gt_cls) if len(gt_cls) else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        result['by_conf'][conf] = {'precision': precision, 'recall': recall, 'f1': f1}
+    return result
+
+# 3. Grid and workers
+
+def build_grid(models, img_sizes, engines, threads, int8=False):
+    """One job per (model, size, engine, int8, threads); confidence thresholds share a job."""
+    jobs = []
+    for model, size, engine, n_threads in itertools.product(models, img_sizes, engines, threads):
+        for quantized in ((False, True) if int8 and engine != 'torch' else (False,)):
+            jobs.append({'model': str(model), 'img_size': int(size), 'engine': engine,
+                         'int8': quantized, 'threads': int(n_threads)})
+    return jobs
+
+def export_all(jobs, img_size):
+    """Export every (model, engine, int8) once up front so workers never race on the cache."""
+    from detection.engines import export_model
+    failed = {}
+    for key in sorted({(j['model'], j['engine'], j['int8']) for j in jobs if j['engine'] != 'torch'}):
+        model, engine, int8 = key
+        if Path(model).suffix != '.pt':
+            continue  # already an exported model
+        try:
+            export_model(model, engine, img_size=img_size, int8=int8)
+        except Exception as e:
+            logger.error(f"Export of {model} for {engine}{' int8' if int8 else ''} failed: {e}")
+            failed[key] = str(e)
+    return failed
+
+def core_sets(workers):
+    """Disjoint CPU sets, one per worker, so parallel jobs do not skew each other's latency."""
+    try:
+        cores = sorted(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS / Windows
+        return [None] * workers
+    per_worker = max(1, len(cores) // workers)
+    return [cores[i * per_worker:(i + 1) * per_worker] or None for i in range(workers)]
+
+# Worker process state
+_samples = None
+_cores = None
+
+def _init_worker(core_queue, paths, classes):
+    global _samples, _cores
+    _cores = core_queue.get()
+    if _cores:
+        os.sched_setaffinity(0, _cores)
+    # Each worker decodes the validation set once
+    _samples = load_samples(paths, classes)
+
+def _evaluate_in_worker(job, config, options):
+    return evaluate_job(job, config, options, _samples, _cores)
+
+def evaluate_job(job, config, options, samples, cores=None):
+    """
+    Accuracy and latency of one detector configuration, one row per confidence
+    threshold. With a clip, the whole Pipeline is timed on it as well.
+    """
+    from detection.model import LeopardDetector
+    import torch
+
+    threads = job['threads'] or len(cores or []) or os.cpu_count() or 1
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+
+    det_config = copy.deepcopy(config['detection'])
+    det_config.update({
+        'img_size': job['img_size'], 'engine': job['engine'], 'int8': job['int8'], 'threads': job['threads'],
+        'conf_threshold': options['eval_conf'], 'adaptive_size': {'enabled': False}
+    })
+    detector = LeopardDetector(job['model'], det_config)
+    images = [image for image, _ in samples]
+
+    # mAP needs (nearly) every prediction, so this pass runs at eval_conf
+    predictions = [_boxes(detector.predict(image)) for image in images]
+    scores = accuracy(predictions, samples, options['conf'])
+
+    rows = []
+    for conf in options['conf']:
+        detector.config['conf_threshold'] = conf
+        latency = summarize(timed(detector.predict, [(image,) for image in images], warmup=options['warmup']))
+        row = {
+            'variant': Path(job['model']).stem, 'model': job['model'], 'img_size': job['img_size'],
+            'engine': job['engine'] + ('-int8' if job['int8'] else ''), 'threads': job['threads'], 'conf': conf,
+            'map50': scores['map50'], 'map': scores['map'], **scores['by_conf'][conf],
+            'p50_ms': latency['p50_ms'], 'p95_ms': latency['p95_ms'], 'fps': latency['throughput_per_s'],
+        }
+        if options.get('video'):
+            with tempfile.TemporaryDirectory() as tmp:
+                pipeline_config = copy.deepcopy(config)
+                pipeline_config['detection'] = dict(det_config, conf_threshold=conf)
+                result = bench_pipeline(pipeline_config, options['video'], detector, Path(tmp))
+            row.update({
+                'pipeline_p50_ms': result['p50_ms'], 'pipeline_p95_ms': result['p95_ms'],
+                'pipeline_fps': result['throughput_per_s'], 'detector_skip_rate': result['detector_skip_rate'],
+            })
+        rows.append(row)
+    return rows
+
+def run(jobs, config, options, paths):
+    """Evaluate every job, in worker processes when options['workers'] > 1. Returns (rows, failures)."""
+    rows, failed = [], []
+    classes = config['detection'].get('classes')
+
+    def finished(job, result):
+        rows.extend(result)
+        best = max(result, key=lambda r: r[options['objective']])
+        logger.info(
+            f"[{len(rows) // len(options['conf'])}/{len(jobs)}] {best['variant']} {job['img_size']} "
+            f"{best['engine']} x{job['threads']}: mAP50 {best['map50']:.3f}, p50 {best['p50_ms']:.1f} ms"
+        )
+
+    if options['workers'] <= 1:
+        samples = load_samples(paths, classes)
+        for job in jobs:
+            try:
+                finished(job, evaluate_job(job, config, options, samples))
+            except Exception as e:
+                failed.append((job, str(e)))
+                logger.error(f"Failed to evaluate {job}: {e}")
+        return rows, failed
+
+    # Spawned workers pin themselves to their own cores and load the images once
+    context = multiprocessing.get_context('spawn')
+    core_queue = context.Queue()
+    for cores in core_sets(options['workers']):
+        core_queue.put(cores)
+    with ProcessPoolExecutor(
+        max_workers=options['workers'],
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(core_queue, [str(p) for p in paths], classes)
+    ) as pool:
+        futures = {pool.submit(_evaluate_in_worker, job, config, options): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                finished(job, future.result())
+            except Exception as e:
+                failed.append((job, str(e)))
+                logger.error(f"Failed to evaluate {job}: {e}")
+    return rows, failed
+
+# 4. Trade-off table
+
+def pareto_front(rows, objective='f1', cost='p50_ms'):
+    """Marks rows no other row beats on both the objective (higher) and the cost (lower)."""
+    for row in rows:
+        row['pareto'] = not any(
+            other[objective] >= row[objective] and other[cost] <= row[cost] and
+            (other[objective] > row[objective] or other[cost] < row[cost])
+            for other in rows
+        )
+    return rows
+
+def print_table(rows, objective):
+    columns = [('variant', 16, '{}'), ('img_size', 8, '{}'), ('engine', 14, '{}'), ('threads', 7, '{}'),
+               ('conf', 6, '{:.2f}'), ('map50', 7, '{:.3f}'), ('map', 7, '{:.3f}'), ('precision', 9, '{:.3f}'),
+               ('recall', 7, '{:.3f}'), ('f1', 7, '{:.3f}'), ('p50_ms', 9, '{:.1f}'), ('p95_ms', 9, '{:.1f}'),
+               ('fps', 8, '{:.1f}')]
+    if rows and 'pipeline_fps' in rows[0]:
+        columns.append(('pipeline_fps', 12, '{:.1f}'))
+    print('  ' + ''.join(f"{name[:size]:>{size + 1}}" for name, size, _ in columns))
+    for row in sorted(rows, key=lambda r: r['p50_ms']):
+        mark = '* ' if row['pareto'] else '  '
+        print(mark + ''.join(f"{fmt.format(row[name])[:size + 1]:>{size + 1}}" for name, size, fmt in columns))
+    print(f"* Pareto-optimal on {objective} vs p50 latency")
+
+def write_results(rows, path, meta):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == '.csv':
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, 'w') as f:
+            json.dump({**meta, 'results': rows}, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy / CPU latency sweep over detector configurations")
+    parser.add_argument("--data", type=str, required=True, help="YOLO data.yaml of the validation set")
+    parser.add_argument("--split", type=str, default="val")
+    parser.add_argument("--config", type=str, default="configs/config.yaml")
+    parser.add_argument("--models", nargs="+", default=None, help="Weights to compare (default: detection.model_path)")
+    parser.add_argument("--img-sizes", nargs="+", type=int, default=None)
+    parser.add_argument("--conf", nargs="+", type=float, default=None, help="Deployment confidence thresholds")
+    parser.add_argument("--engines", nargs="+", default=None, help="torch, onnx and/or openvino")
+    parser.add_argument("--threads", nargs="+", type=int, default=None, help="Inference threads (0 = the worker's cores)")
+    parser.add_argument("--int8", action="store_true", help="Also evaluate INT8 exports")
+    parser.add_argument("--limit", type=int, default=None, help="Max validation images")
+    parser.add_argument("--video", type=str, default=None, help="Also time the full Pipeline on this clip")
+    parser.add_argument("--workers", type=int, default=None, help="Configurations evaluated in parallel")
+    parser.add_argument("--objective", choices=OBJECTIVES, default=None, help="Accuracy axis of the Pareto table")
+    parser.add_argument("--output", type=str, default=None, help="Write all rows to this .json or .csv")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    sweep_config = config.get('sweep', {})
+
+    options = {
+        'conf': args.conf or sweep_config.get('conf', [0.25, 0.4, 0.6]),
+        'eval_conf': sweep_config.get('eval_conf', 0.001),
+        'warmup': sweep_config.get('warmup', 3),
+        'workers': args.workers or sweep_config.get('workers', 1),
+        'objective': args.objective or sweep_config.get('objective', 'f1'),
+        'video': args.video,
+    }
+    models = args.models or sweep_config.get('models') or [config['detection']['model_path']]
+    img_sizes = args.img_sizes or sweep_config.get('img_sizes', [320, 416, 512, 640])
+    engines = args.engines or sweep_config.get('engines', ['torch', 'onnx'])
+    threads = args.threads or sweep_config.get('threads', [0])
+
+    paths = split_images(args.data, args.split)[:args.limit or sweep_config.get('limit')]
+    if not paths:
+        logger.error(f"No images in the '{args.split}' split of {args.data}")
+        sys.exit(1)
+
+    jobs = build_grid(models, img_sizes, engines, threads, args.int8)
+    failed_exports = export_all(jobs, max(img_sizes))
+    jobs = [j for j in jobs if (j['model'], j['engine'], j['int8']) not in failed_exports]
+    logger.info(
+        f"Evaluating {len(jobs)} configurations x {len(options['conf'])} thresholds "
+        f"on {len(paths)} images with {options['workers']} workers"
+    )
+
+    start = time.time()
+    rows, failed = run(jobs, config, options, paths)
+    if not rows:
+        logger.error("No configuration could be evaluated")
+        sys.exit(1)
+    logger.info(f"Sweep finished in {time.time() - start:.0f}s, {len(failed)} configurations failed")
+
+    pareto_front(rows, options['objective'])
+    print_table(rows, options['objective'])
+    if args.output:
+        meta = {'timestamp': time.time(), 'data': args.data, 'images': len(paths),
+                'options': options, 'environment': environment()}
+        write_results(rows, args.output, meta)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()